@@ -1,14 +1,73 @@
 """
 AgriAI Backend — FastAPI Application
 """
+from services import startup  # first, so the startup clock covers framework imports too
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+import asyncio
+import importlib
 import os
 
 load_dotenv()
 
-from routers import weather, soil, satellite, market, farms, disease, crop_recommend, price_forecast, early_warning, gemini_insights
+from services import admission, cache_warmer, encoding, loop_monitor, metrics, outbox, profiling, resilience, weather_store
+
+# Before the routers load, so MEMORY_TRACE=1 can attribute model/dataset memory to its loader
+profiling.start_memory_trace()
+
+# Routers are imported one by one so the startup report can attribute import time per module.
+# None of them may import pandas / statsmodels / TensorFlow / Gemini at module level —
+# those are loaded on first use or by the background warm-up below.
+weather = startup.timed_import("routers.weather")
+soil = startup.timed_import("routers.soil")
+satellite = startup.timed_import("routers.satellite")
+market = startup.timed_import("routers.market")
+farms = startup.timed_import("routers.farms")
+disease = startup.timed_import("routers.disease")
+crop_recommend = startup.timed_import("routers.crop_recommend")
+price_forecast = startup.timed_import("routers.price_forecast")
+early_warning = startup.timed_import("routers.early_warning")
+gemini_insights = startup.timed_import("routers.gemini_insights")
+alerts = startup.timed_import("routers.alerts")
+dashboard = startup.timed_import("routers.dashboard")
+admin = startup.timed_import("routers.admin")
+
+# Heavy modules and models, loaded in a worker thread once the server is accepting connections
+WARMUP_LOADERS = [
+    ("pandas", lambda: importlib.import_module("pandas")),
+    ("market_data", market.get_market_data),
+    ("crop_model", crop_recommend._load_model),
+    ("statsmodels", lambda: importlib.import_module("statsmodels.tsa.arima.model")),
+    ("disease_model", disease._load_model),
+    ("gemini", gemini_insights._get_genai),
+    ("farm_index", farms.get_farm_index),
+]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if startup.warmup_enabled():
+        # Not awaited — the health check and /weather are served while this runs
+        asyncio.get_running_loop().run_in_executor(None, startup.warm_up, WARMUP_LOADERS)
+    # Replays rows spooled while Supabase was unreachable; on shutdown, buffered rows are written or spooled
+    outbox.get_outbox().start()
+    # Keeps crop-recommendation tiles for farm cells fresh so most requests skip upstream calls entirely
+    tiles = asyncio.create_task(crop_recommend.tile_refresher()) if crop_recommend.TILE_REFRESH_S > 0 else None
+    # Prefetches weather/soil/NDVI for every farm ahead of CACHE_WARM_PEAKS
+    warmer = asyncio.create_task(cache_warmer.scheduler()) if cache_warmer.PEAKS else None
+    # Hourly weather observations per farm cell (rolling rain/temperature aggregates for risk and recommendations)
+    poller = asyncio.create_task(weather_store.poller()) if weather_store.POLL_S > 0 else None
+    # Event-loop lag metric; with LOOP_DEBUG=1 also the stacks of calls that block the loop
+    lag = asyncio.create_task(loop_monitor.get_monitor().run()) if loop_monitor.INTERVAL_S > 0 else None
+    yield
+    for task in (tiles, warmer, poller, lag):
+        if task is not None:
+            task.cancel()
+    await asyncio.to_thread(outbox.get_outbox().flush)
+
 
 app = FastAPI(
     title="AgriAI API",
@@ -16,9 +75,21 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=encoding.DefaultResponse,
 )
+app.state.warmup_loaders = WARMUP_LOADERS
+
+
+# Per-route concurrency / per-user quotas for expensive endpoints — fast 503 + Retry-After instead of piling up.
+# Added before the deadline middleware (→ inside it), so shedding sees what is left of the request budget.
+app.add_middleware(admission.AdmissionMiddleware)
 
-# CORS — allow frontend to talk to backend
+# One latency budget per request, shared by every upstream call it makes
+app.add_middleware(resilience.DeadlineMiddleware)
+
+# CORS — allow frontend to talk to backend. Added after admission and the deadline (→ outside them), so
+# their 429/503/504 responses carry CORS headers and the browser can read Retry-After
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -29,8 +100,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
+# Route attribution for loop-block reports (debug mode only — one dict write per request otherwise wasted)
+if loop_monitor.DEBUG:
+    app.add_middleware(loop_monitor.TaskRouteMiddleware)
+
+# Opt-in per-request stack sampling (admin header or PROFILE_SAMPLE_RATE)
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Per-route latency histograms + Server-Timing header (added last → outermost, so CORS preflights are timed too)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Include all routers
 app.include_router(weather.router,        prefix="/api/v1", tags=["Weather"])
 app.include_router(soil.router,           prefix="/api/v1", tags=["Soil"])
@@ -42,6 +124,9 @@ app.include_router(crop_recommend.router, prefix="/api/v1", tags=["Crop Recommen
 app.include_router(price_forecast.router, prefix="/api/v1", tags=["Price Forecast"])
 app.include_router(early_warning.router,  prefix="/api/v1", tags=["Early Warning"])
 app.include_router(gemini_insights.router, prefix="/api/v1", tags=["Gemini AI Insights"])
+app.include_router(alerts.router,         prefix="/api/v1", tags=["Alerts"])
+app.include_router(dashboard.router,      prefix="/api/v1", tags=["Dashboard"])
+app.include_router(admin.router,          prefix="/api/v1", tags=["Admin"])
 
 
 @app.get("/", tags=["Health"])
@@ -54,6 +139,18 @@ async def health_check():
     }
 
 
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of this worker's request, upstream, model and cache metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/startup", tags=["Health"])
+async def startup_report():
+    """Per-module import times, warm-up progress and time-to-first-request for this worker."""
+    return startup.report()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", 8000)), reload=True)
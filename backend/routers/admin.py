@@ -0,0 +1,58 @@
+"""
+Admin Router — GET /api/v1/admin/profiles, /admin/profiles/{id}, /admin/memory, /admin/loop-blocks;
+POST /admin/cache-warm
+Request profiles captured by services/profiling.py, tracemalloc memory per loaded model/dataset,
+event-loop blocking reports (services/loop_monitor.py) and an on-demand run of the scheduled cache warm-up
+(services/cache_warmer.py).
+Every endpoint requires `X-Admin-Token: $ADMIN_TOKEN`; with ADMIN_TOKEN unset they are disabled.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from typing import Optional
+import asyncio
+
+from services import cache_warmer, loop_monitor, profiling
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not profiling.ADMIN_TOKEN:
+        raise HTTPException(404, "Not found")
+    if not profiling.is_admin(x_admin_token):
+        raise HTTPException(403, "Admin token required")
+
+
+@router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Captured request profiles, newest first."""
+    return {"profiles": await asyncio.to_thread(profiling.list_profiles)}
+
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    """Folded stacks for one profile — feed to flamegraph.pl, inferno or speedscope."""
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(404, "Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+
+@router.get("/admin/memory", dependencies=[Depends(require_admin)])
+async def memory(request: Request):
+    """Traced memory held by each warm-up loader's model/dataset, and the biggest allocating packages."""
+    loaders = getattr(request.app.state, "warmup_loaders", [])
+    # Walking every live allocation takes a while on a loaded worker — keep it off the event loop
+    return await asyncio.to_thread(profiling.memory_report, loaders)
+
+
+@router.get("/admin/loop-blocks", dependencies=[Depends(require_admin)])
+async def loop_blocks():
+    """Recent event-loop stalls with the blocking stack and route (stacks need LOOP_DEBUG=1)."""
+    return loop_monitor.get_monitor().report()
+
+
+@router.post("/admin/cache-warm", dependencies=[Depends(require_admin)])
+async def cache_warm(budget: int = Query(cache_warmer.BUDGET, ge=0, description="Max upstream calls")):
+    """Warm weather/soil/NDVI caches for every farm now (as the scheduler does before a peak)."""
+    return await cache_warmer.warm(budget=budget)
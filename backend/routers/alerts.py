@@ -0,0 +1,116 @@
+"""
+Alerts Router — GET /api/v1/alerts/stream (SSE) and WS /api/v1/alerts/ws
+Pushes new alerts for the authenticated user (or one of their farms) as they are raised,
+replacing dashboard polling of the Supabase alerts table. Fan-out lives in services/alert_hub.py.
+Browsers' EventSource can't set headers, so both endpoints also accept ?token=<supabase jwt>.
+"""
+from fastapi import APIRouter, HTTPException, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+
+from services.alert_hub import get_alert_hub, topics_for
+from routers.farms import _get_user_id
+
+router = APIRouter()
+
+HEARTBEAT_S = 15           # keeps proxies from closing idle streams and detects dead clients
+
+
+def _farm_owner(farm_id: str) -> str | None:
+    from services.farm_index import get_farm_index
+    farm = get_farm_index().farms.get(farm_id)
+    if farm is not None:
+        return farm.get("user_id")
+    from services.supabase_client import get_supabase
+    resp = get_supabase().table("farms").select("user_id").eq("id", farm_id).limit(1).execute()
+    return resp.data[0]["user_id"] if resp.data else None
+
+
+def _resolve_topics(token: str, farm_id: str | None) -> list[str]:
+    user_id = _get_user_id(token)
+    if farm_id is None:
+        return topics_for(user_id=user_id)
+    if _farm_owner(farm_id) != user_id:
+        raise HTTPException(404, "Farm not found")
+    return topics_for(farm_id=farm_id)
+
+
+def _token(authorization: str | None, token: str | None) -> str:
+    if authorization:
+        return authorization.replace("Bearer ", "")
+    if token:
+        return token
+    raise HTTPException(401, "Missing token")
+
+
+@router.get("/alerts/stream")
+async def alert_stream(
+    farm_id: Optional[str] = Query(None, description="Only alerts for this farm"),
+    token: Optional[str] = Query(None, description="Supabase JWT (for EventSource clients)"),
+    authorization: Optional[str] = Header(None),
+):
+    """Server-Sent Events: one `alert` event per new alert, `: ping` comments in between."""
+    # Auth and owner lookup use sync Supabase clients (and may build the farm index) — off the loop
+    topics = await asyncio.to_thread(_resolve_topics, _token(authorization, token), farm_id)
+    hub = get_alert_hub()
+
+    async def events():
+        async with hub.subscribe(topics) as queue:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                data = json.dumps(event["alert"], default=str, ensure_ascii=False)
+                yield f"id: {event['id']}\nevent: alert\ndata: {data}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",          # nginx: don't buffer the stream
+    })
+
+
+@router.websocket("/alerts/ws")
+async def alert_socket(websocket: WebSocket, token: str = Query(...), farm_id: Optional[str] = Query(None)):
+    """WebSocket: {"type": "alert", "id", "alert"} messages, {"type": "ping"} every HEARTBEAT_S."""
+    try:
+        topics = await asyncio.to_thread(_resolve_topics, token, farm_id)
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code, reason=str(e.detail))
+        return
+    await websocket.accept()
+
+    async def drain():
+        # Client messages are ignored; receiving is how a disconnect is noticed
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    receiver = asyncio.ensure_future(drain())
+    try:
+        async with get_alert_hub().subscribe(topics) as queue:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, receiver}, timeout=HEARTBEAT_S,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if receiver in done:
+                    getter.cancel()
+                    break
+                if getter in done:
+                    event = getter.result()
+                    await websocket.send_text(json.dumps(
+                        {"type": "alert", "id": event["id"], "alert": event["alert"]}, default=str, ensure_ascii=False,
+                    ))
+                else:
+                    getter.cancel()
+                    await websocket.send_text('{"type":"ping"}')
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
@@ -1,17 +1,24 @@
 """
-Crop Recommendation Router — POST /api/v1/crop-recommend
+Crop Recommendation Router — POST /api/v1/crop-recommend, POST /api/v1/crop-recommend/what-if
 Runs Random Forest classifier on soil + weather features
 """
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
+import asyncio
 import os
 import json
+import math
+import time
+
+from services import metrics
 
 router = APIRouter()
 
 # ML model — loaded lazily
 _model = None
 _encoder = None
+_server_retry_at = 0.0      # MODEL_SERVING=server fell back in-process: when to try the server again
 
 PROFIT_ESTIMATES = {
     "rice": "₹48,200/acre", "wheat": "₹35,800/acre", "maize": "₹31,600/acre",
@@ -26,81 +33,221 @@ class CropRequest(BaseModel):
     lng: float
 
 
+# Most points on one what-if axis (explicit values or steps) — checked before any array is built
+WHATIF_MAX_AXIS_POINTS = 1000
+
+
+class GridAxis(BaseModel):
+    """Explicit `values`, or `steps` evenly spaced points within ±`span` of the plot's value."""
+    values: Optional[list[float]] = Field(None, max_length=WHATIF_MAX_AXIS_POINTS)
+    span: Optional[float] = None
+    steps: int = Field(5, ge=1, le=WHATIF_MAX_AXIS_POINTS)
+
+
+class WhatIfRequest(BaseModel):
+    lat: float
+    lng: float
+    grid: dict[str, GridAxis]                       # feature name → axis, e.g. {"N": {"span": 40, "steps": 9}}
+    measured: Optional[dict[str, float]] = None     # soil-test values overriding the fetched ones
+    min_probability: float = 0.05                   # crops never reaching this anywhere on the grid are left out
+
+
 def _load_model():
-    global _model, _encoder
-    model_path = os.path.join(os.path.dirname(__file__), "..", "ml_models", "crop_model.pkl")
-    encoder_path = os.path.join(os.path.dirname(__file__), "..", "ml_models", "crop_label_encoder.pkl")
+    """
+    The crop classifier for this worker — a model-server proxy when MODEL_SERVING=server, else in-process.
+    If the server can't be reached the in-process model is used, and the server is tried again every
+    MODEL_SERVER_RETRY_S.
+    """
+    global _model, _encoder, _server_retry_at
+    from services import model_server
+    server = model_server.serving_mode() == "server"
+    if _model is not None and not (server and _server_retry_at and time.monotonic() >= _server_retry_at):
+        return _model, _encoder
+    if server:
+        try:
+            info = model_server.get_client().info()
+            if "crop_classes" in info:
+                _model, _encoder = model_server.RemoteCropModel(model_server.get_client(), info["crop_classes"]), None
+                _server_retry_at = 0.0
+                return _model, _encoder
+            print("Model server has no crop model — loading it in-process")
+        except model_server.ModelServerError as e:
+            print(f"{e} — loading crop model in-process")
+        _server_retry_at = time.monotonic() + model_server.RETRY_S
+    if _model is None:
+        _model, _encoder = _load_local()
+    return _model, _encoder
+
+
+def _load_local():
+    """Load the classifier into this process (also used by the model server)."""
+    model_path = os.getenv("CROP_MODEL_PATH", os.path.join(os.path.dirname(__file__), "..", "ml_models", "crop_model.pkl"))
+    encoder_path = os.path.join(os.path.dirname(model_path), "crop_label_encoder.pkl")
+
+    # Memory-mapped forest export — node arrays shared by every worker through the page cache
+    from services.shared_data import MmapForest, shared_path
+    shared = shared_path("crop_forest")
+    if shared:
+        return MmapForest.load(shared), None
 
     if not os.path.exists(model_path):
         return None, None
     try:
         import joblib
-        _model = joblib.load(model_path)
-        if os.path.exists(encoder_path):
-            _encoder = joblib.load(encoder_path)
-        return _model, _encoder
+        model = joblib.load(model_path)
+        encoder = joblib.load(encoder_path) if os.path.exists(encoder_path) else None
+        return model, encoder
     except Exception as e:
         print(f"Failed to load crop model: {e}")
         return None, None
 
 
-@router.post("/crop-recommend")
-async def recommend_crop(req: CropRequest):
-    """Recommend top-3 crops for a location based on soil + weather features."""
-    import httpx
+# What-if grids: most scenarios per request, rows per predict_proba call (bounds the forest's per-row
+# working set whatever the grid size) and valid ranges per feature
+WHATIF_MAX_SCENARIOS = int(os.getenv("WHATIF_MAX_SCENARIOS", "20000"))
+WHATIF_CHUNK_ROWS = int(os.getenv("WHATIF_CHUNK_ROWS", "2048"))
+FEATURE_RANGES = {
+    "N": (0, 200), "P": (0, 200), "K": (0, 250), "temperature": (0, 50),
+    "humidity": (0, 100), "ph": (3, 10), "rainfall": (0, 500),
+}
 
-    owm_key = os.getenv("OWM_API_KEY", "")
+# Regional defaults used when an upstream can't be reached
+DEFAULT_WEATHER = {"temp": 28.5, "humidity": 71.0, "rainfall": 202.9}
+DEFAULT_SOIL = {"N": 40, "P": 30, "K": 30, "ph": 6.5}
 
-    # 1. Fetch weather data
-    weather = {"temp": 28.5, "humidity": 71.0, "rainfall": 202.9}
-    if owm_key:
-        try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                r = await client.get(
-                    "https://api.openweathermap.org/data/2.5/weather",
-                    params={"lat": req.lat, "lon": req.lng, "appid": owm_key, "units": "metric"},
-                )
-                if r.status_code == 200:
-                    w = r.json()
-                    weather = {
-                        "temp": w["main"]["temp"],
-                        "humidity": w["main"]["humidity"],
-                        "rainfall": w.get("rain", {}).get("1h", 0) * 24 * 30,  # rough monthly est
-                    }
-        except Exception:
-            pass
-
-    # 2. Fetch soil data
-    soil = {"N": 40, "P": 30, "K": 30, "ph": 6.5}
+# Background tile refresh: how often, and which weather changes are worth recomputing a tile for
+TILE_REFRESH_S = float(os.getenv("CROP_TILE_REFRESH_S", "3600"))
+TILE_CONCURRENCY = 8
+MATERIAL_CHANGE = {"temperature": 1.5, "humidity": 5.0, "rainfall": 25.0}
+
+
+async def _fetch_weather(lat: float, lng: float, owm_key: str) -> dict | None:
+    """
+    Current weather features, or None when OWM is not configured or unreachable. Served from the local
+    observation store (latest hour + observed 30-day rain) without an upstream call when it covers the cell.
+    """
+    from services.http_client import upstream_client
+    from services.weather_store import get_weather_store
+    store = get_weather_store()
+    month = await asyncio.to_thread(store.window, lat, lng, 30 * 24)
+    if month is not None:
+        current = await asyncio.to_thread(store.latest, lat, lng)
+        if current is not None:
+            return {"temp": current["temp"], "humidity": current["humidity"], "rainfall": month["rain_mm"]}
+    if not owm_key:
+        return None
+    try:
+        async with upstream_client(timeout=10) as client:
+            r = await client.get(
+                "https://api.openweathermap.org/data/2.5/weather",
+                params={"lat": lat, "lon": lng, "appid": owm_key, "units": "metric"},
+            )
+            if r.status_code == 200:
+                w = r.json()
+                return {
+                    "temp": w["main"]["temp"],
+                    "humidity": w["main"]["humidity"],
+                    # Observed 30-day total when the store has it, else a rough monthly estimate
+                    "rainfall": month["rain_mm"] if month is not None else w.get("rain", {}).get("1h", 0) * 24 * 30,
+                }
+    except Exception:
+        pass
+    return None
+
+
+async def _fetch_soil(lat: float, lng: float) -> dict | None:
+    """Soil features from SoilGrids, or None when ISRIC is unreachable."""
+    from services.http_client import upstream_client
+    soil = dict(DEFAULT_SOIL)
     try:
-        async with httpx.AsyncClient(timeout=15) as client:
+        async with upstream_client(timeout=15) as client:
             r = await client.get(
                 "https://rest.isric.org/soilgrids/v2.0/properties/query",
                 params={
-                    "lon": req.lng, "lat": req.lat,
+                    "lon": lng, "lat": lat,
                     "property": ["nitrogen", "phh2o"],
                     "depth": "0-30cm", "value": "mean",
                 },
             )
-            if r.status_code == 200:
-                layers = r.json().get("properties", {}).get("layers", [])
-                for l in layers:
-                    val = l.get("depths", [{}])[0].get("values", {}).get("mean", 0) or 0
-                    if l["name"] == "nitrogen":
-                        soil["N"] = min(140, val / 10)
-                    elif l["name"] == "phh2o":
-                        soil["ph"] = round(val / 10, 1)
+            if r.status_code != 200:
+                return None
+            layers = r.json().get("properties", {}).get("layers", [])
+            for l in layers:
+                val = l.get("depths", [{}])[0].get("values", {}).get("mean", 0) or 0
+                if l["name"] == "nitrogen":
+                    soil["N"] = min(140, val / 10)
+                elif l["name"] == "phh2o":
+                    soil["ph"] = round(val / 10, 1)
+            return soil
     except Exception:
-        pass
+        return None
+
 
-    inputs_used = {
+def _features(weather: dict, soil: dict) -> dict:
+    return {
         "N": soil["N"], "P": soil["P"], "K": soil["K"],
         "temperature": weather["temp"], "humidity": weather["humidity"],
         "ph": soil["ph"], "rainfall": weather["rainfall"],
     }
 
+
+def _top3(model, rows: list[dict]) -> list[list[tuple[int, float]]]:
+    """One batched predict_proba → per row [(class index, confidence %), ...] best first."""
+    import numpy as np
+    from services.crop_tiles import FEATURES
+    features = np.array([[r[f] for f in FEATURES] for r in rows], dtype=float)
+    t0 = time.perf_counter()
+    probas = model.predict_proba(features)
+    metrics.observe_inference("crop_rf", time.perf_counter() - t0, len(features))
+    return [
+        [(int(i), round(float(p[i]) * 100, 1)) for i in p.argsort()[-3:][::-1]]
+        for p in probas
+    ]
+
+
+def _recommendations(top3: list[tuple[str, float]]) -> list[dict]:
+    return [
+        {
+            "rank": rank,
+            "crop": crop.capitalize(),
+            "confidence": conf,
+            "profit_estimate": PROFIT_ESTIMATES.get(crop.lower(), "₹30,000/acre"),
+        }
+        for rank, (crop, conf) in enumerate(top3, 1)
+    ]
+
+
+@router.post("/crop-recommend")
+async def recommend_crop(req: CropRequest):
+    """Recommend top-3 crops for a location based on soil + weather features."""
+    from services import model_server
+    from services.crop_tiles import get_tile_store, cell_of, CELL_DEG
+
+    # 0. Precomputed tile for this cell — no upstream calls, no inference
+    store = get_tile_store()
+    tile = await asyncio.to_thread(store.get, req.lat, req.lng)
+    if tile is not None:
+        return {
+            "recommendations": _recommendations(tile.top3),
+            "inputs_used": tile.inputs,
+            "location": {"lat": req.lat, "lng": req.lng},
+            "source": "tile",
+            "computed_at": tile.computed_at,
+        }
+
+    owm_key = os.getenv("OWM_API_KEY", "")
+
+    # 1+2. Weather and soil in parallel — both share the request's latency budget and fall back
+    # to regional defaults on timeout, deadline or an open circuit breaker
+    weather, soil = await asyncio.gather(
+        _fetch_weather(req.lat, req.lng, owm_key),
+        _fetch_soil(req.lat, req.lng),
+    )
+    live_inputs = weather is not None and soil is not None
+    inputs_used = _features(weather or DEFAULT_WEATHER, soil or DEFAULT_SOIL)
+
     # 3. Run ML model
-    model, encoder = _load_model()
+    model, encoder = await asyncio.to_thread(_load_model)
     if model is None:
         # Fallback recommendations when model not loaded
         return {
@@ -114,29 +261,236 @@ async def recommend_crop(req: CropRequest):
             "model_status": "NOT_LOADED — place crop_model.pkl in ml_models/",
         }
 
-    import numpy as np
-    features = np.array([[
-        inputs_used["N"], inputs_used["P"], inputs_used["K"],
-        inputs_used["temperature"], inputs_used["humidity"],
-        inputs_used["ph"], inputs_used["rainfall"],
-    ]])
-
-    probas = model.predict_proba(features)[0]
-    top3_idx = probas.argsort()[-3:][::-1]
     classes = encoder.classes_ if encoder else model.classes_
+    try:
+        ranked = (await asyncio.to_thread(_top3, model, [inputs_used]))[0]
+    except model_server.ModelServerError as e:
+        raise HTTPException(503, f"Crop model unavailable: {e}")
 
-    recommendations = []
-    for rank, idx in enumerate(top3_idx, 1):
-        crop = classes[idx]
-        recommendations.append({
-            "rank": rank,
-            "crop": crop.capitalize(),
-            "confidence": round(float(probas[idx]) * 100, 1),
-            "profit_estimate": PROFIT_ESTIMATES.get(crop.lower(), "₹30,000/acre"),
-        })
+    # Write-through: the next request in this cell is served from the tile (never from fallback inputs)
+    if live_inputs:
+        try:
+            await asyncio.to_thread(store.bind_classes, classes)
+            await asyncio.to_thread(store.put_many, [(cell_of(req.lat, req.lng, CELL_DEG), inputs_used, ranked)], "live")
+        except Exception as e:
+            print(f"Crop tile write failed: {e}")
 
     return {
-        "recommendations": recommendations,
+        "recommendations": _recommendations([(str(classes[i]), conf) for i, conf in ranked]),
         "inputs_used": inputs_used,
         "location": {"lat": req.lat, "lng": req.lng},
+        "source": "live",
+    }
+
+
+# ── What-if sensitivity grid ───────────────────────────────────────────────
+
+def _axis_values(name: str, axis: GridAxis, base: dict):
+    import numpy as np
+    if name not in FEATURE_RANGES:
+        raise HTTPException(400, f"Unknown feature {name!r}; use one of {', '.join(FEATURE_RANGES)}")
+    lo, hi = FEATURE_RANGES[name]
+    if axis.values:
+        values = np.asarray(axis.values, dtype=float)
+    elif axis.span is not None and axis.steps >= 1:
+        values = np.linspace(base[name] - axis.span, base[name] + axis.span, axis.steps)
+    else:
+        raise HTTPException(400, f"Axis {name!r} needs `values` or `span` + `steps`")
+    # Clip to agronomic range; clipping can collapse end points, so keep each value once
+    return np.unique(np.round(np.clip(values, lo, hi), 2))
+
+
+def _score_grid(model, base: dict, axes: dict) -> tuple:
+    """
+    Build every scenario (cartesian product of the axes, other features at `base`) as one float matrix and
+    score it in WHATIF_CHUNK_ROWS-row predict_proba calls. Returns (grid probabilities, probabilities at `base`).
+    """
+    import numpy as np
+    from services.crop_tiles import FEATURES
+    shape = tuple(len(v) for v in axes.values())
+    matrix = np.empty((math.prod(shape) + 1, len(FEATURES)))
+    matrix[:] = [base[f] for f in FEATURES]                       # last row stays the unmodified baseline
+    mesh = np.meshgrid(*axes.values(), indexing="ij")
+    for name, column in zip(axes, mesh):
+        matrix[:-1, FEATURES.index(name)] = column.ravel()
+    t0 = time.perf_counter()
+    probas = np.concatenate([
+        model.predict_proba(matrix[i:i + WHATIF_CHUNK_ROWS]) for i in range(0, len(matrix), WHATIF_CHUNK_ROWS)
+    ])
+    metrics.observe_inference("crop_rf", time.perf_counter() - t0, len(matrix))
+    return probas[:-1], probas[-1]
+
+
+@router.post("/crop-recommend/what-if")
+async def what_if(req: WhatIfRequest):
+    """
+    Probability surface per crop over a grid of nutrient / weather scenarios around one location — e.g. N, P, K
+    and pH ± a span around the plot's values. Surfaces are flattened row-major over `axes` (first axis slowest).
+    """
+    import numpy as np
+    from services import model_server
+    from services.crop_tiles import get_tile_store
+
+    if not req.grid:
+        raise HTTPException(400, "grid must vary at least one feature")
+    unknown = set(req.grid) - set(FEATURE_RANGES)
+    if unknown:
+        raise HTTPException(400, f"Unknown feature {sorted(unknown)[0]!r}; use one of {', '.join(FEATURE_RANGES)}")
+    # NaN/inf would survive np.clip and reach the model, so reject them outright
+    for name, axis in req.grid.items():
+        finite = all(math.isfinite(v) for v in axis.values or ())
+        if not finite or (axis.span is not None and not math.isfinite(axis.span)):
+            raise HTTPException(400, f"Axis {name!r} values and span must be finite numbers")
+    for name, value in (req.measured or {}).items():
+        if name not in FEATURE_RANGES:
+            raise HTTPException(400, f"Unknown feature {name!r}; use one of {', '.join(FEATURE_RANGES)}")
+        lo, hi = FEATURE_RANGES[name]
+        if not (math.isfinite(value) and lo <= value <= hi):
+            raise HTTPException(400, f"Measured {name!r} must be between {lo} and {hi}")
+    # Upper bound (clipping only removes points) in Python ints — rejected before any fetch or allocation
+    requested = math.prod(len(axis.values) if axis.values else axis.steps for axis in req.grid.values())
+    if requested > WHATIF_MAX_SCENARIOS:
+        raise HTTPException(400, f"Grid has {requested} scenarios; at most {WHATIF_MAX_SCENARIOS} allowed")
+
+    # Location context, fetched once: the precomputed tile when there is one, else weather + soil upstream
+    tile = await asyncio.to_thread(get_tile_store().get, req.lat, req.lng)
+    if tile is not None:
+        base, source = dict(tile.inputs), "tile"
+    else:
+        weather, soil = await asyncio.gather(
+            _fetch_weather(req.lat, req.lng, os.getenv("OWM_API_KEY", "")),
+            _fetch_soil(req.lat, req.lng),
+        )
+        base = _features(weather or DEFAULT_WEATHER, soil or DEFAULT_SOIL)
+        source = "live" if weather is not None and soil is not None else "defaults"
+    base.update(req.measured or {})
+    base = {name: round(float(value), 2) for name, value in base.items()}
+
+    axes = {name: _axis_values(name, axis, base) for name, axis in req.grid.items()}
+    scenarios = math.prod(len(v) for v in axes.values())
+
+    model, encoder = await asyncio.to_thread(_load_model)
+    if model is None:
+        raise HTTPException(503, "Crop model not loaded — place crop_model.pkl in ml_models/")
+    classes = [str(c) for c in (encoder.classes_ if encoder else model.classes_)]
+    try:
+        probas, baseline = await asyncio.to_thread(_score_grid, model, base, axes)
+    except model_server.ModelServerError as e:
+        raise HTTPException(503, f"Crop model unavailable: {e}")
+
+    # Compact surface: only crops that matter somewhere on the grid, probabilities to 3 decimals
+    keep = np.flatnonzero(probas.max(axis=0) >= req.min_probability)
+    best = probas.argmax(axis=1)
+    return {
+        "location": {"lat": req.lat, "lng": req.lng},
+        "base": base,
+        "source": source,
+        "axes": {name: values.tolist() for name, values in axes.items()},
+        "shape": [len(v) for v in axes.values()],
+        "scenarios": scenarios,
+        "baseline": _recommendations([(classes[i], round(float(baseline[i]) * 100, 1))
+                                      for i in baseline.argsort()[-3:][::-1]]),
+        "crops": {
+            classes[i].capitalize(): {
+                "probability": np.round(probas[:, i], 3).tolist(),
+                "max": round(float(probas[:, i].max()), 3),
+                "top_share": round(float((best == i).mean()), 3),       # share of scenarios where it ranks first
+            }
+            for i in keep
+        },
+        # Index into `classes` of the first-ranked crop in each scenario
+        "classes": [c.capitalize() for c in classes],
+        "top": best.tolist(),
     }
+
+
+# ── Background tile refresh ─────────────────────────────────────────────────
+
+def _changed(old: dict, new: dict) -> bool:
+    return any(abs(float(new[k]) - float(old[k])) >= d for k, d in MATERIAL_CHANGE.items())
+
+
+async def refresh_tiles(cells: list[tuple[int, int]], force: bool = False) -> dict:
+    """
+    Recompute tiles for `cells` (0.1° cell indices). Weather is fetched for every cell; soil only for
+    cells without a tile (it doesn't change). Cells whose weather moved less than MATERIAL_CHANGE keep
+    their tile unless it is past half of CROP_TILE_MAX_AGE_S. All changed cells share one predict_proba.
+    """
+    from services import model_server, rate_limit
+    from services.crop_tiles import get_tile_store, center, MAX_AGE_S
+
+    model, encoder = await asyncio.to_thread(_load_model)
+    if model is None:
+        return {"cells": len(cells), "updated": 0, "error": "crop model not loaded"}
+    store = get_tile_store()
+    await asyncio.to_thread(store.bind_classes, encoder.classes_ if encoder else model.classes_)
+    owm_key = os.getenv("OWM_API_KEY", "")
+    sem = asyncio.Semaphore(TILE_CONCURRENCY)
+    stats = {"cells": len(cells), "updated": 0, "unchanged": 0, "failed": 0}
+
+    async def inputs_for(cell):
+        lat, lng = center(cell)
+        old = await asyncio.to_thread(store.peek, cell)
+        async with sem:
+            # Queued behind interactive requests for the upstream quotas
+            with rate_limit.background():
+                if old is not None:
+                    weather = await _fetch_weather(lat, lng, owm_key)
+                    soil = {"N": old.inputs["N"], "P": old.inputs["P"], "K": old.inputs["K"], "ph": old.inputs["ph"]}
+                else:
+                    weather, soil = await asyncio.gather(_fetch_weather(lat, lng, owm_key), _fetch_soil(lat, lng))
+        if weather is None or soil is None:
+            stats["failed"] += 1
+            return None
+        inputs = _features(weather, soil)
+        if old is not None and not force and old.age_s < MAX_AGE_S / 2 and not _changed(old.inputs, inputs):
+            stats["unchanged"] += 1
+            return None
+        return cell, inputs
+
+    todo = [r for r in await asyncio.gather(*(inputs_for(c) for c in cells)) if r is not None]
+    if todo:
+        try:
+            ranked = await asyncio.to_thread(_top3, model, [inputs for _, inputs in todo])
+        except model_server.ModelServerError as e:
+            return dict(stats, failed=stats["failed"] + len(todo), error=f"crop model unavailable: {e}")
+        await asyncio.to_thread(store.put_many, [(cell, inputs, r) for (cell, inputs), r in zip(todo, ranked)], "refresh")
+        stats["updated"] = len(todo)
+    return stats
+
+
+def service_cells() -> list[tuple[int, int]]:
+    """Cells to keep warm: every cell with a registered farm, plus CROP_TILE_REGIONS bounding boxes."""
+    from services.crop_tiles import cells_in_bbox, CELL_DEG
+    from services.farm_index import get_farm_index
+    cells = set(get_farm_index().group_by_cell(CELL_DEG))
+    for box in filter(None, (b.strip() for b in os.getenv("CROP_TILE_REGIONS", "").split(";"))):
+        min_lat, min_lng, max_lat, max_lng = (float(v) for v in box.split(","))
+        cells.update(cells_in_bbox(min_lat, min_lng, max_lat, max_lng))
+    return sorted(cells)
+
+
+def _take_refresh_lock() -> bool:
+    """With Redis, one worker per interval does the refresh; without, one per host."""
+    from services.crop_tiles import get_tile_store
+    from services.redis_cache import get_redis
+    r = get_redis()
+    if r is not None:
+        return bool(r.set("croptiles:refresh-lock", os.getpid(), nx=True, ex=max(1, int(TILE_REFRESH_S * 0.9))))
+    return get_tile_store().try_refresh_lock()
+
+
+async def tile_refresher():
+    """Runs for the life of the worker, refreshing tiles whenever _take_refresh_lock() says this worker should."""
+    while True:
+        try:
+            if await asyncio.to_thread(_take_refresh_lock):
+                cells = await asyncio.to_thread(service_cells)
+                t0 = time.perf_counter()
+                stats = await refresh_tiles(cells)
+                print(f"Crop tiles refreshed in {time.perf_counter() - t0:.1f}s: {stats}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Crop tile refresh failed: {e}")
+        await asyncio.sleep(TILE_REFRESH_S)
@@ -0,0 +1,141 @@
+"""
+Dashboard Router — GET /api/v1/dashboard/{farm_id}
+Everything the farm dashboard renders, in one request: authenticates and loads the farm once, then computes
+weather, soil, NDVI, risk, mandi prices, price forecast and the Gemini insights concurrently, streaming each
+section the moment it is ready — NDJSON by default, Server-Sent Events with `Accept: text/event-stream`.
+The first paint comes from the fastest source; a failed or slow section is reported on its own line and
+never holds up the others.
+"""
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+import os
+import time
+
+from services import metrics
+
+router = APIRouter()
+
+SECTIONS = ("weather", "soil", "ndvi", "risk", "market", "forecast", "irrigation", "soil_insight")
+# A section still running after this long is reported as timed out; the rest of the stream carries on
+SECTION_TIMEOUT_S = float(os.getenv("DASHBOARD_SECTION_TIMEOUT_S", "10"))
+
+SECTION_LATENCY = metrics.Histogram(
+    "agriai_dashboard_section_seconds", "Time to compute one dashboard section, by outcome", ("section", "result"),
+)
+
+
+def _load_farm(farm_id: str, token: str) -> dict:
+    """The full farm row, if it belongs to the token's user (404 otherwise, like other users' farms)."""
+    from routers.farms import _get_user_id
+    from services.supabase_client import get_supabase
+    user_id = _get_user_id(token)
+    resp = get_supabase().table("farms").select("*").eq("id", farm_id).limit(1).execute()
+    if not resp.data or resp.data[0].get("user_id") != user_id:
+        raise HTTPException(404, "Farm not found")
+    return resp.data[0]
+
+
+def _sections(farm: dict) -> dict:
+    """Section name → zero-argument coroutine function producing its payload."""
+    from routers import early_warning, gemini_insights, market, price_forecast, satellite, soil, weather
+
+    lat = farm.get("location_lat") or 17.14
+    lng = farm.get("location_lng") or 78.21
+    crop = farm.get("crop") or "Rice"
+    state = farm.get("state") or "Telangana"
+
+    async def ndvi():
+        if not satellite.OWM_KEY or not farm.get("agromonitoring_polygon_id"):
+            raise HTTPException(404, "Farm polygon not registered with Agromonitoring")
+        return {"history": await satellite.fetch_ndvi(farm["agromonitoring_polygon_id"])}
+
+    async def prices():
+        table = await asyncio.to_thread(market.get_market_data)
+        return {"state": state, "prices": await asyncio.to_thread(market.prices_for, table, state, None)}
+
+    return {
+        "weather": lambda: weather.fetch_weather(lat, lng),
+        "soil": lambda: soil.fetch_soil_properties(lat, lng),
+        "ndvi": ndvi,
+        "risk": lambda: early_warning.assess_farm(farm),
+        "market": prices,
+        # ARIMA fitting is CPU-bound — run it beside the loop
+        "forecast": lambda: asyncio.to_thread(price_forecast.forecast_for, crop, state),
+        "irrigation": lambda: gemini_insights.get_irrigation_insight(lat=lat, lng=lng),
+        "soil_insight": lambda: gemini_insights.get_soil_insight(lat=lat, lng=lng),
+    }
+
+
+async def _run(name: str, fn) -> dict:
+    t0 = time.perf_counter()
+    try:
+        data = await asyncio.wait_for(fn(), SECTION_TIMEOUT_S)
+        result = {"section": name, "ok": True, "data": data}
+    except asyncio.TimeoutError:
+        result = {"section": name, "ok": False, "status": 504, "error": "Timed out"}
+    except HTTPException as e:
+        result = {"section": name, "ok": False, "status": e.status_code, "error": e.detail}
+    except Exception as e:
+        result = {"section": name, "ok": False, "status": 502, "error": f"{type(e).__name__}: {e}"}
+    elapsed = time.perf_counter() - t0
+    result["ms"] = round(elapsed * 1000, 1)
+    SECTION_LATENCY.observe(elapsed, section=name, result="ok" if result["ok"] else str(result["status"]))
+    return result
+
+
+@router.get("/dashboard/{farm_id}")
+async def farm_dashboard(
+    farm_id: str,
+    request: Request,
+    authorization: str = Header(...),
+    sections: Optional[str] = Query(None, description=f"Comma-separated subset of {', '.join(SECTIONS)}"),
+):
+    """
+    One `farm` line, then one line per section in completion order ({"section", "ok", "data" | "status" +
+    "error", "ms"}), then a `done` line. As SSE each line is an event named after its section.
+    """
+    wanted = SECTIONS
+    if sections:
+        wanted = tuple(s.strip() for s in sections.split(",") if s.strip())
+        unknown = set(wanted) - set(SECTIONS)
+        if unknown:
+            raise HTTPException(400, f"Unknown sections: {', '.join(sorted(unknown))}")
+
+    # Auth and farm lookup once for every section (sync Supabase clients — off the loop)
+    farm = await asyncio.to_thread(_load_farm, farm_id, authorization.replace("Bearer ", ""))
+    work = _sections(farm)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    def frame(event: str, payload: dict) -> str:
+        data = json.dumps(payload, default=str, ensure_ascii=False)
+        return f"event: {event}\ndata: {data}\n\n" if sse else data + "\n"
+
+    async def lines():
+        t0 = time.perf_counter()
+        # Started before the first yield, so every section runs while the farm line is on the wire
+        tasks = [asyncio.create_task(_run(name, work[name])) for name in wanted]
+        try:
+            yield frame("farm", {"section": "farm", "ok": True, "data": {
+                k: farm.get(k) for k in ("id", "name", "crop", "area_acres", "location_lat", "location_lng",
+                                         "state", "district", "growth_stage")
+            }})
+            failed = 0
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                failed += not result["ok"]
+                yield frame(result["section"], result)
+            yield frame("done", {"section": "done", "sections": len(tasks), "failed": failed,
+                                 "ms": round((time.perf_counter() - t0) * 1000, 1)})
+        finally:
+            # Client went away mid-stream — don't leave sections running for nobody
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        lines(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Vary": "Accept"},
+    )
@@ -1,11 +1,17 @@
 """
-Disease Detection Router — POST /api/v1/disease/detect
+Disease Detection Router — POST /api/v1/disease/detect, POST /api/v1/disease/scan
 Runs MobileNetV2 CNN inference on uploaded leaf images
 """
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
+import asyncio
 import os
 import json
+import time
+
+from services import metrics
 
 router = APIRouter()
 
@@ -19,29 +25,80 @@ if os.path.exists(ADVISORY_PATH):
 # ML model — loaded lazily on first request
 _model = None
 _class_names = None
+_server_retry_at = 0.0      # MODEL_SERVING=server fell back in-process: when to try the server again
 
 
 def _load_model():
-    """Load disease detection model and class names."""
-    global _model, _class_names
-    model_path = os.path.join(os.path.dirname(__file__), "..", "ml_models", "disease_model.h5")
+    """
+    Disease model and class names. With MODEL_SERVING=server inference goes to services/model_server.py,
+    otherwise the backend from services/disease_inference.py is loaded here. If the server can't be reached
+    the in-process backend is used, and the server is tried again every MODEL_SERVER_RETRY_S.
+    """
+    global _model, _class_names, _server_retry_at
+    from services import model_server
+    server = model_server.serving_mode() == "server"
+    if _model is not None and not (server and _server_retry_at and time.monotonic() >= _server_retry_at):
+        return _model, _class_names
     classes_path = os.path.join(os.path.dirname(__file__), "..", "ml_models", "class_names.json")
 
-    if not os.path.exists(model_path):
-        return None, None
-
     try:
-        import tensorflow as tf
-        _model = tf.keras.models.load_model(model_path)
+        if server:
+            try:
+                if "disease_backend" in model_server.get_client().info():
+                    _model = model_server.RemoteDiseaseModel(model_server.get_client())
+                    _server_retry_at = 0.0
+                else:
+                    print("Model server has no disease model — loading it in-process")
+                    _server_retry_at = time.monotonic() + model_server.RETRY_S
+            except model_server.ModelServerError as e:
+                print(f"{e} — loading disease model in-process")
+                _server_retry_at = time.monotonic() + model_server.RETRY_S
+        if _model is None:
+            _model, _ = _load_local()
+        if _model is None:
+            return None, None
         if os.path.exists(classes_path):
             with open(classes_path) as f:
-                _class_names = json.load(f)
+                names = json.load(f)
+            # class_names.json maps "0", "1", ... → name; index it as a list
+            _class_names = [names[k] for k in sorted(names, key=int)] if isinstance(names, dict) else names
         return _model, _class_names
     except Exception as e:
         print(f"Failed to load disease model: {e}")
         return None, None
 
 
+def _load_local():
+    """Load the inference backend into this process (also used by the model server)."""
+    from services.disease_inference import load_backend
+    return load_backend(), None
+
+
+def _classify(predictions, class_names) -> dict:
+    """Top-3 classes, confidence and severity for one image's class probabilities."""
+    top3 = []
+    for idx in predictions.argsort()[-3:][::-1]:
+        name = class_names[idx] if class_names and idx < len(class_names) else f"Class_{idx}"
+        conf = round(float(predictions[idx]) * 100, 1)
+        top3.append({"name": name.replace("___", " — ").replace("_", " "), "confidence": conf})
+
+    confidence = top3[0]["confidence"]
+    return {
+        "disease": top3[0]["name"],
+        "confidence": confidence,
+        "severity": "Critical" if confidence > 80 else "High" if confidence > 60 else "Medium",
+        "top3": top3,
+    }
+
+
+def _advisory(disease_name: str, severity: str) -> dict:
+    return ADVISORY.get(disease_name, {
+        "treatment": "Consult local agricultural extension officer.",
+        "prevention": "Monitor crop regularly. Maintain proper spacing.",
+        "severity": severity,
+    })
+
+
 @router.post("/disease/detect")
 async def detect_disease(file: UploadFile = File(...)):
     """Upload a leaf image to detect disease using MobileNetV2 CNN."""
@@ -59,16 +116,17 @@ async def detect_disease(file: UploadFile = File(...)):
         from uuid import uuid4
         sb = get_supabase()
         filename = f"{uuid4()}.jpg"
-        sb.storage.from_("leaf-images").upload(filename, contents, {"content-type": file.content_type})
+        await asyncio.to_thread(
+            sb.storage.from_("leaf-images").upload, filename, contents, {"content-type": file.content_type},
+        )
     except Exception:
         filename = "upload_failed"
 
     # Run ML inference
-    model, class_names = _load_model()
+    model, class_names = await asyncio.to_thread(_load_model)
     if model is None:
-        import time
         import random
-        time.sleep(1.5) # Simulate processing time
+        await asyncio.sleep(1.5) # Simulate processing time
         mock_diseases = [
             ("Tomato — Late Blight", 96.4, "Critical", "Apply appropriate fungicide immediately. Remove and destroy infected leaves."),
             ("Apple — Apple Scab", 88.2, "High", "Use recommended fungicide. Ensure proper tree spacing for air circulation."),
@@ -87,54 +145,171 @@ async def detect_disease(file: UploadFile = File(...)):
         }
 
     # Preprocess image
+    from services import model_server
     try:
-        from PIL import Image
+        from services.disease_inference import preprocess
         import numpy as np
-        import io
-
-        img = Image.open(io.BytesIO(contents)).resize((224, 224))
-        img_array = np.array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-
-        # Predict
-        predictions = model.predict(img_array, verbose=0)[0]
-        top3_indices = predictions.argsort()[-3:][::-1]
-
-        top3 = []
-        for idx in top3_indices:
-            name = class_names[idx] if class_names and idx < len(class_names) else f"Class_{idx}"
-            conf = round(float(predictions[idx]) * 100, 1)
-            top3.append({"name": name.replace("___", " — ").replace("_", " "), "confidence": conf})
-
-        disease_name = top3[0]["name"]
-        confidence = top3[0]["confidence"]
-        severity = "Critical" if confidence > 80 else "High" if confidence > 60 else "Medium"
-
-        advisory = ADVISORY.get(disease_name, {
-            "treatment": "Consult local agricultural extension officer.",
-            "prevention": "Monitor crop regularly. Maintain proper spacing.",
-            "severity": severity,
+
+        img_array = np.expand_dims(await asyncio.to_thread(preprocess, contents), axis=0)
+
+        # Predict (beside the loop, like the field scan)
+        t0 = time.perf_counter()
+        predictions = (await asyncio.to_thread(model.predict, img_array))[0]
+        metrics.observe_inference(f"disease_{model.name}", time.perf_counter() - t0, len(img_array))
+        result = _classify(predictions, class_names)
+        result["advisory"] = _advisory(result["disease"], result["severity"])
+    except model_server.ModelServerError as e:
+        raise HTTPException(503, f"Disease model unavailable: {e}")
+    except Exception as e:
+        raise HTTPException(500, f"Inference failed: {str(e)}")
+
+    # Save to predictions table (written behind, in batches; a full buffer spools to SQLite, so in a thread)
+    from services.outbox import get_outbox
+    try:
+        await asyncio.to_thread(get_outbox().add, "predictions", {
+            "feature_type": "disease",
+            "input_data": {"filename": filename, "content_type": file.content_type},
+            "output_data": result,
         })
+    except Exception as e:
+        print(f"Prediction write failed: {e}")
 
-        result = {
-            "disease": disease_name,
-            "confidence": confidence,
-            "severity": severity,
-            "top3": top3,
-            "advisory": advisory,
-        }
+    return result
 
-        # Save to predictions table
-        try:
-            sb.table("predictions").insert({
-                "feature_type": "disease",
-                "input_data": {"filename": filename, "content_type": file.content_type},
-                "output_data": result,
-            }).execute()
-        except Exception:
-            pass
 
-        return result
+# ── Field scan: many leaves per request ─────────────────────────────────────
 
+ACCEPTED_TYPES = ("image/jpeg", "image/png")
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+SCAN_MAX_IMAGES = int(os.getenv("SCAN_MAX_IMAGES", "50"))
+SCAN_BATCH_SIZE = int(os.getenv("SCAN_BATCH_SIZE", "8"))
+
+DECODE_THREADS = min(4, os.cpu_count() or 1)
+
+_decode_pool: ThreadPoolExecutor | None = None
+
+
+def _get_decode_pool() -> ThreadPoolExecutor:
+    # PIL releases the GIL while decoding/resizing, so a few threads decode in parallel
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ThreadPoolExecutor(max_workers=DECODE_THREADS, thread_name_prefix="scan-decode")
+    return _decode_pool
+
+
+def _decode(index: int, contents: bytes):
+    from services.disease_inference import preprocess
+    try:
+        return index, preprocess(contents), None
     except Exception as e:
-        raise HTTPException(500, f"Inference failed: {str(e)}")
+        return index, None, f"Could not decode image: {e}"
+
+
+def _summary(results: list[dict], failed: int, plot_id: str | None) -> dict:
+    """Per-plot prevalence of each diagnosis among the images that were classified."""
+    counts: dict[str, int] = {}
+    for r in results:
+        counts[r["disease"]] = counts.get(r["disease"], 0) + 1
+    total = len(results)
+    diseased = sum(n for name, n in counts.items() if "healthy" not in name.lower())
+    share = diseased / total if total else 0.0
+    return {
+        "type": "summary",
+        "plot_id": plot_id,
+        "images": total + failed,
+        "classified": total,
+        "failed": failed,
+        "prevalence": {name: round(n / total, 3) for name, n in sorted(counts.items(), key=lambda kv: -kv[1])},
+        "diseased_share": round(share, 3),
+        "severity": "Critical" if share > 0.5 else "High" if share > 0.2 else "Medium" if share > 0 else "Low",
+        "advisories": {
+            name: _advisory(name, next(r["severity"] for r in results if r["disease"] == name))
+            for name in counts if "healthy" not in name.lower()
+        },
+    }
+
+
+@router.post("/disease/scan")
+async def scan_field(
+    files: list[UploadFile] = File(..., description=f"Up to {SCAN_MAX_IMAGES} JPEG/PNG leaf images"),
+    plot_id: Optional[str] = Form(None),
+):
+    """
+    Classify every leaf photo of a plot in one request. Streams NDJSON: one `image` line per photo
+    as its batch finishes (rejected uploads first, then completion order, with its upload `index`),
+    then one `summary` line.
+    """
+    if len(files) > SCAN_MAX_IMAGES:
+        raise HTTPException(400, f"At most {SCAN_MAX_IMAGES} images per scan")
+    model, class_names = await asyncio.to_thread(_load_model)
+    if model is None:
+        raise HTTPException(503, "Disease model not loaded")
+
+    # Uploads are closed once this handler returns, so they are consumed here — one at a time, reading at
+    # most MAX_IMAGE_BYTES + 1 bytes each and handing it to the decode pool. Only the 224×224 arrays are
+    # kept, and at most DECODE_THREADS raw images are held at once.
+    loop = asyncio.get_running_loop()
+    names = [f.filename for f in files]
+    rejected, decodes = [], []
+    for i, f in enumerate(files):
+        if f.content_type not in ACCEPTED_TYPES:
+            rejected.append(i)
+            continue
+        in_flight = [d for d in decodes if not d.done()]
+        if len(in_flight) >= DECODE_THREADS:
+            await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        contents = await f.read(MAX_IMAGE_BYTES + 1)
+        if len(contents) > MAX_IMAGE_BYTES:
+            rejected.append(i)
+            continue
+        decodes.append(loop.run_in_executor(_get_decode_pool(), _decode, i, contents))
+
+    async def lines():
+        import numpy as np
+        results, failed = [], len(rejected)
+        for i in rejected:
+            yield json.dumps({"type": "image", "index": i, "filename": names[i],
+                              "error": "Only JPEG/PNG images under 5MB accepted"}) + "\n"
+
+        batch: list[tuple[int, "np.ndarray"]] = []
+        remaining = len(decodes)
+        for next_decoded in asyncio.as_completed(decodes):
+            i, image, error = await next_decoded
+            remaining -= 1
+            if error:
+                failed += 1
+                yield json.dumps({"type": "image", "index": i, "filename": names[i], "error": error}) + "\n"
+            else:
+                batch.append((i, image))
+            if batch and (len(batch) >= SCAN_BATCH_SIZE or remaining == 0):
+                t0 = time.perf_counter()
+                try:
+                    predictions = await asyncio.to_thread(model.predict, np.stack([img for _, img in batch]))
+                except Exception as e:
+                    failed += len(batch)
+                    for j, _ in batch:
+                        yield json.dumps({"type": "image", "index": j, "filename": names[j],
+                                          "error": f"Inference failed: {e}"}) + "\n"
+                    batch = []
+                    continue
+                metrics.observe_inference(f"disease_{model.name}", time.perf_counter() - t0, len(batch))
+                for (j, _), probs in zip(batch, predictions):
+                    result = _classify(probs, class_names)
+                    results.append(result)
+                    yield json.dumps({"type": "image", "index": j, "filename": names[j], **result},
+                                     ensure_ascii=False) + "\n"
+                batch = []
+
+        summary = _summary(results, failed, plot_id)
+        from services.outbox import get_outbox
+        try:
+            await asyncio.to_thread(get_outbox().add, "predictions", {
+                "feature_type": "disease_scan",
+                "input_data": {"plot_id": plot_id, "images": len(files)},
+                "output_data": {k: v for k, v in summary.items() if k != "advisories"},
+            })
+        except Exception as e:
+            print(f"Prediction write failed: {e}")
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
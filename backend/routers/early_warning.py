@@ -4,7 +4,10 @@ Rule-based crop failure risk scoring (MVP — upgradable to XGBoost later)
 """
 from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
-import httpx
+from services.http_client import upstream_client
+from services.alert_hub import get_alert_hub
+from services.outbox import get_outbox
+import asyncio
 import os
 
 router = APIRouter()
@@ -95,11 +98,17 @@ async def predict_risk(req: RiskRequest, authorization: str = Header(...)):
     if not farm_resp.data:
         raise HTTPException(404, "Farm not found")
 
-    farm = farm_resp.data
-    lat = farm.get("location_lat", 17.14)
-    lng = farm.get("location_lng", 78.21)
-    crop = farm.get("crop", "Rice")
-    growth_stage = farm.get("growth_stage", "Vegetative")
+    return await assess_farm(farm_resp.data)
+
+
+async def assess_farm(farm: dict) -> dict:
+    """Risk score for a loaded farm row; queues the alert / prediction writes (shared with /dashboard)."""
+    farm_id = farm["id"]
+    # Columns are nullable (a farm may be created without a location) — None means "use the default"
+    lat = farm.get("location_lat") or 17.14
+    lng = farm.get("location_lng") or 78.21
+    crop = farm.get("crop") or "Rice"
+    growth_stage = farm.get("growth_stage") or "Vegetative"
 
     # Fetch live data
     owm_key = os.getenv("OWM_API_KEY", "")
@@ -108,9 +117,19 @@ async def predict_risk(req: RiskRequest, authorization: str = Header(...)):
     soil_moisture = 50.0
     ndvi = 0.55
 
-    if owm_key:
+    # Observed conditions and 7-day rain from the local observation store — no upstream call when it has them
+    from services.weather_store import get_weather_store
+    store = get_weather_store()
+    current = await asyncio.to_thread(store.latest, lat, lng)
+    week = await asyncio.to_thread(store.window, lat, lng, 7 * 24)
+
+    if current is not None:
+        temperature = current["temp"]
+        soil_moisture = current["humidity"] * 0.75  # estimate
+        rainfall_7d = (current["rain_1h"] or 0) * 24 * 7  # rough estimate until the store has a week
+    elif owm_key:
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
+            async with upstream_client(timeout=10) as client:
                 r = await client.get(
                     "https://api.openweathermap.org/data/2.5/weather",
                     params={"lat": lat, "lon": lng, "appid": owm_key, "units": "metric"},
@@ -122,39 +141,44 @@ async def predict_risk(req: RiskRequest, authorization: str = Header(...)):
                     rainfall_7d = w.get("rain", {}).get("1h", 0) * 24 * 7  # rough estimate
         except Exception:
             pass
+    if week is not None:
+        rainfall_7d = week["rain_mm"]
 
     # Compute risk
     result = compute_risk_score(ndvi, soil_moisture, temperature, rainfall_7d, crop, growth_stage)
 
-    result["farm_id"] = req.farm_id
+    result["farm_id"] = farm_id
     result["farm_name"] = farm.get("name", "Unknown")
     result["inputs_used"] = {
         "ndvi": ndvi, "soil_moisture": soil_moisture,
         "temperature": temperature, "rainfall_7d": rainfall_7d,
+        "rainfall_source": "observed" if week is not None else "estimate",
     }
 
-    # If critical → insert alert
+    # If critical → queue the alert (repeats for this farm inside the dedup window are dropped)
+    # and push it to the farm owner's open alert streams. The dedup reservation is a Redis SET NX and a
+    # full buffer spools to SQLite, so both outbox calls run in a thread
+    outbox = get_outbox()
     if result["risk_score"] > 0.7:
-        try:
-            sb.table("alerts").insert({
-                "farm_id": req.farm_id,
-                "alert_type": "Risk",
-                "severity": result["severity"],
-                "message": f"Risk score {result['risk_score']:.0%} — {', '.join(result['flags'][:2])}",
-                "icon": "⚠️",
-            }).execute()
-        except Exception:
-            pass
-
-    # Save to predictions table
-    try:
-        sb.table("predictions").insert({
-            "farm_id": req.farm_id,
-            "feature_type": "risk",
-            "input_data": result["inputs_used"],
-            "output_data": result,
-        }).execute()
-    except Exception:
-        pass
+        alert = await asyncio.to_thread(outbox.add_alert, {
+            "farm_id": farm_id,
+            "alert_type": "Risk",
+            "severity": result["severity"],
+            "message": f"Risk score {result['risk_score']:.0%} — {', '.join(result['flags'][:2])}",
+            "icon": "⚠️",
+        })
+        if alert is not None:
+            try:
+                await get_alert_hub().publish(alert, user_id=farm.get("user_id"), farm_id=farm_id)
+            except Exception as e:
+                print(f"Alert push failed: {e}")
+
+    # Save to predictions table (written behind, in batches)
+    await asyncio.to_thread(outbox.add, "predictions", {
+        "farm_id": farm_id,
+        "feature_type": "risk",
+        "input_data": result["inputs_used"],
+        "output_data": result,
+    })
 
     return result
@@ -1,15 +1,29 @@
 """
 Farms Router — GET/POST /api/v1/farms
-CRUD for user's farms via Supabase
+CRUD for user's farms via Supabase, plus nearby / bounding-box / per-district queries
+served from the in-memory spatial index (services/farm_index.py)
 """
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Header, Query
 from pydantic import BaseModel
 from typing import Optional
-import httpx
+from datetime import datetime
+from services.http_client import upstream_client
+from services.farm_index import get_farm_index
+import asyncio
+import base64
+import json
 import os
+import uuid
 
 router = APIRouter()
 
+# Columns a client may ask for with ?fields= (id and created_at are always fetched — they form the cursor)
+FARM_FIELDS = {
+    "id", "user_id", "name", "crop", "area_acres", "location_lat", "location_lng", "soil_type",
+    "state", "district", "growth_stage", "polygon", "agromonitoring_polygon_id", "created_at",
+}
+MAX_PAGE_SIZE = 200
+
 
 class FarmCreate(BaseModel):
     name: str
@@ -34,23 +48,61 @@ def _get_user_id(token: str) -> str:
     return user.user.id
 
 
+def _encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    """(created_at, id) from a cursor — both re-serialised from parsed values, as they go into a PostgREST filter."""
+    try:
+        created_at, farm_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(farm_id))
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
 @router.get("/farms")
-async def list_farms(authorization: str = Header(...)):
-    """List all farms belonging to the authenticated user."""
-    token = authorization.replace("Bearer ", "")
-    user_id = _get_user_id(token)
+async def list_farms(
+    authorization: str = Header(...),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns, e.g. id,name,crop"),
+):
+    """
+    List the authenticated user's farms, newest first, one page at a time.
+    Keyset pagination on (created_at, id): each page is an index range scan, however deep the page.
+    """
+    user_id = await asyncio.to_thread(_get_user_id, authorization.replace("Bearer ", ""))
+
+    wanted = None
+    if fields:
+        wanted = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = wanted - FARM_FIELDS
+        if unknown:
+            raise HTTPException(400, f"Unknown fields: {', '.join(sorted(unknown))}")
+    columns = ",".join(sorted((wanted or FARM_FIELDS) | {"id", "created_at"}))
 
     from services.supabase_client import get_supabase
     sb = get_supabase()
-    resp = sb.table("farms").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-    return resp.data
+    query = sb.table("farms").select(columns).eq("user_id", user_id)
+    if cursor:
+        created_at, farm_id = _decode_cursor(cursor)
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{farm_id}")')
+    query = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+    rows = (await asyncio.to_thread(query.execute)).data or []
+
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    if wanted is not None:
+        rows = [{k: v for k, v in row.items() if k in wanted} for row in rows]
+    return {"farms": rows, "next_cursor": next_cursor}
 
 
 @router.post("/farms")
 async def create_farm(farm: FarmCreate, authorization: str = Header(...)):
     """Create a new farm for the authenticated user."""
-    token = authorization.replace("Bearer ", "")
-    user_id = _get_user_id(token)
+    user_id = await asyncio.to_thread(_get_user_id, authorization.replace("Bearer ", ""))
 
     from services.supabase_client import get_supabase
     sb = get_supabase()
@@ -66,17 +118,74 @@ async def create_farm(farm: FarmCreate, authorization: str = Header(...)):
         except Exception:
             pass  # non-critical — farm still created without NDVI tracking
 
-    resp = sb.table("farms").insert(farm_data).execute()
+    resp = await asyncio.to_thread(sb.table("farms").insert(farm_data).execute)
+    if resp.data:
+        (await asyncio.to_thread(get_farm_index)).upsert(resp.data[0])
     return resp.data[0] if resp.data else resp.data
 
 
+def _public(farm: dict, user_id: str, distance_km: float | None = None) -> dict:
+    """Other users' farms are shown without id/name/owner and with ~1 km coordinate precision."""
+    own = farm.get("user_id") == user_id
+    out = {
+        "own": own,
+        "crop": farm.get("crop"),
+        "area_acres": farm.get("area_acres"),
+        "state": farm.get("state"),
+        "district": farm.get("district"),
+        "lat": farm["location_lat"] if own else round(farm["location_lat"], 2),
+        "lng": farm["location_lng"] if own else round(farm["location_lng"], 2),
+    }
+    if own:
+        out["id"], out["name"] = farm["id"], farm.get("name")
+    if distance_km is not None:
+        out["distance_km"] = round(distance_km, 2)
+    return out
+
+
+@router.get("/farms/nearby")
+async def nearby_farms(
+    lat: float = Query(..., description="Latitude"),
+    lng: float = Query(..., description="Longitude"),
+    radius_km: float = Query(10, gt=0, le=200),
+    limit: int = Query(50, ge=1, le=500),
+    authorization: str = Header(...),
+):
+    """Farms within radius_km of a point, nearest first."""
+    user_id = await asyncio.to_thread(_get_user_id, authorization.replace("Bearer ", ""))
+    hits = (await asyncio.to_thread(get_farm_index)).within_radius(lat, lng, radius_km, limit)
+    return {"count": len(hits), "farms": [_public(f, user_id, d) for d, f in hits]}
+
+
+@router.get("/farms/bbox")
+async def farms_in_bbox(
+    min_lat: float = Query(...), min_lng: float = Query(...),
+    max_lat: float = Query(...), max_lng: float = Query(...),
+    limit: int = Query(500, ge=1, le=5000),
+    authorization: str = Header(...),
+):
+    """Farms inside a bounding box (e.g. the map viewport)."""
+    if min_lat > max_lat or min_lng > max_lng:
+        raise HTTPException(400, "min_lat/min_lng must not exceed max_lat/max_lng")
+    user_id = await asyncio.to_thread(_get_user_id, authorization.replace("Bearer ", ""))
+    farms = (await asyncio.to_thread(get_farm_index)).within_bbox(min_lat, min_lng, max_lat, max_lng)
+    return {"count": len(farms), "farms": [_public(f, user_id) for f in farms[:limit]]}
+
+
+@router.get("/farms/regions")
+async def farm_regions(state: Optional[str] = Query(None), authorization: str = Header(...)):
+    """Per-district farm counts, total acreage and most common crops."""
+    await asyncio.to_thread(_get_user_id, authorization.replace("Bearer ", ""))
+    return (await asyncio.to_thread(get_farm_index)).district_stats(state)
+
+
 async def _register_agromonitoring_polygon(farm: FarmCreate) -> str:
     """Register farm boundary with Agromonitoring API and return polygon_id."""
     owm_key = os.getenv("OWM_API_KEY", "")
     if not owm_key:
         raise Exception("No OWM key")
 
-    async with httpx.AsyncClient(timeout=10) as client:
+    async with upstream_client(timeout=10) as client:
         resp = await client.post(
             f"https://agromonitoring.com/api/v1/polygons?appid={owm_key}",
             json={
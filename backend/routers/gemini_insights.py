@@ -3,17 +3,28 @@ Gemini Insights Router — GET /api/v1/insights/irrigation & /api/v1/insights/so
 Generates intelligent agricultural recommendations using Gemini API based on real-time environmental data.
 """
 from fastapi import APIRouter, Query, HTTPException
-import httpx
+from services.http_client import upstream_client
+from services import metrics
+import asyncio
 import os
-import google.generativeai as genai
 import json
 
 router = APIRouter()
 
-# Initialize Gemini
+# Gemini SDK — imported and configured lazily (the import alone takes ~1s on a cold worker)
 GEMINI_KEY = os.getenv("GEMINI_API_KEY", "")
-if GEMINI_KEY:
-    genai.configure(api_key=GEMINI_KEY)
+GEMINI_HOST = "generativelanguage.googleapis.com"
+_genai = None
+
+
+def _get_genai():
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        if GEMINI_KEY:
+            genai.configure(api_key=GEMINI_KEY)
+        _genai = genai
+    return _genai
 
 # Reuse existing environmental fetchers if possible, but let's quickly fetch directly or import logic.
 # For simplicity, we can just do a quick fetch to OWM/ISRIC right here to combine context for Gemini.
@@ -23,7 +34,7 @@ OWM_KEY = os.getenv("OWM_API_KEY", "")
 async def get_context(lat: float, lng: float) -> dict:
     context = {"weather": "Unknown", "soil": "Unknown"}
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
+        async with upstream_client(timeout=10) as client:
             # Weather fetch
             if OWM_KEY:
                 w_resp = await client.get(
@@ -82,8 +93,10 @@ async def get_irrigation_insight(
     }}
     """
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
+        model = _get_genai().GenerativeModel('gemini-2.5-flash')
+        with metrics.upstream_timer(GEMINI_HOST):
+            # The SDK call is synchronous — keep it off the event loop
+            response = await asyncio.to_thread(model.generate_content, prompt)
         text = response.text.strip()
         # Clean any markdown formatting if present
         if text.startswith("```json"):
@@ -125,8 +138,10 @@ async def get_soil_insight(
     }}
     """
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
+        model = _get_genai().GenerativeModel('gemini-2.5-flash')
+        with metrics.upstream_timer(GEMINI_HOST):
+            # The SDK call is synchronous — keep it off the event loop
+            response = await asyncio.to_thread(model.generate_content, prompt)
         text = response.text.strip()
         if text.startswith("```json"):
             text = text[7:-3]
@@ -1,74 +1,214 @@
 """
-Market Router — GET /api/v1/market/prices
+Market Router — GET /api/v1/market/prices, GET /api/v1/market/history
 Fetches mandi prices from local Kaggle CSV dataset
 """
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
+from datetime import date, timedelta
 import os
-import pandas as pd
+
+from services import conditional, encoding
 
 router = APIRouter()
 
-CSV_PATH = r"d:\11-11\Agriculture_price_dataset.csv"
+CSV_PATH = os.getenv("MARKET_CSV_PATH", r"d:\11-11\Agriculture_price_dataset.csv")
+
+# Cache for the loaded table to prevent reading it on every request
+_table = None
+
+# The dataset only changes on redeploy — let browsers/CDNs reuse a response for 15 min, then revalidate
+PRICES_CACHE = conditional.cache_control(900, stale_while_revalidate=3600)
 
-# Cache for the loaded dataframe to prevent reading it on every request
-_df = None
 
 def get_market_data():
-    global _df
-    if _df is None:
-        if not os.path.exists(CSV_PATH):
-            raise FileNotFoundError(f"Market dataset not found at {CSV_PATH}")
-        _df = pd.read_csv(CSV_PATH)
-        # Convert date to datetime for easier sorting/filtering
-        _df['Price Date'] = pd.to_datetime(_df['Price Date'], format='%d/%m/%Y', errors='coerce')
-    return _df
+    """
+    Market prices as a MarketTable sorted by (state, commodity, date).
+    Uses the memory-mapped export shared by all workers when present, else parses the CSV.
+    """
+    global _table
+    if _table is None:
+        from services.shared_data import MarketTable, shared_path
+        path = shared_path("market")
+        if path:
+            _table = MarketTable.load(path)
+        else:
+            if not os.path.exists(CSV_PATH):
+                raise FileNotFoundError(f"Market dataset not found at {CSV_PATH}")
+            _table = MarketTable.from_csv(CSV_PATH)
+    return _table
+
+
+def _latest_prices(table, state: str, commodity: str | None) -> list[dict]:
+    """Latest positive modal price per commodity for a state, most recently updated first."""
+    import numpy as np
+
+    wanted = set(table.codes("commodity", commodity)) if commodity else None
+    if wanted is not None and not wanted:
+        return []
+
+    names = table.categories["commodity"]
+    cols = table.cols
+    latest: dict[str, tuple[int, dict]] = {}
+    for state_code in table.codes("state", state):
+        rows = table.rows_for(state_code)
+        codes = np.asarray(cols["commodity"][rows])
+        if not len(codes):
+            continue
+        # Each commodity is a contiguous, date-ascending run inside the state's rows
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+        ends = np.append(starts[1:], len(codes))
+        for lo, hi in zip(starts, ends):
+            code = int(codes[lo])
+            if code < 0 or (wanted is not None and code not in wanted):
+                continue
+            lo, hi = rows.start + int(lo), rows.start + int(hi)
+            priced = np.flatnonzero(cols["modal_price"][lo:hi] > 0)
+            if not len(priced):
+                continue
+            i = lo + int(priced[-1])
+            date = int(cols["date"][i])
+            name = names[code]
+            if name in latest and latest[name][0] >= date:
+                continue
+            low, high = float(cols["min_price"][i]), float(cols["max_price"][i])
+            latest[name] = (date, {
+                "name": name,
+                "price": float(cols["modal_price"][i]),
+                "change": 0,
+                "vol": 0,
+                "low": low if low == low else 0.0,     # NaN → 0.0
+                "high": high if high == high else 0.0,
+            })
+
+    return [entry for _, entry in sorted(latest.values(), key=lambda t: t[0], reverse=True)]
+
+
+def prices_for(table, state: str, commodity: str | None) -> list[dict]:
+    prices = _latest_prices(table, state, commodity)
+
+    # If no data found for the state (e.g. Telangana might not be in the mock dataset),
+    # return some defaults from another state just so the UI isn't empty MVP
+    if not prices and state.lower() == "telangana":
+        prices = _latest_prices(table, "Maharashtra", commodity)
+    return prices
 
 
 @router.get("/market/prices")
 async def get_market_prices(
+    request: Request,
     state: str = Query("Telangana", description="State name"),
     commodity: str = Query(None, description="Optional crop filter"),
 ):
     """Fetch mandi prices from local CSV dataset."""
     try:
-        df = get_market_data()
+        table = get_market_data()
     except Exception as e:
         raise HTTPException(500, str(e))
 
-    # Filter by state (case-insensitive)
-    mask = df['STATE'].str.lower() == state.lower()
-    
-    if commodity:
-        mask = mask & (df['Commodity'].str.lower() == commodity.lower())
-        
-    filtered = df[mask]
-    
-    # Group by commodity, take latest price per crop
-    # Sort by date descending so the first one we see is the latest
-    filtered = filtered.sort_values(by='Price Date', ascending=False)
-    
-    crop_map = {}
-    for _, row in filtered.iterrows():
-        name = row['Commodity']
-        if pd.isna(name): continue
-        
-        price = float(row['Modal_Price']) if pd.notna(row['Modal_Price']) else 0.0
-        min_p = float(row['Min_Price']) if pd.notna(row['Min_Price']) else 0.0
-        max_p = float(row['Max_Price']) if pd.notna(row['Max_Price']) else 0.0
-
-        if name not in crop_map and price > 0:
-            crop_map[name] = {
-                "name": name,
-                "price": price,
-                "change": 0,  
-                "vol": 0,
-                "low": min_p,
-                "high": max_p,
-            }
+    # The ETag depends only on the dataset and the query, so a revalidation costs no lookup or serialization
+    fmt = encoding.negotiate(request)
+    etag = conditional.etag_for("market", table.version, state.strip().lower(), (commodity or "").strip().lower(), fmt)
+    cached = conditional.not_modified(request, etag, PRICES_CACHE, "market_prices", vary="Accept")
+    if cached is not None:
+        return cached
 
-    # If no data found for the state (e.g. Telangana might not be in the mock dataset),
-    # return some defaults from another state just so the UI isn't empty MVP
-    if not crop_map and state.lower() == "telangana":
-        return await get_market_prices(state="Maharashtra", commodity=commodity)
+    prices = prices_for(table, state, commodity)
+    body, media_type = encoding.encode_series(fmt, prices, meta={"state": state}, constant_keys=("change", "vol"))
+    return conditional.response(request, body, media_type, PRICES_CACHE, "market_prices", etag=etag, vary="Accept")
+
+
+# ── Price history ───────────────────────────────────────────────────────────
+
+INTERVALS = ("daily", "weekly", "monthly")
+DEFAULT_HISTORY_DAYS = 365
+_EPOCH = date(1970, 1, 1)
+
+
+def _bucket_starts(days, interval: str):
+    """Bucket key (first day of the day/ISO week/month, days since epoch) for each date."""
+    import numpy as np
+    if interval == "daily":
+        return days
+    if interval == "weekly":
+        return days - (days + 3) % 7                       # 1970-01-01 was a Thursday → Monday start
+    months = days.astype("datetime64[D]").astype("datetime64[M]")
+    return months.astype("datetime64[D]").astype(np.int64)
+
+
+def _history(table, state: str, commodity: str, market: str | None,
+             start_day: int, end_day: int, interval: str) -> list[dict]:
+    """
+    Downsampled price series: per bucket the lowest min price, median modal price, highest max price,
+    and first/last modal price (open/close). Each (state, commodity) series is a contiguous date-sorted
+    run, so the range is two binary searches; only the rows inside it are touched.
+    """
+    import numpy as np
+
+    cols = table.cols
+    slices = [table.range_for(s, c, start_day, end_day)
+              for s in table.codes("state", state) for c in table.codes("commodity", commodity)]
+    rows = np.concatenate([np.arange(sl.start, sl.stop) for sl in slices]) if slices else np.empty(0, np.int64)
+    if market:
+        rows = rows[np.isin(cols["market"][rows], table.codes("market", market))]
+    rows = rows[cols["modal_price"][rows] > 0]               # also drops NaN
+    if len(slices) > 1:
+        rows = rows[np.argsort(cols["date"][rows], kind="stable")]
+    if not len(rows):
+        return []
+
+    days = np.asarray(cols["date"][rows], dtype=np.int64)
+    modal = np.asarray(cols["modal_price"][rows])
+    low = np.where(np.isnan(cols["min_price"][rows]), modal, cols["min_price"][rows])
+    high = np.where(np.isnan(cols["max_price"][rows]), modal, cols["max_price"][rows])
+
+    keys = _bucket_starts(days, interval)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    ends = np.append(starts[1:], len(keys))
+    mins, maxs = np.minimum.reduceat(low, starts), np.maximum.reduceat(high, starts)
+    return [
+        {
+            "date": (_EPOCH + timedelta(days=int(keys[lo]))).isoformat(),
+            "min": float(mins[b]),
+            "modal": float(np.median(modal[lo:hi])),
+            "max": float(maxs[b]),
+            "open": float(modal[lo]),
+            "close": float(modal[hi - 1]),
+            "count": int(hi - lo),
+        }
+        for b, (lo, hi) in enumerate(zip(starts, ends))
+    ]
+
+
+@router.get("/market/history")
+async def get_market_history(
+    request: Request,
+    state: str = Query(..., description="State name"),
+    commodity: str = Query(..., description="Commodity name"),
+    market: str = Query(None, description="Optional market (mandi) name"),
+    start: date = Query(None, description="First day, YYYY-MM-DD (default: a year before `end`)"),
+    end: date = Query(None, description="Last day, YYYY-MM-DD (default: today)"),
+    interval: str = Query("daily", description="daily | weekly | monthly"),
+):
+    """Price history for a commodity in a state, downsampled to daily/weekly/monthly min/modal/max."""
+    if interval not in INTERVALS:
+        raise HTTPException(400, f"interval must be one of {', '.join(INTERVALS)}")
+    end = end or date.today()
+    start = start or end - timedelta(days=DEFAULT_HISTORY_DAYS)
+    if start > end:
+        raise HTTPException(400, "start must not be after end")
+    try:
+        table = get_market_data()
+    except Exception as e:
+        raise HTTPException(500, str(e))
+
+    fmt = encoding.negotiate(request)
+    etag = conditional.etag_for("market-history", table.version, state.strip().lower(), commodity.strip().lower(),
+                                (market or "").strip().lower(), start, end, interval, fmt)
+    cached = conditional.not_modified(request, etag, PRICES_CACHE, "market_history", vary="Accept")
+    if cached is not None:
+        return cached
 
-    return list(crop_map.values())
+    points = _history(table, state, commodity, market, (start - _EPOCH).days, (end - _EPOCH).days, interval)
+    meta = {"state": state, "commodity": commodity, "market": market,
+            "start": start.isoformat(), "end": end.isoformat(), "interval": interval}
+    body, media_type = encoding.encode_series(fmt, points, legacy={**meta, "points": points}, meta=meta)
+    return conditional.response(request, body, media_type, PRICES_CACHE, "market_history", etag=etag, vary="Accept")
@@ -2,16 +2,34 @@
 Price Forecast Router — POST /api/v1/price-forecast
 Fits ARIMA(1,1,1) on historical price data to forecast 6 months ahead
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
 import os
-import pandas as pd
-import numpy as np
+
+from services import encoding
 
 router = APIRouter()
 
-CSV_PATH = r"d:\11-11\agricultural_raw_material.csv"
+CSV_PATH = os.getenv("RAW_MATERIAL_CSV_PATH", r"d:\11-11\agricultural_raw_material.csv")
+
+# Parsed price columns, cached per worker (memory-mapped and shared when exported)
+_table = None
+
+
+def get_price_data():
+    """RawMaterialTable from the shared export, else from the CSV; None when neither exists."""
+    global _table
+    if _table is None:
+        from services.shared_data import RawMaterialTable, shared_path
+        path = shared_path("raw_material")
+        if path:
+            _table = RawMaterialTable.load(path)
+        elif os.path.exists(CSV_PATH):
+            _table = RawMaterialTable.from_csv(CSV_PATH)
+    return _table
+
 
 class PriceForecastRequest(BaseModel):
     crop: str
@@ -19,8 +37,14 @@ class PriceForecastRequest(BaseModel):
 
 
 @router.post("/price-forecast")
-async def forecast_price(req: PriceForecastRequest):
+async def forecast_price(req: PriceForecastRequest, request: Request):
     """Forecast crop price for next 6 months using ARIMA model from Kaggle CSV."""
+    # ARIMA fitting is CPU-bound (tens of ms) — keep it off the event loop
+    return _forecast_response(request, await asyncio.to_thread(forecast_for, req.crop, req.state))
+
+
+def forecast_for(crop: str, state: Optional[str]) -> dict:
+    """The 6-month forecast as a dict — ARIMA for crops in the CSV, a mock otherwise (shared with /dashboard)."""
     import random
 
     crop_mapping = {
@@ -29,15 +53,16 @@ async def forecast_price(req: PriceForecastRequest):
         "Copra": "Copra Price"
     }
     
-    col_name = crop_mapping.get(req.crop.capitalize())
+    col_name = crop_mapping.get(crop.capitalize())
     
     # Base fallback mock
     base = {"Rice": 1900, "Wheat": 2100, "Cotton": 6200, "Sugarcane": 340,
-            "Soybean": 4100, "Maize": 1650}.get(req.crop.capitalize(), 2000)
+            "Soybean": 4100, "Maize": 1650}.get(crop.capitalize(), 2000)
     
     months = ["Mar", "Apr", "May", "Jun", "Jul", "Aug"]
     
-    if not col_name or not os.path.exists(CSV_PATH):
+    table = get_price_data() if col_name else None
+    if table is None or col_name not in table.columns:
         # Fallback to mock if it's not Cotton/Rubber/Copra or CSV is missing
         forecast = []
         for i, m in enumerate(months):
@@ -48,18 +73,18 @@ async def forecast_price(req: PriceForecastRequest):
                 "high": p + random.randint(100, 250),
             })
         return {
-            "crop": req.crop, "state": req.state, "current_price": base,
+            "crop": crop, "state": state, "current_price": base,
             "forecast": forecast, "trend": "stable",
             "model": "MOCK — crop not in agricultural_raw_material.csv",
         }
 
     # If it is Cotton/Rubber etc., run ARIMA on the CSV
     try:
+        import pandas as pd
         from statsmodels.tsa.arima.model import ARIMA
-        
-        df = pd.read_csv(CSV_PATH)
-        prices = pd.to_numeric(df[col_name], errors='coerce').dropna().values
-        
+
+        prices = table.series(col_name)
+
         # Scale the prices up so they look like INR/Quintal (the CSV has prices like "1.83" USD)
         prices = prices * 80 * 10  
         
@@ -81,13 +106,23 @@ async def forecast_price(req: PriceForecastRequest):
 
         trend = "bullish" if forecast[-1]["price"] > prices[-1] else "bearish"
 
-        return {
-            "crop": req.crop,
-            "state": req.state,
-            "current_price": round(prices[-1]),
+        result = {
+            "crop": crop,
+            "state": state,
+            "current_price": round(float(prices[-1])),
             "forecast": forecast,
             "trend": trend,
             "model": "ARIMA(1,1,1) on local CSV",
         }
     except Exception as e:
         raise HTTPException(500, f"ARIMA fitting failed: {str(e)}")
+    return result
+
+
+def _forecast_response(request: Request, result: dict) -> Response:
+    """The forecast rows as JSON objects, columnar JSON or msgpack depending on Accept."""
+    meta = {k: v for k, v in result.items() if k != "forecast"}
+    body, media_type = encoding.encode_series(
+        encoding.negotiate(request), result["forecast"], legacy=result, meta=meta,
+    )
+    return Response(body, media_type=media_type, headers={"Vary": "Accept"})
@@ -1,9 +1,11 @@
 """
-Satellite Router — GET /api/v1/satellite/ndvi/{farm_id}
-Fetches NDVI history from Agromonitoring API
+Satellite Router — GET /api/v1/satellite/ndvi/{farm_id}, /satellite/imagery/{farm_id}[/{dt}/{layer}.png]
+Fetches NDVI history from Agromonitoring API, and proxies per-field scene imagery through an on-disk cache
 """
-from fastapi import APIRouter, HTTPException
-import httpx
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from services import conditional, encoding
+from services.http_client import upstream_client
+import asyncio
 import os
 import time
 
@@ -12,28 +14,32 @@ router = APIRouter()
 OWM_KEY = os.getenv("OWM_API_KEY", "")
 AGRO_BASE = "https://agromonitoring.com/api/v1"
 
+# New imagery lands every few days; farm-specific, so browser cache only
+NDVI_CACHE = conditional.cache_control(3600, private=True)
 
-@router.get("/satellite/ndvi/{farm_id}")
-async def get_ndvi_history(farm_id: str):
-    """Fetch 30-day NDVI history for a farm's polygon from Agromonitoring."""
-    if not OWM_KEY:
-        raise HTTPException(500, "OWM_API_KEY not configured")
 
-    # Get farm's polygon_id from Supabase
-    from services.supabase_client import get_supabase
-    sb = get_supabase()
-    farm_resp = sb.table("farms").select("agromonitoring_polygon_id").eq("id", farm_id).single().execute()
+# Shared by every request for the polygon; imagery only changes every few days
+NDVI_CACHE_S = int(os.getenv("NDVI_CACHE_S", str(3 * 3600)))
 
-    if not farm_resp.data or not farm_resp.data.get("agromonitoring_polygon_id"):
-        raise HTTPException(404, "Farm not found or polygon not registered with Agromonitoring")
 
-    polygon_id = farm_resp.data["agromonitoring_polygon_id"]
+def ndvi_key(polygon_id: str) -> str:
+    return f"ndvi:v1:{polygon_id}"
+
+
+async def fetch_ndvi(polygon_id: str, ttl: int | None = None, force: bool = False) -> list[dict]:
+    """30-day NDVI history for an Agromonitoring polygon in dashboard format, cached for NDVI_CACHE_S (or `ttl`)."""
+    from services.redis_cache import cache_get_async, cache_set_async
+    key = ndvi_key(polygon_id)
+    if not force:
+        cached = await cache_get_async(key)
+        if cached is not None:
+            return cached
 
     # 30 days ago
     dt_end = int(time.time())
     dt_start = dt_end - (30 * 24 * 60 * 60)
 
-    async with httpx.AsyncClient(timeout=15) as client:
+    async with upstream_client(timeout=15) as client:
         resp = await client.get(
             f"{AGRO_BASE}/ndvi/history",
             params={
@@ -56,5 +62,167 @@ async def get_ndvi_history(farm_id: str):
             "evi": round(entry.get("data", {}).get("std", 0), 3),  # approximation
             "threshold": 0.4,
         })
-
+    await cache_set_async(key, ndvi_history, ttl or NDVI_CACHE_S)
     return ndvi_history
+
+
+def _farm_polygon(farm_id: str) -> str:
+    """The farm's Agromonitoring polygon id (404 when the farm or its polygon is missing)."""
+    from services.supabase_client import get_supabase
+    sb = get_supabase()
+    farm_resp = sb.table("farms").select("agromonitoring_polygon_id").eq("id", farm_id).single().execute()
+
+    if not farm_resp.data or not farm_resp.data.get("agromonitoring_polygon_id"):
+        raise HTTPException(404, "Farm not found or polygon not registered with Agromonitoring")
+    return farm_resp.data["agromonitoring_polygon_id"]
+
+
+@router.get("/satellite/ndvi/{farm_id}")
+async def get_ndvi_history(farm_id: str, request: Request):
+    """Fetch 30-day NDVI history for a farm's polygon from Agromonitoring."""
+    if not OWM_KEY:
+        raise HTTPException(500, "OWM_API_KEY not configured")
+
+    # Get farm's polygon_id from Supabase (sync client — in a thread)
+    ndvi_history = await fetch_ndvi(await asyncio.to_thread(_farm_polygon, farm_id))
+
+    body, media_type = encoding.encode_series(
+        encoding.negotiate(request), ndvi_history, meta={"farm_id": farm_id}, constant_keys=("threshold",),
+    )
+    return conditional.response(request, body, media_type, NDVI_CACHE, "satellite_ndvi", vary="Accept")
+
+
+# ── Scene imagery proxy ─────────────────────────────────────────────────────
+
+IMAGE_LAYERS = ("ndvi", "evi", "truecolor", "falsecolor")
+SCENE_DAYS = int(os.getenv("NDVI_SCENE_DAYS", "90"))
+# A scene's image never changes once published — let browsers / CDNs keep it for a year
+IMAGE_CACHE = conditional.cache_control(365 * 86400, private=True) + ", immutable"
+SCENES_CACHE = conditional.cache_control(3600, private=True)
+
+
+def scenes_key(polygon_id: str) -> str:
+    return f"ndvi-scenes:v1:{polygon_id}"
+
+
+async def fetch_scenes(polygon_id: str) -> list[dict]:
+    """Satellite acquisitions over the polygon in the last NDVI_SCENE_DAYS, newest first, cached like NDVI history."""
+    from services.redis_cache import cache_get_async, cache_set_async
+    key = scenes_key(polygon_id)
+    cached = await cache_get_async(key)
+    if cached is not None:
+        return cached
+
+    dt_end = int(time.time())
+    async with upstream_client(timeout=15) as client:
+        resp = await client.get(
+            f"{AGRO_BASE}/image/search",
+            params={"polyid": polygon_id, "appid": OWM_KEY, "start": dt_end - SCENE_DAYS * 86400, "end": dt_end},
+        )
+        if resp.status_code != 200:
+            raise HTTPException(resp.status_code, "Agromonitoring API error")
+        data = resp.json()
+
+    scenes = [
+        {
+            "dt": entry["dt"],
+            "date": time.strftime("%Y-%m-%d", time.gmtime(entry["dt"])),
+            "satellite": entry.get("type"),
+            "cloud": entry.get("cl"),
+            "coverage": entry.get("dc"),
+            "images": {layer: url for layer, url in (entry.get("image") or {}).items() if layer in IMAGE_LAYERS and url},
+        }
+        for entry in data if entry.get("dt")
+    ]
+    scenes.sort(key=lambda s: -s["dt"])
+    await cache_set_async(key, scenes, NDVI_CACHE_S)
+    return scenes
+
+
+def _owned_polygon(farm_id: str, token: str) -> str:
+    """The polygon id of a farm owned by the token's user (404 otherwise, like other users' farms)."""
+    from routers.farms import _get_user_id
+    from services.supabase_client import get_supabase
+    user_id = _get_user_id(token)
+    resp = (get_supabase().table("farms").select("user_id,agromonitoring_polygon_id")
+            .eq("id", farm_id).limit(1).execute())
+    farm = resp.data[0] if resp.data else None
+    if farm is None or farm.get("user_id") != user_id or not farm.get("agromonitoring_polygon_id"):
+        raise HTTPException(404, "Farm not found or polygon not registered with Agromonitoring")
+    return farm["agromonitoring_polygon_id"]
+
+
+@router.get("/satellite/imagery/{farm_id}")
+async def list_imagery(farm_id: str, request: Request, authorization: str = Header(...)):
+    """Acquisitions available for one of the caller's farms, with proxy URLs per image layer."""
+    if not OWM_KEY:
+        raise HTTPException(500, "OWM_API_KEY not configured")
+    # Sync Supabase clients — off the loop
+    polygon_id = await asyncio.to_thread(_owned_polygon, farm_id, authorization.replace("Bearer ", ""))
+    scenes = await fetch_scenes(polygon_id)
+    base = f"/api/v1/satellite/imagery/{farm_id}"
+    return conditional.json_response(request, {
+        "farm_id": farm_id,
+        "scenes": [
+            {**{k: v for k, v in scene.items() if k != "images"},
+             "layers": {layer: f"{base}/{scene['dt']}/{layer}.png" for layer in scene["images"]}}
+            for scene in scenes
+        ],
+    }, SCENES_CACHE, "satellite_imagery_list")
+
+
+@router.get("/satellite/imagery/{farm_id}/{dt}/{layer}.png")
+async def get_imagery(farm_id: str, dt: int, layer: str, request: Request, authorization: str = Header(...)):
+    """
+    One scene image for the polygon of one of the caller's farms. Fetched from Agromonitoring once per (polygon, acquisition, layer),
+    then served from the on-disk cache with byte-range support and a year-long immutable Cache-Control.
+    """
+    from services.image_cache import get_image_cache, parse_range
+
+    if layer not in IMAGE_LAYERS:
+        raise HTTPException(404, f"Unknown layer; use one of {', '.join(IMAGE_LAYERS)}")
+    if not OWM_KEY:
+        raise HTTPException(500, "OWM_API_KEY not configured")
+    polygon_id = await asyncio.to_thread(_owned_polygon, farm_id, authorization.replace("Bearer ", ""))
+    key = f"{polygon_id}:{dt}:{layer}"
+    # Strong: (polygon, acquisition, layer) always maps to the same bytes, and If-Range needs a strong tag
+    etag = conditional.etag_for("ndvi-image", key, weak=False)
+    cached = conditional.not_modified(request, etag, IMAGE_CACHE, "satellite_imagery")
+    if cached is not None:
+        return cached
+
+    async def fetch() -> bytes:
+        scene = next((s for s in await fetch_scenes(polygon_id) if s["dt"] == dt), None)
+        if scene is None or layer not in scene["images"]:
+            raise HTTPException(404, "No such acquisition for this farm")
+        async with upstream_client(timeout=30) as client:
+            resp = await client.get(scene["images"][layer], params={"appid": OWM_KEY})
+            if resp.status_code != 200:
+                raise HTTPException(502, "Agromonitoring imagery unavailable")
+            return resp.content
+
+    cache = get_image_cache()
+    try:
+        data = await asyncio.to_thread(_read, await cache.get_or_fetch(key, fetch, suffix=".png"))
+    except FileNotFoundError:
+        # Evicted by another worker between lookup and read — fetch it again
+        data = await asyncio.to_thread(_read, await cache.get_or_fetch(key, fetch, suffix=".png"))
+    headers = {"ETag": etag, "Cache-Control": IMAGE_CACHE, "Accept-Ranges": "bytes"}
+
+    # If-Range with a different validator means the client's partial copy is stale — send it all
+    if_range = request.headers.get("if-range")
+    wanted = parse_range(request.headers.get("range"), len(data)) if if_range in (None, etag) else None
+    if wanted is False:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(data)}"})
+    conditional.CONDITIONAL.inc(route="satellite_imagery", result="partial" if wanted else "full")
+    if wanted:
+        start, end = wanted
+        return Response(data[start:end + 1], status_code=206, media_type="image/png",
+                        headers={**headers, "Content-Range": f"bytes {start}-{end}/{len(data)}"})
+    return Response(data, media_type="image/png", headers=headers)
+
+
+def _read(path: str) -> bytes:
+    # Scene PNGs are cropped to the field — tens of KB — so reading whole is cheaper than streaming
+    with open(path, "rb") as f:
+        return f.read()
@@ -2,26 +2,47 @@
 Soil Router — GET /api/v1/soil
 Fetches soil data from ISRIC SoilGrids (no API key needed)
 """
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
+from services import conditional
+from services.http_client import upstream_client
 import httpx
 
 router = APIRouter()
 
 ISRIC_BASE = "https://rest.isric.org/soilgrids/v2.0/properties/query"
 
+# SoilGrids is a static 250 m product — a point's soil profile doesn't change between releases
+SOIL_CACHE_S = 7 * 24 * 3600
+SOIL_CACHE = conditional.cache_control(SOIL_CACHE_S)
+SOILGRIDS_VERSION = "v2.0"
 
-@router.get("/soil")
-async def get_soil(
-    lat: float = Query(..., description="Latitude"),
-    lng: float = Query(..., description="Longitude"),
-):
-    """Fetch soil properties from ISRIC SoilGrids — normalize to 0–100 for radar chart."""
-    async with httpx.AsyncClient(timeout=15) as client:
+
+def soil_key(lat: float, lng: float) -> str:
+    from services.farm_index import cell_of, SOIL_CELL_DEG
+    i, j = cell_of(lat, lng, SOIL_CELL_DEG)
+    return f"soil:{SOILGRIDS_VERSION}:{i}:{j}"
+
+
+async def fetch_soil_properties(lat: float, lng: float, ttl: int | None = None, force: bool = False) -> dict:
+    """
+    Raw 0–30 cm SoilGrids means for the 0.01° cell containing (lat, lng), fetched at the cell centre
+    and cached for a week. Raises HTTPException for ISRIC errors, httpx.HTTPError when unreachable.
+    """
+    from services.farm_index import cell_of, cell_center, SOIL_CELL_DEG
+    from services.redis_cache import cache_get_async, cache_set_async
+    key = soil_key(lat, lng)
+    if not force:
+        cached = await cache_get_async(key)
+        if cached is not None:
+            return cached
+    clat, clng = cell_center(cell_of(lat, lng, SOIL_CELL_DEG), SOIL_CELL_DEG)
+
+    async with upstream_client(timeout=15) as client:
         resp = await client.get(
             ISRIC_BASE,
             params={
-                "lon": lng,
-                "lat": lat,
+                "lon": clng,
+                "lat": clat,
                 "property": ["nitrogen", "phh2o", "soc", "clay", "sand", "cec"],
                 "depth": "0-30cm",
                 "value": "mean",
@@ -39,6 +60,28 @@ async def get_soil(
         if depths:
             val = depths[0].get("values", {}).get("mean")
             properties[prop_name] = val
+    await cache_set_async(key, properties, ttl or SOIL_CACHE_S)
+    return properties
+
+
+@router.get("/soil")
+async def get_soil(
+    request: Request,
+    lat: float = Query(..., description="Latitude"),
+    lng: float = Query(..., description="Longitude"),
+):
+    """Fetch soil properties from ISRIC SoilGrids — normalize to 0–100 for radar chart."""
+    # Revalidation never reaches ISRIC: the ETag is fixed by the point and the dataset version
+    etag = conditional.etag_for("soil", SOILGRIDS_VERSION, lat, lng)
+    cached = conditional.not_modified(request, etag, SOIL_CACHE, "soil")
+    if cached is not None:
+        return cached
+
+    try:
+        properties = await fetch_soil_properties(lat, lng)
+    except httpx.HTTPError as e:
+        # Timeout, exhausted request budget or open circuit breaker — fail fast instead of a 500
+        raise HTTPException(503, f"ISRIC SoilGrids unavailable: {e}")
 
     # Normalize to 0–100 scale for radar chart
     nitrogen_raw = properties.get("nitrogen", 0) or 0
@@ -52,11 +95,11 @@ async def get_soil(
     om_normalized = min(100, (soc_raw / 10) * 5)
     moisture_estimate = min(100, om_normalized * 1.2)
 
-    return [
+    return conditional.json_response(request, [
         {"subject": "N (Nitrogen)", "A": round(n_normalized), "fullMark": 100},
         {"subject": "P (Phosphorus)", "A": round(p_normalized), "fullMark": 100},
         {"subject": "K (Potassium)", "A": round(k_normalized), "fullMark": 100},
         {"subject": "pH Level", "A": round(ph_normalized), "fullMark": 100},
         {"subject": "Organic Matter", "A": round(om_normalized), "fullMark": 100},
         {"subject": "Moisture", "A": round(moisture_estimate), "fullMark": 100},
-    ]
+    ], SOIL_CACHE, "soil", etag=etag)
@@ -3,6 +3,7 @@ Weather Router — GET /api/v1/weather
 Fetches current weather from OpenWeatherMap API
 """
 from fastapi import APIRouter, Query, HTTPException
+from services.http_client import upstream_client
 import httpx
 import os
 
@@ -12,20 +13,35 @@ OWM_KEY = os.getenv("OWM_API_KEY", "")
 OWM_BASE = "https://api.openweathermap.org/data/2.5"
 
 
-@router.get("/weather")
-async def get_weather(
-    lat: float = Query(..., description="Latitude"),
-    lng: float = Query(..., description="Longitude"),
-):
-    """Fetch current weather + UV index for coordinates."""
-    if not OWM_KEY:
-        raise HTTPException(500, "OWM_API_KEY not configured")
+# Current conditions are shared by every farm in a 0.1° cell (see services/farm_index.py)
+WEATHER_CACHE_S = int(os.getenv("WEATHER_CACHE_S", "900"))
+
+
+def weather_key(lat: float, lng: float) -> str:
+    from services.farm_index import cell_of, WEATHER_CELL_DEG
+    i, j = cell_of(lat, lng, WEATHER_CELL_DEG)
+    return f"weather:v1:{i}:{j}"
+
+
+async def fetch_weather(lat: float, lng: float, ttl: int | None = None, force: bool = False) -> dict:
+    """
+    Current weather + UV for the 0.1° cell containing (lat, lng), fetched at the cell centre and cached
+    for WEATHER_CACHE_S (or `ttl`). Raises HTTPException for OWM errors, httpx.HTTPError when unreachable.
+    """
+    from services.farm_index import cell_of, cell_center, WEATHER_CELL_DEG
+    from services.redis_cache import cache_get_async, cache_set_async
+    key = weather_key(lat, lng)
+    if not force:
+        cached = await cache_get_async(key)
+        if cached is not None:
+            return cached
+    clat, clng = cell_center(cell_of(lat, lng, WEATHER_CELL_DEG), WEATHER_CELL_DEG)
 
-    async with httpx.AsyncClient(timeout=10) as client:
+    async with upstream_client(timeout=10) as client:
         # Current weather
         weather_resp = await client.get(
             f"{OWM_BASE}/weather",
-            params={"lat": lat, "lon": lng, "appid": OWM_KEY, "units": "metric"},
+            params={"lat": clat, "lon": clng, "appid": OWM_KEY, "units": "metric"},
         )
         if weather_resp.status_code != 200:
             raise HTTPException(weather_resp.status_code, "OpenWeatherMap API error")
@@ -34,11 +50,11 @@ async def get_weather(
         # UV Index
         uv_resp = await client.get(
             f"{OWM_BASE}/uvi",
-            params={"lat": lat, "lon": lng, "appid": OWM_KEY},
+            params={"lat": clat, "lon": clng, "appid": OWM_KEY},
         )
         uv_val = uv_resp.json().get("value", 0) if uv_resp.status_code == 200 else 0
 
-    return {
+    data = {
         "temp": w["main"]["temp"],
         "humidity": w["main"]["humidity"],
         "pressure": w["main"]["pressure"],
@@ -47,5 +63,24 @@ async def get_weather(
         "uv": uv_val,
         "soilMoisture": round(w["main"]["humidity"] * 0.75, 1),  # estimate
         "description": w["weather"][0]["description"] if w.get("weather") else "",
-        "location": {"lat": lat, "lng": lng},
     }
+    await cache_set_async(key, data, ttl or WEATHER_CACHE_S)
+    return data
+
+
+@router.get("/weather")
+async def get_weather(
+    lat: float = Query(..., description="Latitude"),
+    lng: float = Query(..., description="Longitude"),
+):
+    """Fetch current weather + UV index for coordinates."""
+    if not OWM_KEY:
+        raise HTTPException(500, "OWM_API_KEY not configured")
+
+    try:
+        data = await fetch_weather(lat, lng)
+    except httpx.HTTPError as e:
+        # Timeout, exhausted request budget or open circuit breaker — fail fast instead of a 500
+        raise HTTPException(503, f"OpenWeatherMap unavailable: {e}")
+
+    return {**data, "location": {"lat": lat, "lng": lng}}
@@ -0,0 +1 @@
+# AgriAI Backend — Scripts Package
@@ -0,0 +1,255 @@
+"""
+Endpoint Benchmark — drives every router against in-process fake upstreams
+Usage (from backend/):
+    python -m scripts.bench --requests 200 --concurrency 16 --latency owm=40,isric=250 --out bench.json
+    python -m scripts.bench --compare bench.json --tolerance 0.2     # exit 1 on regression
+Reports requests/second, p50/p95/p99 latency, status codes and upstream call counts per endpoint as JSON.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+REPO_DIR = os.path.join(BACKEND_DIR, "..")
+
+AUTH = {"Authorization": "Bearer bench-token"}
+
+
+def _png(size: int = 224) -> bytes:
+    """Solid-green RGB PNG, built by hand so the harness does not need PIL."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    row = b"\x00" + bytes((60, 140, 60)) * size
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * size))
+            + chunk(b"IEND", b""))
+
+
+def _write_market_csv(path: str, days: int = 365, seed: int = 42):
+    """Synthetic mandi dataset with the columns routers/market.py reads."""
+    rng = random.Random(seed)
+    states = {"Telangana": ["Hyderabad", "Warangal"], "Maharashtra": ["Pune", "Nashik"], "Punjab": ["Ludhiana", "Amritsar"]}
+    commodities = {"Rice": 2100, "Wheat": 2300, "Maize": 1800, "Cotton": 6400, "Soybean": 4300, "Onion": 1500, "Tomato": 1200, "Turmeric": 7000}
+    t0 = time.mktime((2025, 1, 1, 0, 0, 0, 0, 0, -1))
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["STATE", "District Name", "Market Name", "Commodity", "Min_Price", "Max_Price", "Modal_Price", "Price Date"])
+        for state, markets in states.items():
+            for market in markets:
+                for commodity, base in commodities.items():
+                    price = base
+                    for d in range(days):
+                        price = max(100, price + rng.randint(-40, 45))
+                        date = time.strftime("%d/%m/%Y", time.localtime(t0 + d * 86400))
+                        w.writerow([state, market, f"{market} APMC", commodity, price - 150, price + 180, price, date])
+
+
+# Every router in backend/routers/ — name → (method, path, request kwargs, max requests or None)
+ENDPOINTS = [
+    ("health", "GET", "/", {}, None),
+    ("weather", "GET", "/api/v1/weather", {"params": {"lat": 17.14, "lng": 78.21}}, None),
+    ("soil", "GET", "/api/v1/soil", {"params": {"lat": 17.14, "lng": 78.21}}, None),
+    ("satellite_ndvi", "GET", "/api/v1/satellite/ndvi/11111111-1111-1111-1111-111111111111", {}, None),
+    ("market_prices", "GET", "/api/v1/market/prices", {"params": {"state": "Maharashtra"}}, None),
+    ("market_history", "GET", "/api/v1/market/history",
+     {"params": {"state": "Maharashtra", "commodity": "Onion", "start": "2025-01-01", "end": "2025-12-31", "interval": "weekly"}}, None),
+    ("farms_list", "GET", "/api/v1/farms", {"headers": AUTH}, None),
+    ("farms_create", "POST", "/api/v1/farms", {"headers": AUTH, "json": {
+        "name": "Bench Plot", "crop": "Maize", "location_lat": 17.2, "location_lng": 78.3,
+        "polygon": {"type": "Polygon", "coordinates": [[[78.3, 17.2], [78.31, 17.2], [78.31, 17.21], [78.3, 17.2]]]},
+    }}, None),
+    ("farms_nearby", "GET", "/api/v1/farms/nearby", {"headers": AUTH, "params": {"lat": 17.1, "lng": 78.2, "radius_km": 25}}, None),
+    ("farms_regions", "GET", "/api/v1/farms/regions", {"headers": AUTH}, None),
+    # The mock inference path sleeps 1.5 s per call when no model is present — keep it short
+    ("disease_detect", "POST", "/api/v1/disease/detect", {"files": {"file": ("leaf.png", _png(), "image/png")}}, 10),
+    ("crop_recommend", "POST", "/api/v1/crop-recommend", {"json": {"lat": 17.14, "lng": 78.21}}, None),
+    ("price_forecast", "POST", "/api/v1/price-forecast", {"json": {"crop": "Cotton"}}, 20),
+    ("early_warning", "POST", "/api/v1/early-warning/predict", {"headers": AUTH, "json": {"farm_id": "11111111-1111-1111-1111-111111111111"}}, None),
+    ("insights_irrigation", "GET", "/api/v1/insights/irrigation", {"params": {"lat": 17.14, "lng": 78.21}}, None),
+    ("insights_soil", "GET", "/api/v1/insights/soil", {"params": {"lat": 17.14, "lng": 78.21}}, None),
+    ("dashboard", "GET", "/api/v1/dashboard/11111111-1111-1111-1111-111111111111", {"headers": AUTH}, 50),
+]
+
+
+def _percentile(sorted_vals: list[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, math.ceil(pct / 100 * len(sorted_vals)) - 1))
+    return sorted_vals[idx]
+
+
+async def _drive(client, method: str, path: str, kwargs: dict, total: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    remaining = [total]
+
+    async def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, path, **kwargs)
+                code = str(resp.status_code)
+            except Exception as e:
+                code = type(e).__name__
+            latencies.append(time.perf_counter() - t0)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+    ms = lambda s: round(s * 1000, 2)
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "rps": round(total / wall, 1) if wall else 0.0,
+        "p50_ms": ms(_percentile(latencies, 50)),
+        "p95_ms": ms(_percentile(latencies, 95)),
+        "p99_ms": ms(_percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+        "status": statuses,
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    import main
+    from scripts.fake_upstreams import FakeUpstreams
+
+    fakes = FakeUpstreams(args.latency, args.error_rate, seed=args.seed)
+    fakes.install()
+
+    selected = [e for e in ENDPOINTS if not args.endpoints or e[0] in args.endpoints]
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for name, method, path, kwargs, cap in selected:
+            total = min(args.requests, cap) if cap else args.requests
+            # One untimed request so lazy model/dataset loads are not charged to the percentiles
+            await client.request(method, path, **kwargs)
+            fakes.calls.clear()
+            result = await _drive(client, method, path, kwargs, total, args.concurrency)
+            result["upstream_calls"] = dict(fakes.calls)
+            result["upstream_calls_per_request"] = round(sum(fakes.calls.values()) / total, 2)
+            results[name] = result
+            print(f"{name:22s} {result['rps']:>8.1f} rps  p50 {result['p50_ms']:>8.1f} ms  "
+                  f"p99 {result['p99_ms']:>8.1f} ms  {result['status']}", file=sys.stderr)
+    return results
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Endpoints whose p95 grew or throughput fell by more than `tolerance` (fraction)."""
+    regressions = []
+    for name, cur in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']} → {cur['p95_ms']} ms")
+        if base["rps"] and cur["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {base['rps']} → {cur['rps']}")
+    return regressions
+
+
+def _kv(text: str) -> dict:
+    """'owm=40,isric=250' → {'owm': 40.0, 'isric': 250.0}; a bare number applies to every upstream."""
+    from scripts.fake_upstreams import HOSTS
+    if not text:
+        return {}
+    if "=" not in text:
+        return {name: float(text) for name in HOSTS}
+    return {k.strip(): float(v) for k, v in (item.split("=", 1) for item in text.split(","))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriAI endpoint benchmark with fake upstreams")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=_kv, default={}, help="upstream latency ms, e.g. owm=40,isric=250 or 50")
+    parser.add_argument("--error-rate", type=_kv, default={}, help="upstream error fraction, e.g. isric=0.1")
+    parser.add_argument("--endpoints", type=lambda s: s.split(","), default=None, help="comma-separated subset")
+    parser.add_argument("--quotas", default="", help="UPSTREAM_QUOTAS for the run (default: no rate limiting)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON from a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    sys.path.insert(0, BACKEND_DIR)
+    tmp = tempfile.mkdtemp(prefix="agriai-bench-")
+    market_csv = os.path.join(tmp, "market.csv")
+    _write_market_csv(market_csv, seed=args.seed)
+
+    from scripts.fake_upstreams import SUPABASE_URL
+    # Set before main is imported — routers read keys at import time and load_dotenv() won't override
+    os.environ.update({
+        "OWM_API_KEY": "bench",
+        "GEMINI_API_KEY": "bench",
+        "SUPABASE_URL": SUPABASE_URL,
+        "SUPABASE_SERVICE_KEY": "bench",
+        "REDIS_URL": "",
+        "WARMUP_ON_START": "0",
+        "UPSTREAM_QUOTAS": args.quotas,
+        # One synthetic user at --concurrency would trip the per-user quota — measure the endpoints, not shedding
+        "ADMISSION_LIMITS": "",
+        "MARKET_CSV_PATH": market_csv,
+        "CROP_TILE_PATH": os.path.join(tmp, "crop_tiles.sqlite3"),
+        "WEATHER_STORE_PATH": os.path.join(tmp, "weather_store.sqlite3"),
+        "RAW_MATERIAL_CSV_PATH": os.path.abspath(os.path.join(REPO_DIR, "agricultural_raw_material.csv")),
+    })
+
+    report = {
+        "meta": {
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "latency_ms": args.latency,
+            "error_rate": args.error_rate,
+            "seed": args.seed,
+        },
+        "endpoints": asyncio.run(run(args)),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION: {r}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Build crop tiles — one refresh pass over farm cells and/or bounding boxes, outside the API process
+Usage (from backend/):  python -m scripts.build_crop_tiles [--bbox 12.8,77.4,13.2,77.8 ...] [--no-farms] [--force]
+Useful to seed CROP_TILE_PATH before a deploy or for a new region; upstream calls go through the same quotas.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute crop-recommendation tiles")
+    parser.add_argument("--bbox", action="append", default=[], help="min_lat,min_lng,max_lat,max_lng (repeatable)")
+    parser.add_argument("--no-farms", action="store_true", help="skip cells of registered farms")
+    parser.add_argument("--force", action="store_true", help="recompute even when weather hasn't changed")
+    args = parser.parse_args()
+
+    from routers.crop_recommend import refresh_tiles, service_cells
+    from services.crop_tiles import cells_in_bbox, get_tile_store
+
+    cells = set() if args.no_farms else set(service_cells())
+    for box in args.bbox:
+        cells.update(cells_in_bbox(*(float(v) for v in box.split(","))))
+    t0 = time.perf_counter()
+    stats = asyncio.run(refresh_tiles(sorted(cells), force=args.force))
+    stats["seconds"] = round(time.perf_counter() - t0, 2)
+    stats["tiles_total"] = get_tile_store().count()
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
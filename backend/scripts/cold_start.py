@@ -0,0 +1,60 @@
+"""
+Cold-start check — imports main.py in a fresh interpreter and bounds the import time
+Usage (from backend/):  python -m scripts.cold_start --budget 2.0
+Exits non-zero if importing the app exceeds the budget or pulls in a heavy module eagerly,
+so it can gate CI the same way a test would.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+# Runs inside the child interpreter — nothing is cached from this process
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import main
+elapsed = time.perf_counter() - t0
+from services import startup
+report = startup.report()
+report["import_main_s"] = round(elapsed, 3)
+print(json.dumps(report))
+"""
+
+
+def measure() -> dict:
+    env = dict(os.environ, WARMUP_ON_START="0")
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=float, default=float(os.getenv("COLD_START_BUDGET_S", 2.0)),
+                        help="max seconds allowed for `import main`")
+    parser.add_argument("--runs", type=int, default=3, help="take the best of N fresh interpreters")
+    args = parser.parse_args()
+
+    reports = [measure() for _ in range(args.runs)]
+    best = min(reports, key=lambda r: r["import_main_s"])
+    print(json.dumps(best, indent=2))
+
+    failures = []
+    if best["import_main_s"] > args.budget:
+        failures.append(f"import main took {best['import_main_s']}s (budget {args.budget}s)")
+    if best["heavy_modules_loaded"]:
+        failures.append(f"heavy modules imported eagerly: {', '.join(best['heavy_modules_loaded'])}")
+
+    for f in failures:
+        print(f"FAIL: {f}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Convert the disease CNN — exports disease_model.h5 to TFLite / ONNX with optional quantization,
+then checks accuracy parity against the Keras original and compares latency and memory.
+Usage (from backend/):
+    python -m scripts.convert_disease_model --format tflite --quantize int8 --samples ./leaf_samples
+    python -m scripts.convert_disease_model --format onnx --quantize dynamic --report convert.json
+Parity uses images from --samples (recommended: a few per class) or, failing that, synthetic inputs.
+Each backend is measured in a fresh process so TensorFlow's own footprint doesn't blur the numbers.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from services.disease_inference import MODEL_DIR, MODEL_FILES, INPUT_SIZE, preprocess  # noqa: E402
+
+
+def load_samples(sample_dir: str | None, n: int, seed: int) -> np.ndarray:
+    if sample_dir and os.path.isdir(sample_dir):
+        files = sorted(
+            os.path.join(root, f) for root, _, names in os.walk(sample_dir)
+            for f in names if f.lower().endswith((".jpg", ".jpeg", ".png"))
+        )[:n]
+        if files:
+            batch = []
+            for path in files:
+                with open(path, "rb") as f:
+                    batch.append(preprocess(f.read()))
+            return np.stack(batch)
+    print("WARNING: no --samples images found — parity is checked on synthetic inputs only", file=sys.stderr)
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(0, 1, (n, 1, 1, 3)).astype(np.float32)
+    noise = rng.normal(0, 0.15, (n, *INPUT_SIZE, 3)).astype(np.float32)
+    return np.clip(base + noise, 0, 1)
+
+
+def _representative(samples: np.ndarray):
+    def gen():
+        for img in samples:
+            yield [img[None, ...].astype(np.float32)]
+    return gen
+
+
+def to_tflite(model, out_path: str, quantize: str, samples: np.ndarray):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize != "none":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        # Full-integer weights and activations; input/output stay float32 so callers don't change
+        converter.representative_dataset = _representative(samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(out_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def to_onnx(model, out_path: str, quantize: str):
+    import tensorflow as tf
+    import tf2onnx
+    spec = (tf.TensorSpec((None, *INPUT_SIZE, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=out_path)
+    if quantize in ("dynamic", "int8"):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        tmp = out_path + ".fp32"
+        os.replace(out_path, tmp)
+        quantize_dynamic(tmp, out_path, weight_type=QuantType.QInt8)
+        os.remove(tmp)
+    elif quantize == "float16":
+        import onnx
+        from onnxconverter_common import float16
+        onnx.save(float16.convert_float_to_float16(onnx.load(out_path), keep_io_types=True), out_path)
+
+
+def _measure(kind: str, path: str, samples: np.ndarray, repeats: int, results):
+    """Runs in a fresh process: load time, memory delta, latency and raw predictions for one backend."""
+    sys.path.insert(0, BACKEND_DIR)
+    from services.disease_inference import BACKENDS
+    from services.shared_data import memory_usage
+
+    before = memory_usage()
+    t0 = time.perf_counter()
+    backend = BACKENDS[kind](path)
+    load_ms = (time.perf_counter() - t0) * 1000
+    preds = backend.predict(samples)           # also warms up
+    after = memory_usage()
+
+    one = samples[:1]
+    backend.predict(one)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        backend.predict(one)
+    single_ms = (time.perf_counter() - t0) / repeats * 1000
+
+    batch = samples[:16]
+    t0 = time.perf_counter()
+    for _ in range(max(1, repeats // 5)):
+        backend.predict(batch)
+    batch_ms = (time.perf_counter() - t0) / max(1, repeats // 5) * 1000
+
+    results.put({
+        "backend": kind,
+        "file": os.path.basename(path),
+        "size_mb": round(os.path.getsize(path) / 1e6, 2),
+        "load_ms": round(load_ms, 1),
+        "single_image_ms": round(single_ms, 2),
+        "batch16_ms": round(batch_ms, 2),
+        "rss_delta_mb": round(after.get("rss_mb", 0) - before.get("rss_mb", 0), 1),
+        "private_delta_mb": round(after.get("private_mb", 0) - before.get("private_mb", 0), 1),
+        "preds": preds.tolist(),
+    })
+
+
+def measure(kind: str, path: str, samples: np.ndarray, repeats: int) -> dict:
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    p = ctx.Process(target=_measure, args=(kind, path, samples, repeats, results))
+    p.start()
+    out = results.get(timeout=1800)
+    p.join()
+    out["preds"] = np.asarray(out["preds"], dtype=np.float32)
+    return out
+
+
+def parity(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    top1 = reference.argmax(axis=1) == candidate.argmax(axis=1)
+    ref_top3 = np.argsort(reference, axis=1)[:, -3:]
+    return {
+        "top1_agreement": round(float(top1.mean()), 4),
+        "top1_in_reference_top3": round(float(np.mean([c in r for c, r in zip(candidate.argmax(axis=1), ref_top3)])), 4),
+        "max_abs_prob_diff": round(float(np.abs(reference - candidate).max()), 4),
+        "mean_abs_prob_diff": round(float(np.abs(reference - candidate).mean()), 5),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the disease CNN to a lightweight CPU runtime")
+    parser.add_argument("--h5", default=os.path.join(MODEL_DIR, MODEL_FILES["keras"]))
+    parser.add_argument("--out-dir", default=MODEL_DIR)
+    parser.add_argument("--format", choices=["tflite", "onnx"], action="append",
+                        help="repeatable; default tflite")
+    parser.add_argument("--quantize", choices=["none", "float16", "dynamic", "int8"], default="float16",
+                        help="dynamic = int8 weights only; int8 = weights + activations (tflite needs --samples)")
+    parser.add_argument("--samples", help="directory of leaf images for calibration and parity")
+    parser.add_argument("--n-samples", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--min-top1", type=float, default=0.98, help="fail if top-1 agreement drops below this")
+    parser.add_argument("--report", help="write the JSON report here as well as stdout")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    formats = args.format or ["tflite"]
+
+    if not os.path.exists(args.h5):
+        sys.exit(f"{args.h5} not found")
+
+    samples = load_samples(args.samples, args.n_samples, args.seed)
+
+    import tensorflow as tf
+    model = tf.keras.models.load_model(args.h5)
+    outputs = {}
+    for fmt in formats:
+        out_path = os.path.join(args.out_dir, MODEL_FILES[fmt])
+        print(f"Converting → {out_path} ({args.quantize})...", file=sys.stderr)
+        if fmt == "tflite":
+            to_tflite(model, out_path, args.quantize, samples)
+        else:
+            to_onnx(model, out_path, args.quantize)
+        outputs[fmt] = out_path
+    del model
+
+    print("Measuring keras reference...", file=sys.stderr)
+    reference = measure("keras", args.h5, samples, args.repeats)
+    report = {"quantize": args.quantize, "n_samples": len(samples), "synthetic_samples": not args.samples,
+              "backends": {"keras": {k: v for k, v in reference.items() if k != "preds"}}}
+    failed = False
+    for fmt, path in outputs.items():
+        print(f"Measuring {fmt}...", file=sys.stderr)
+        res = measure(fmt, path, samples, args.repeats)
+        res["parity"] = parity(reference["preds"], res.pop("preds"))
+        res["speedup_single"] = round(reference["single_image_ms"] / res["single_image_ms"], 2) if res["single_image_ms"] else None
+        report["backends"][fmt] = res
+        if res["parity"]["top1_agreement"] < args.min_top1:
+            print(f"FAIL: {fmt} top-1 agreement {res['parity']['top1_agreement']} < {args.min_top1} "
+                  f"— removing {path} so DISEASE_BACKEND=auto keeps using Keras", file=sys.stderr)
+            os.remove(path)
+            failed = True
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(text)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
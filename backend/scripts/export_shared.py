@@ -0,0 +1,58 @@
+"""
+Export shared artifacts — writes the memory-mappable crop forest and market/price tables
+Usage (from backend/):  python -m scripts.export_shared [--out ml_models/shared]
+Workers pick the exports up automatically on their next start (see services/shared_data.py).
+"""
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+MODEL_DIR = os.path.join(BACKEND_DIR, "ml_models")
+
+
+def main():
+    from services import shared_data
+    from routers import market, price_forecast
+
+    parser = argparse.ArgumentParser(description="Export mmap-able model and dataset artifacts")
+    parser.add_argument("--out", default=shared_data.SHARED_DIR)
+    parser.add_argument("--model", default=os.path.join(MODEL_DIR, "crop_model.pkl"))
+    parser.add_argument("--encoder", default=os.path.join(MODEL_DIR, "crop_label_encoder.pkl"))
+    parser.add_argument("--market-csv", default=market.CSV_PATH)
+    parser.add_argument("--raw-material-csv", default=price_forecast.CSV_PATH)
+    args = parser.parse_args()
+
+    exported = 0
+    if os.path.exists(args.model):
+        import joblib
+        model = joblib.load(args.model)
+        names = None
+        if os.path.exists(args.encoder):
+            names = [str(c) for c in joblib.load(args.encoder).inverse_transform(model.classes_)]
+        shared_data.MmapForest.export(model, os.path.join(args.out, "crop_forest"), names)
+        print(f"crop_forest   ← {args.model}")
+        exported += 1
+    else:
+        print(f"skip crop_forest: {args.model} not found", file=sys.stderr)
+
+    if os.path.exists(args.market_csv):
+        table = shared_data.MarketTable.from_csv(args.market_csv)
+        table.save(os.path.join(args.out, "market"))
+        print(f"market        ← {args.market_csv} ({len(table)} rows)")
+        exported += 1
+    else:
+        print(f"skip market: {args.market_csv} not found", file=sys.stderr)
+
+    if os.path.exists(args.raw_material_csv):
+        shared_data.RawMaterialTable.from_csv(args.raw_material_csv).save(os.path.join(args.out, "raw_material"))
+        print(f"raw_material  ← {args.raw_material_csv}")
+        exported += 1
+    else:
+        print(f"skip raw_material: {args.raw_material_csv} not found", file=sys.stderr)
+
+    print(f"{exported} artifact(s) written to {os.path.abspath(args.out)}")
+
+
+if __name__ == "__main__":
+    main()
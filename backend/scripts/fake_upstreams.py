@@ -0,0 +1,181 @@
+"""
+Fake Upstreams — in-process stand-ins for OWM, ISRIC, Agromonitoring, Supabase and Gemini
+Installed via services.http_client.use_transports(), so no request leaves the process.
+Latency and error rate are configurable per upstream; randomness is seeded for reproducible runs.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import Counter
+from uuid import uuid4
+
+import httpx
+
+# Upstream name → host the routers call
+HOSTS = {
+    "owm": "api.openweathermap.org",
+    "isric": "rest.isric.org",
+    "agro": "agromonitoring.com",
+    "supabase": "supabase.bench",
+    "gemini": "generativelanguage.googleapis.com",
+}
+
+SUPABASE_URL = f"http://{HOSTS['supabase']}"
+BENCH_USER_ID = "00000000-0000-0000-0000-00000000b3c4"
+BENCH_FARM = {
+    "id": "11111111-1111-1111-1111-111111111111",
+    "user_id": BENCH_USER_ID,
+    "name": "Bench Farm",
+    "crop": "Rice",
+    "area_acres": 4.5,
+    "location_lat": 17.14,
+    "location_lng": 78.21,
+    "state": "Telangana",
+    "district": "Rangareddy",
+    "growth_stage": "Vegetative",
+    "agromonitoring_polygon_id": "bench-polygon",
+    "created_at": "2026-01-01T00:00:00+00:00",
+}
+
+
+class FakeUpstreams:
+    """Routes httpx requests by host to canned handlers, with injected latency and errors."""
+
+    def __init__(self, latency_ms: dict | None = None, error_rate: dict | None = None, seed: int = 42):
+        self.latency_ms = {name: 0.0 for name in HOSTS} | (latency_ms or {})
+        self.error_rate = {name: 0.0 for name in HOSTS} | (error_rate or {})
+        self.calls: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._by_host = {host: name for name, host in HOSTS.items()}
+
+    # ── transport plumbing ──────────────────────────────────────────────────
+
+    def _pick(self, request: httpx.Request) -> tuple[str, bool]:
+        name = self._by_host.get(request.url.host, "unknown")
+        with self._lock:
+            self.calls[name] += 1
+            failed = self._rng.random() < self.error_rate.get(name, 0.0)
+        return name, failed
+
+    def _respond(self, name: str, failed: bool, request: httpx.Request) -> httpx.Response:
+        if failed:
+            return httpx.Response(503, json={"message": f"fake {name} failure"})
+        handler = getattr(self, f"_{name}", None)
+        if handler is None:
+            return httpx.Response(404, json={"message": f"no fake for {request.url.host}"})
+        return handler(request)
+
+    async def _handle_async(self, request: httpx.Request) -> httpx.Response:
+        name, failed = self._pick(request)
+        await asyncio.sleep(self.latency_ms.get(name, 0.0) / 1000)
+        return self._respond(name, failed, request)
+
+    def _handle_sync(self, request: httpx.Request) -> httpx.Response:
+        name, failed = self._pick(request)
+        time.sleep(self.latency_ms.get(name, 0.0) / 1000)
+        return self._respond(name, failed, request)
+
+    def transports(self) -> tuple[httpx.MockTransport, httpx.MockTransport]:
+        return httpx.MockTransport(self._handle_async), httpx.MockTransport(self._handle_sync)
+
+    def install(self):
+        """Point services.http_client (and the Gemini SDK wrapper) at these fakes."""
+        from services import http_client
+        http_client.use_transports(*self.transports())
+
+        from routers import gemini_insights
+        gemini_insights.GEMINI_KEY = "bench"
+        gemini_insights._genai = _FakeGenAI(self)
+
+    # ── canned upstream responses ───────────────────────────────────────────
+
+    def _owm(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/uvi"):
+            return httpx.Response(200, json={"value": 7.2})
+        return httpx.Response(200, json={
+            "main": {"temp": 29.4, "humidity": 68, "pressure": 1008},
+            "wind": {"speed": 3.1},
+            "rain": {"1h": 0.4},
+            "weather": [{"description": "scattered clouds"}],
+        })
+
+    def _isric(self, request: httpx.Request) -> httpx.Response:
+        values = {"nitrogen": 1450, "phh2o": 68, "soc": 95, "clay": 310, "sand": 420, "cec": 220}
+        props = request.url.params.get_list("property") or list(values)
+        return httpx.Response(200, json={"properties": {"layers": [
+            {"name": p, "depths": [{"values": {"mean": values.get(p, 100)}}]} for p in props
+        ]}})
+
+    def _agro(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            return httpx.Response(201, json={"id": f"poly-{uuid4().hex[:8]}"})
+        start = int(request.url.params.get("start", 0))
+        if request.url.path.startswith("/image/1.0/"):
+            # Stand-in scene PNG: signature + deterministic filler, a few tens of KB like a field crop
+            seed = request.url.path.encode()
+            return httpx.Response(200, content=b"\x89PNG\r\n\x1a\n" + seed * (32768 // len(seed)),
+                                  headers={"content-type": "image/png"})
+        if request.url.path.endswith("/image/search"):
+            end = int(request.url.params.get("end", 0))
+            return httpx.Response(200, json=[
+                {
+                    "dt": dt, "type": "Sentinel-2", "dc": 100, "cl": 5 + i,
+                    "image": {layer: f"https://{HOSTS['agro']}/image/1.0/{layer}/{dt}" for layer in ("ndvi", "truecolor")},
+                }
+                for i, dt in enumerate(range(end - 86400, start, -86400 * 5))
+            ])
+        return httpx.Response(200, json=[
+            {"dt": start + i * 86400 * 5, "data": {"mean": 0.45 + i * 0.02, "std": 0.08}} for i in range(6)
+        ])
+
+    def _supabase(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.startswith("/auth/v1/user"):
+            return httpx.Response(200, json={"id": BENCH_USER_ID, "email": "bench@agriai.local"})
+        if path.startswith("/storage/v1/object/"):
+            return httpx.Response(200, json={"Key": path.removeprefix("/storage/v1/object/")})
+        if path.startswith("/rest/v1/"):
+            if request.method == "POST":
+                rows = json.loads(request.content or b"[]")
+                rows = rows if isinstance(rows, list) else [rows]
+                return httpx.Response(201, json=[{"id": str(uuid4()), **r} for r in rows])
+            # .single() asks for one object rather than an array
+            if "vnd.pgrst.object" in request.headers.get("accept", ""):
+                return httpx.Response(200, json=BENCH_FARM)
+            return httpx.Response(200, json=[BENCH_FARM], headers={"content-range": "0-0/1"})
+        return httpx.Response(404, json={"message": "unknown supabase path"})
+
+
+class _FakeGenAI:
+    """Stands in for the google.generativeai module: GenerativeModel(...).generate_content(prompt)."""
+
+    _REPLY = json.dumps({
+        "pump_status": "STANDBY", "recommendation": "Skip today's cycle; soil moisture is adequate.",
+        "water_saved": "140L", "next_cycle": "18", "health_score": 72,
+        "analysis": "Nitrogen adequate, pH near neutral.", "action_items": ["Mulch", "Retest pH", "Add compost"],
+    })
+
+    def __init__(self, fakes: FakeUpstreams):
+        self._fakes = fakes
+
+    def GenerativeModel(self, name: str):
+        fakes = self._fakes
+        reply = self._REPLY
+
+        class _Model:
+            def generate_content(self, prompt: str):
+                request = httpx.Request("POST", f"https://{HOSTS['gemini']}/v1beta/models/{name}")
+                _, failed = fakes._pick(request)
+                # The real SDK call is synchronous, so the fake blocks the same way
+                time.sleep(fakes.latency_ms.get("gemini", 0.0) / 1000)
+                if failed:
+                    raise RuntimeError("fake gemini failure")
+
+                class _Resp:
+                    text = reply
+                return _Resp()
+
+        return _Model()
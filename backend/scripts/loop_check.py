@@ -0,0 +1,106 @@
+"""
+Loop check — fails when any route blocks the event loop
+Usage (from backend/):  python -m scripts.loop_check [--block-ms 50] [--requests 3] [--endpoints a,b] [--allow a,b]
+Drives the scripts.bench endpoints against the fake upstreams (with upstream latency, so a sync HTTP client
+shows up as a stall) while the loop monitor runs in debug mode. Each stall longer than --block-ms is reported
+with the stack that was running; exit status is 1 if any endpoint outside --allow blocked. The first request
+per endpoint is a warm-up (lazy imports / model loads) and is not checked unless --include-warmup.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+async def run(args) -> dict:
+    import httpx
+    import main
+    from scripts.bench import ENDPOINTS
+    from scripts.fake_upstreams import FakeUpstreams
+    from services import loop_monitor
+
+    FakeUpstreams(latency_ms={name: args.latency for name in ("owm", "isric", "agro", "supabase", "gemini")}).install()
+    monitor = loop_monitor.LoopMonitor(interval=args.block_ms / 4000, block_s=args.block_ms / 1000, debug=True)
+    monitor_task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.05)
+
+    selected = [e for e in ENDPOINTS if not args.endpoints or e[0] in args.endpoints]
+    app = loop_monitor.TaskRouteMiddleware(main.app)
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://check", timeout=60) as client:
+        for name, method, path, kwargs, _ in selected:
+            if not args.include_warmup:
+                await client.request(method, path, **kwargs)
+            await asyncio.sleep(args.block_ms / 1000)     # let a stall from the warm-up close out
+            before = len(monitor.events)
+            statuses = []
+            for _ in range(args.requests):
+                statuses.append((await client.request(method, path, **kwargs)).status_code)
+            await asyncio.sleep(args.block_ms / 1000)
+            events = list(monitor.events)[before:]
+            results[name] = {
+                "status": statuses,
+                "blocks": [{k: e[k] for k in ("blocked_ms", "origin", "stack")} for e in events],
+            }
+            verdict = "ok" if not events else f"BLOCKED x{len(events)}"
+            print(f"{name:22s} {verdict}", file=sys.stderr)
+    monitor_task.cancel()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--block-ms", type=float, default=50)
+    parser.add_argument("--requests", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=100, help="fake upstream latency (ms)")
+    parser.add_argument("--endpoints", type=lambda s: [e for e in s.split(",") if e], default=None)
+    parser.add_argument("--allow", type=lambda s: {e for e in s.split(",") if e}, default=set(),
+                        help="endpoints known to block (reported, but don't fail the check)")
+    parser.add_argument("--include-warmup", action="store_true")
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    tmp = tempfile.mkdtemp(prefix="agriai-loopcheck-")
+    from scripts.bench import _write_market_csv
+    from scripts.fake_upstreams import SUPABASE_URL
+    market_csv = os.path.join(tmp, "market.csv")
+    _write_market_csv(market_csv)
+    # Set before main is imported — routers read keys at import time and load_dotenv() won't override
+    os.environ.update({
+        "OWM_API_KEY": "check",
+        "GEMINI_API_KEY": "check",
+        "SUPABASE_URL": SUPABASE_URL,
+        "SUPABASE_SERVICE_KEY": "check",
+        "REDIS_URL": "",
+        "WARMUP_ON_START": "0",
+        "LOOP_MONITOR_INTERVAL_MS": "0",            # the check runs its own monitor
+        "ADMISSION_LIMITS": "",
+        "MARKET_CSV_PATH": market_csv,
+        "CROP_TILE_PATH": os.path.join(tmp, "crop_tiles.sqlite3"),
+        "WEATHER_STORE_PATH": os.path.join(tmp, "weather_store.sqlite3"),
+        "IMAGE_CACHE_DIR": os.path.join(tmp, "imagery"),
+        "RAW_MATERIAL_CSV_PATH": os.path.abspath(os.path.join(BACKEND_DIR, "..", "agricultural_raw_material.csv")),
+    })
+
+    results = asyncio.run(run(args))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = [name for name, r in results.items() if r["blocks"] and name not in args.allow]
+    for name in failed:
+        blocks = results[name]["blocks"]
+        worst = max(blocks, key=lambda b: b["blocked_ms"] or 0)
+        origins = sorted({b["origin"] or "?" for b in blocks})
+        print(f"\n{name}: blocked the loop {len(blocks)}x, worst {worst['blocked_ms']} ms, from",
+              *origins, sep="\n  ", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Memory report — resident memory per worker with private loads vs. shared mmap artifacts
+Usage (from backend/):  python -m scripts.memory_report --workers 4
+Starts N processes per mode that load the crop model and market/price data the way an API
+worker does, touch every page with a query, and report RSS / PSS / private MB before and after.
+PSS (Linux) divides shared pages between the processes mapping them, so it shows the real per-worker cost.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _load(mode: str):
+    from services import shared_data
+    from routers import market, price_forecast
+    mmap = mode == "shared"
+    loaded = {}
+
+    forest = shared_data.shared_path("crop_forest")
+    model_path = os.path.join(BACKEND_DIR, "ml_models", "crop_model.pkl")
+    if mmap and forest:
+        loaded["crop_model"] = shared_data.MmapForest.load(forest)
+    elif not mmap and os.path.exists(model_path):
+        import joblib
+        loaded["crop_model"] = joblib.load(model_path)
+
+    market_dir = shared_data.shared_path("market")
+    if market_dir:
+        loaded["market"] = shared_data.MarketTable.load(market_dir, mmap=mmap)
+    elif not mmap and os.path.exists(market.CSV_PATH):
+        loaded["market"] = shared_data.MarketTable.from_csv(market.CSV_PATH)
+
+    raw_dir = shared_data.shared_path("raw_material")
+    if raw_dir:
+        loaded["raw_material"] = shared_data.RawMaterialTable.load(raw_dir, mmap=mmap)
+    elif not mmap and os.path.exists(price_forecast.CSV_PATH):
+        loaded["raw_material"] = shared_data.RawMaterialTable.from_csv(price_forecast.CSV_PATH)
+    return loaded
+
+
+def _touch(loaded: dict):
+    """Read every page, as a busy worker eventually would."""
+    import numpy as np
+    if "crop_model" in loaded:
+        loaded["crop_model"].predict_proba(np.random.default_rng(0).uniform(0, 200, (256, 7)))
+    for key in ("market", "raw_material"):
+        if key in loaded:
+            arrays = loaded[key].cols.values() if key == "market" else [loaded[key].values]
+            for arr in arrays:
+                float(np.asarray(arr).sum())
+
+
+def _worker(mode: str, loaded_barrier, done_barrier, results):
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import numpy  # noqa: F401 — baseline includes the interpreter + numpy, like a warmed worker
+    from services.shared_data import memory_usage
+    before = memory_usage()
+    loaded = _load(mode)
+    _touch(loaded)
+    loaded_barrier.wait()          # every worker has its data mapped before anyone measures
+    results.put({"mode": mode, "pid": os.getpid(), "loaded": sorted(loaded), "before": before, "after": memory_usage()})
+    done_barrier.wait()
+
+
+def run_mode(mode: str, workers: int) -> list[dict]:
+    ctx = mp.get_context("spawn")
+    loaded_barrier, done_barrier, results = ctx.Barrier(workers), ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(mode, loaded_barrier, done_barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    out = [results.get(timeout=300) for _ in procs]
+    for p in procs:
+        p.join()
+    return out
+
+
+def _summary(rows: list[dict]) -> dict:
+    def avg(phase, key):
+        vals = [r[phase].get(key) for r in rows if r[phase].get(key) is not None]
+        return round(sum(vals) / len(vals), 1) if vals else None
+    return {k: {"before": avg("before", k), "after": avg("after", k)} for k in rows[0]["after"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory: private loads vs shared mmap artifacts")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    report = {"workers": args.workers, "modes": {}}
+    for mode in ("private", "shared"):
+        rows = run_mode(mode, args.workers)
+        report["modes"][mode] = {"per_worker_avg_mb": _summary(rows), "workers": rows}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
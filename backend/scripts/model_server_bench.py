@@ -0,0 +1,145 @@
+"""
+Model server benchmark — in-process inference vs. the out-of-process model server (MODEL_SERVING=server)
+Usage (from backend/):  python -m scripts.model_server_bench [--requests 2000] [--concurrency 16] [--synthetic]
+Runs the same crop (and, when a disease model is present, disease) predict calls both ways from a thread pool
+and reports throughput, latency percentiles and the server's mean batch size. A fresh interpreter per mode
+then loads the models the way an API worker does and reports its memory and the heavy modules it imported.
+--synthetic trains a throwaway forest when ml_models/crop_model.pkl is absent.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Runs inside the child interpreter — the footprint of a worker after its models are loaded
+_PROBE = """
+import json, sys
+from routers import crop_recommend, disease
+from services import shared_data, startup
+crop_recommend._load_model(); disease._load_model()
+print(json.dumps({**shared_data.memory_usage(),
+                  "heavy_modules_loaded": [m for m in startup.HEAVY_MODULES if m in sys.modules]}))
+"""
+
+
+def _synthetic_model(out_dir: str) -> str:
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    rng = np.random.default_rng(0)
+    x = rng.random((2200, 7)) * [140, 145, 205, 45, 100, 10, 300]
+    y = rng.choice(["rice", "maize", "cotton", "wheat", "jute", "coffee", "mango", "lentil"], len(x))
+    path = os.path.join(out_dir, "crop_model.pkl")
+    joblib.dump(RandomForestClassifier(n_estimators=100, random_state=0).fit(x, y), path)
+    return path
+
+
+def _run(predict, make_input, requests: int, concurrency: int) -> dict:
+    predict(make_input(0))                                  # warm up (model load / first connection)
+    latencies = []
+
+    def one(i):
+        t0 = time.perf_counter()
+        predict(make_input(i))
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - t0
+    lat = np.sort(np.array(latencies)) * 1000
+    return {
+        "rps": round(requests / wall, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+    }
+
+
+def _probe(env: dict) -> dict:
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _wait_for(path: str, proc: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if proc.poll() is not None or time.monotonic() > deadline:
+            raise SystemExit(f"model server did not start:\n{proc.stdout.read() if proc.stdout else ''}")
+        time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--synthetic", action="store_true", help="train a throwaway crop model if none exists")
+    parser.add_argument("--cpus", default="", help="CPU ids to pin the model server to")
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    tmp = tempfile.mkdtemp(prefix="agriai-models-")
+    env = dict(os.environ, WARMUP_ON_START="0", MODEL_SERVER_SOCKET=os.path.join(tmp, "models.sock"))
+    if args.synthetic and not os.path.exists(os.path.join(BACKEND_DIR, "ml_models", "crop_model.pkl")):
+        env["CROP_MODEL_PATH"] = _synthetic_model(tmp)
+    os.environ.update(env)
+
+    from routers import crop_recommend, disease
+    from services import model_server
+    crop, encoder = crop_recommend._load_local()
+    backend, _ = disease._load_local()
+    if crop is None and backend is None:
+        raise SystemExit("No crop or disease model found (use --synthetic for a crop model)")
+
+    rng = np.random.default_rng(1)
+    features = rng.random((256, 7)) * [140, 145, 205, 45, 100, 10, 300]
+    images = rng.random((8, 224, 224, 3)).astype(np.float32)
+    workloads = {}
+    if crop is not None:
+        workloads["crop"] = (lambda m: m.predict_proba, lambda i: features[i % 256:i % 256 + 1])
+    if backend is not None:
+        workloads["disease"] = (lambda m: m.predict, lambda i: images[i % 8:i % 8 + 1])
+
+    report = {"meta": {"requests": args.requests, "concurrency": args.concurrency, "cpus": os.cpu_count()}}
+    for name, (method, make_input) in workloads.items():
+        model = crop if name == "crop" else backend
+        report[f"{name}_inprocess"] = _run(method(model), make_input, args.requests, args.concurrency)
+
+    cmd = [sys.executable, "-m", "services.model_server", "--socket", env["MODEL_SERVER_SOCKET"]]
+    if args.cpus:
+        cmd += ["--cpus", args.cpus]
+    server = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        _wait_for(env["MODEL_SERVER_SOCKET"], server)
+        client = model_server.ModelClient(env["MODEL_SERVER_SOCKET"])
+        info = client.info()
+        remote = {"crop": model_server.RemoteCropModel(client, info.get("crop_classes", [])),
+                  "disease": model_server.RemoteDiseaseModel(client)}
+        for name, (method, make_input) in workloads.items():
+            report[f"{name}_server"] = _run(method(remote[name]), make_input, args.requests, args.concurrency)
+        report["server_batching"] = client.info()["stats"]
+
+        report["worker_memory_inprocess"] = _probe(dict(env, MODEL_SERVING="inprocess"))
+        report["worker_memory_server"] = _probe(dict(env, MODEL_SERVING="server"))
+        client.close()
+    finally:
+        server.terminate()
+        server.wait(10)
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Payload benchmark — response size and serialization time for the series endpoints' encodings
+Usage (from backend/):  python -m scripts.payload_bench [--repeats 2000] [--out payload.json]
+Compares stdlib json (what FastAPI's JSONResponse uses), orjson rows, columnar JSON and columnar msgpack
+on payloads shaped like /satellite/ndvi, /market/prices and /price-forecast, raw and gzipped.
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+
+from services import encoding
+
+
+def ndvi_rows(n: int, rng: random.Random) -> list[dict]:
+    return [{"day": i + 1, "ndvi": round(rng.uniform(0.2, 0.8), 3), "evi": round(rng.uniform(0.01, 0.2), 3),
+             "threshold": 0.4} for i in range(n)]
+
+
+def market_rows(n: int, rng: random.Random) -> list[dict]:
+    return [{"name": f"Commodity {i}", "price": float(rng.randint(800, 9000)), "change": 0, "vol": 0,
+             "low": float(rng.randint(600, 800)), "high": float(rng.randint(9000, 9500))} for i in range(n)]
+
+
+def forecast_rows(n: int, rng: random.Random) -> list[dict]:
+    months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    out = []
+    for i in range(n):
+        p = 6200 + rng.randint(-100, 200) + i * 20
+        out.append({"month": months[i % 12], "price": p, "low": p - rng.randint(100, 200), "high": p + rng.randint(100, 250)})
+    return out
+
+
+def payloads(seed: int) -> dict:
+    rng = random.Random(seed)
+    return {
+        "ndvi_30d": (ndvi_rows(30, rng), ("threshold",)),
+        "ndvi_365d": (ndvi_rows(365, rng), ("threshold",)),
+        "market_150": (market_rows(150, rng), ("change", "vol")),
+        "forecast_6m": (forecast_rows(6, rng), ()),
+        "forecast_24m": (forecast_rows(24, rng), ()),
+    }
+
+
+def encoders(constant_keys: tuple) -> dict:
+    out = {
+        "json_stdlib": lambda rows: json.dumps(rows).encode(),
+        "json_rows": lambda rows: encoding.encode_series(encoding.JSON, rows)[0],
+        "columnar_json": lambda rows: encoding.encode_series(encoding.COLUMNAR, rows, constant_keys=constant_keys)[0],
+    }
+    if encoding.msgpack is not None:
+        out["columnar_msgpack"] = lambda rows: encoding.encode_series(encoding.MSGPACK, rows, constant_keys=constant_keys)[0]
+    return out
+
+
+def measure(fn, rows, repeats: int) -> tuple[bytes, float]:
+    body = fn(rows)
+    samples = []
+    batch = max(1, repeats // 20)
+    for _ in range(20):
+        t0 = time.perf_counter()
+        for _ in range(batch):
+            fn(rows)
+        samples.append((time.perf_counter() - t0) / batch)
+    samples.sort()
+    return body, samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload size and serialization time per encoding")
+    parser.add_argument("--repeats", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    if encoding.orjson is None:
+        print("WARNING: orjson not installed — json_rows falls back to the stdlib encoder", file=sys.stderr)
+    if encoding.msgpack is None:
+        print("WARNING: msgpack not installed — columnar_msgpack skipped", file=sys.stderr)
+
+    report = {}
+    for name, (rows, constant_keys) in payloads(args.seed).items():
+        report[name] = {}
+        baseline = None
+        for enc, fn in encoders(constant_keys).items():
+            body, seconds = measure(fn, rows, args.repeats)
+            row = {
+                "bytes": len(body),
+                "gzip_bytes": len(gzip.compress(body, 6)),
+                "encode_us": round(seconds * 1e6, 2),
+            }
+            if baseline is None:
+                baseline = row
+            row["size_vs_stdlib"] = round(row["bytes"] / baseline["bytes"], 3)
+            row["speedup_vs_stdlib"] = round(baseline["encode_us"] / row["encode_us"], 2) if row["encode_us"] else None
+            report[name][enc] = row
+
+    print(f"{'payload':<14} {'encoding':<18} {'bytes':>8} {'gzip':>7} {'encode µs':>10} {'size×':>6} {'speed×':>7}")
+    for name, rows in report.items():
+        for enc, r in rows.items():
+            print(f"{name:<14} {enc:<18} {r['bytes']:>8} {r['gzip_bytes']:>7} {r['encode_us']:>10} "
+                  f"{r['size_vs_stdlib']:>6} {r['speedup_vs_stdlib']:>7}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Admission Control — per-route concurrency limits, per-user quotas and load shedding for expensive endpoints
+Each route class in ADMISSION_LIMITS ("prefix=concurrency/queue/budget_ms", comma-separated) runs at most
+`concurrency` requests at once per worker; up to `queue` more wait in FIFO order. A request is shed with a fast
+503 + Retry-After when the queue is full, or when its expected wait plus the class's recent service time would
+overshoot `budget_ms` (or what is left of the request deadline) — it would only have timed out later, after
+holding a socket and queue slot. A user (bearer token, else client address) may hold at most
+ADMISSION_USER_LIMIT running-or-queued requests per class; the next one gets 429 + Retry-After.
+Cheap routes (/weather, /soil, …) are not listed and never wait here.
+"""
+import asyncio
+import hashlib
+import math
+import os
+import time
+from collections import deque
+
+from services import metrics, resilience
+
+DEFAULT_LIMITS = (
+    "/api/v1/disease=4/8/6000,"
+    "/api/v1/price-forecast=2/8/5000,"
+    "/api/v1/crop-recommend/what-if=2/8/5000,"
+    "/api/v1/insights=4/16/8000,"
+    "/api/v1/dashboard=8/16/8000"
+)
+USER_LIMIT = int(os.getenv("ADMISSION_USER_LIMIT", "2"))
+# Service-time smoothing (EWMA weight of the newest sample)
+SERVICE_ALPHA = 0.2
+
+ADMISSIONS = metrics.Counter(
+    "agriai_admission_requests_total", "Requests by admission outcome (admitted, queued, shed, user_limited)",
+    ("route", "result"),
+)
+IN_FLIGHT = metrics.Gauge("agriai_admission_in_flight", "Requests running in an admission-controlled class", ("route",))
+QUEUED = metrics.Gauge("agriai_admission_queue_depth", "Requests waiting for an admission slot", ("route",))
+QUEUE_WAIT = metrics.Histogram(
+    "agriai_admission_queue_wait_seconds", "Time admitted requests spent waiting for a slot", ("route",),
+)
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, retry_after: float, reason: str):
+        self.status, self.retry_after, self.reason = status, retry_after, reason
+
+
+class RouteClass:
+    """Concurrency slots + bounded FIFO wait queue for one route prefix (one worker, one event loop)."""
+
+    def __init__(self, prefix: str, concurrency: int, queue: int, budget_s: float):
+        self.prefix, self.concurrency, self.queue, self.budget_s = prefix, concurrency, queue, budget_s
+        self.running = 0
+        self.service_s: float | None = None          # EWMA of admitted requests' run time
+        self._waiters: deque = deque()
+        self._users: dict[str, int] = {}
+
+    def expected_wait(self, position: int) -> float:
+        """Rough wait for the request at queue `position` (0 = next) given the recent service time."""
+        if self.service_s is None:
+            return 0.0
+        return (position // self.concurrency + 1) * self.service_s if self.running >= self.concurrency else 0.0
+
+    def _retry_after(self) -> float:
+        return max(1.0, self.expected_wait(len(self._waiters)))
+
+    async def acquire(self, user: str):
+        if self._users.get(user, 0) >= USER_LIMIT:
+            raise Rejected(429, self._retry_after(), "user_limited")
+        budget = self.budget_s
+        left = resilience.remaining()
+        if left is not None:
+            budget = min(budget, left)
+
+        if self.running < self.concurrency and not self._waiters:
+            self._take(user)
+            return 0.0
+        if len(self._waiters) >= self.queue:
+            raise Rejected(503, self._retry_after(), "queue_full")
+        wait = self.expected_wait(len(self._waiters))
+        if wait + (self.service_s or 0.0) > budget:
+            raise Rejected(503, self._retry_after(), "over_budget")
+
+        ADMISSIONS.inc(route=self.prefix, result="queued")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._users[user] = self._users.get(user, 0) + 1      # counts against the quota while queued too
+        QUEUED.set(len(self._waiters), route=self.prefix)
+        t0 = time.monotonic()
+        try:
+            # Give up once finishing in budget is no longer possible
+            await asyncio.wait_for(waiter, max(0.0, budget - (self.service_s or 0.0)))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()                            # slot was handed over as we timed out
+            else:
+                waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            self._drop_user(user)
+            QUEUED.set(len(self._waiters), route=self.prefix)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise Rejected(503, self._retry_after(), "over_budget")
+        QUEUED.set(len(self._waiters), route=self.prefix)
+        return time.monotonic() - t0
+
+    def _take(self, user: str):
+        self.running += 1
+        self._users[user] = self._users.get(user, 0) + 1
+        IN_FLIGHT.set(self.running, route=self.prefix)
+
+    def _drop_user(self, user: str):
+        n = self._users.get(user, 0) - 1
+        if n > 0:
+            self._users[user] = n
+        else:
+            self._users.pop(user, None)
+
+    def _release_slot(self):
+        # Hand the slot straight to the oldest live waiter, so running never dips below the limit under load
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+        IN_FLIGHT.set(self.running, route=self.prefix)
+
+    def release(self, user: str, service_s: float):
+        self._drop_user(user)
+        self.service_s = service_s if self.service_s is None else (
+            SERVICE_ALPHA * service_s + (1 - SERVICE_ALPHA) * self.service_s
+        )
+        self._release_slot()
+        QUEUED.set(len(self._waiters), route=self.prefix)
+
+    def snapshot(self) -> dict:
+        return {
+            "concurrency": self.concurrency, "queue": self.queue, "budget_s": self.budget_s,
+            "running": self.running, "queued": len(self._waiters),
+            "service_ms": None if self.service_s is None else round(self.service_s * 1000, 1),
+        }
+
+
+def _parse_limits(text: str) -> list[RouteClass]:
+    classes = []
+    for item in filter(None, (p.strip() for p in text.split(","))):
+        prefix, spec = item.split("=", 1)
+        concurrency, queue, budget_ms = (int(v) for v in spec.split("/"))
+        classes.append(RouteClass(prefix.strip(), concurrency, queue, budget_ms / 1000))
+    # Longest prefix first, so a specific route can be limited apart from its parent
+    return sorted(classes, key=lambda c: -len(c.prefix))
+
+
+_classes: list[RouteClass] | None = None
+
+
+def get_classes() -> list[RouteClass]:
+    global _classes
+    if _classes is None:
+        _classes = _parse_limits(os.getenv("ADMISSION_LIMITS", DEFAULT_LIMITS))
+    return _classes
+
+
+def _user_key(scope) -> str:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            return hashlib.sha1(value).hexdigest()[:16]
+    client = scope.get("client")
+    return client[0] if client else "anonymous"
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the route classes above (see module docstring)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") == "OPTIONS":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        route = next((c for c in get_classes() if path.startswith(c.prefix)), None)
+        if route is None:
+            return await self.app(scope, receive, send)
+
+        user = _user_key(scope)
+        try:
+            waited = await route.acquire(user)
+        except Rejected as e:
+            ADMISSIONS.inc(route=route.prefix, result="user_limited" if e.status == 429 else "shed")
+            return await _reject(send, e)
+        ADMISSIONS.inc(route=route.prefix, result="admitted")
+        QUEUE_WAIT.observe(waited, route=route.prefix)
+        t0 = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route.release(user, time.monotonic() - t0)
+
+
+async def _reject(send, e: Rejected):
+    from services.encoding import dumps
+    body = dumps({"detail": "Server busy, retry later" if e.status == 503 else "Too many concurrent requests",
+                  "reason": e.reason})
+    await send({
+        "type": "http.response.start",
+        "status": e.status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(math.ceil(e.retry_after)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,144 @@
+"""
+Alert Hub — in-process fan-out of new alerts to SSE / WebSocket subscribers, across workers via Redis pub/sub
+Subscribers listen on topics ("user:<id>", "farm:<id>"). publish() sends the alert to Redis channel
+agriai:alerts; every worker's listener task receives it and delivers it to its own local subscribers.
+Without Redis (or while this worker's listener is disconnected) alerts are delivered in-process only.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from services import metrics
+from services.redis_cache import get_redis
+
+CHANNEL = "agriai:alerts"
+QUEUE_SIZE = 100           # per subscriber; a client this far behind loses its oldest alerts
+
+SUBSCRIBERS = metrics.Gauge("agriai_alert_subscribers", "Open alert stream connections in this worker")
+PUBLISHED = metrics.Counter("agriai_alerts_published_total", "Alerts published, by transport", ("transport",))
+DELIVERED = metrics.Counter("agriai_alerts_delivered_total", "Alerts handed to local subscribers")
+DROPPED = metrics.Counter("agriai_alerts_dropped_total", "Alerts dropped because a subscriber queue was full")
+DELIVERY_LAG = metrics.Histogram("agriai_alert_delivery_seconds", "Publish-to-local-delivery latency")
+
+
+def topics_for(user_id: str | None = None, farm_id: str | None = None) -> list[str]:
+    return [t for t in (f"user:{user_id}" if user_id else None, f"farm:{farm_id}" if farm_id else None) if t]
+
+
+def _publish_shared(payload: str) -> bool:
+    """Publish to every worker through Redis; False when Redis is not in use. Blocking — call in a thread."""
+    r = get_redis()
+    if r is None:
+        return False
+    r.publish(CHANNEL, payload)
+    return True
+
+
+class AlertHub:
+    def __init__(self):
+        self._subs: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._listener: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.redis_connected = False
+
+    # ── Subscribing ─────────────────────────────────────────────────────────
+
+    @asynccontextmanager
+    async def subscribe(self, topics: list[str]):
+        """`async with hub.subscribe(["user:..."]) as queue:` — queue yields alert events as dicts."""
+        self._ensure_listener()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for topic in topics:
+            self._subs[topic].add(queue)
+        SUBSCRIBERS.inc()
+        try:
+            yield queue
+        finally:
+            for topic in topics:
+                self._subs[topic].discard(queue)
+                if not self._subs[topic]:
+                    del self._subs[topic]
+            SUBSCRIBERS.dec()
+
+    def _deliver(self, event: dict):
+        seen = set()
+        for topic in event.get("topics", []):
+            for queue in self._subs.get(topic, ()):
+                if id(queue) in seen:
+                    continue                      # subscribed to both the user and the farm topic
+                seen.add(id(queue))
+                if queue.full():
+                    queue.get_nowait()
+                    DROPPED.inc()
+                queue.put_nowait(event)
+                DELIVERED.inc()
+        if seen and event.get("published_at"):
+            DELIVERY_LAG.observe(max(0.0, time.time() - event["published_at"]))
+
+    # ── Publishing ──────────────────────────────────────────────────────────
+
+    async def publish(self, alert: dict, user_id: str | None = None, farm_id: str | None = None):
+        event = {
+            "id": str(alert.get("id") or uuid.uuid4()),
+            "topics": topics_for(user_id, farm_id or alert.get("farm_id")),
+            "alert": alert,
+            "published_at": time.time(),
+        }
+        try:
+            # redis-py is synchronous, and get_redis() may connect — keep both off the event loop
+            if await asyncio.to_thread(_publish_shared, json.dumps(event, default=str)):
+                PUBLISHED.inc(transport="redis")
+                if self.redis_connected:
+                    return                        # our own listener delivers it, like every other worker's
+        except Exception as e:
+            print(f"Alert publish to Redis failed: {e}")
+        PUBLISHED.inc(transport="local")
+        self._deliver(event)
+
+    # ── Redis listener ──────────────────────────────────────────────────────
+
+    def _ensure_listener(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._listener = loop, None
+        if self._listener is None and os.getenv("REDIS_URL", ""):
+            self._listener = loop.create_task(self._listen(os.getenv("REDIS_URL")))
+
+    async def _listen(self, url: str):
+        import redis.asyncio as aioredis
+        backoff = 1.0
+        while True:
+            client = aioredis.from_url(url, decode_responses=True)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    self.redis_connected, backoff = True, 1.0
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            try:
+                                self._deliver(json.loads(message["data"]))
+                            except Exception as e:
+                                print(f"Bad alert event: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Alert listener disconnected from Redis: {e}")
+            finally:
+                self.redis_connected = False
+                await client.aclose()
+            await asyncio.sleep(backoff)
+            backoff = min(30.0, backoff * 2)
+
+
+_hub: AlertHub | None = None
+
+
+def get_alert_hub() -> AlertHub:
+    global _hub
+    if _hub is None:
+        _hub = AlertHub()
+    return _hub
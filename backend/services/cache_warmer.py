@@ -0,0 +1,170 @@
+"""
+Cache Warmer — prefetches weather, soil and NDVI for every registered farm ahead of peak dashboard windows
+CACHE_WARM_PEAKS lists local peak start times ("06:30,17:00" in CACHE_WARM_TZ); each run starts
+CACHE_WARM_LEAD_MIN before one. It rebuilds the farm index from the farms table, collapses farms into
+distinct weather cells, soil cells and NDVI polygons, and refreshes each through the routers' own cached
+fetch functions — with a TTL stretched to cover the peak — most-shared first, as background-priority
+upstream calls. A run stops at CACHE_WARM_BUDGET upstream calls or CACHE_WARM_MAX_S seconds.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+from services import metrics, rate_limit
+
+PEAKS = [p.strip() for p in os.getenv("CACHE_WARM_PEAKS", "").split(",") if p.strip()]
+TZ = os.getenv("CACHE_WARM_TZ", "Asia/Kolkata")
+LEAD_S = float(os.getenv("CACHE_WARM_LEAD_MIN", "15")) * 60
+BUDGET = int(os.getenv("CACHE_WARM_BUDGET", "300"))
+MAX_S = float(os.getenv("CACHE_WARM_MAX_S", "600"))
+CONCURRENCY = int(os.getenv("CACHE_WARM_CONCURRENCY", "4"))
+
+WARM_RUNS = metrics.Counter("agriai_cache_warm_runs_total", "Cache warm-up runs, by trigger", ("trigger",))
+WARM_ITEMS = metrics.Counter(
+    "agriai_cache_warm_items_total", "Cells/polygons handled by warm-up, by kind and result", ("kind", "result"),
+)
+WARM_COVERAGE = metrics.Gauge(
+    "agriai_cache_warm_coverage_ratio", "Share of farms whose data was cached after the last warm-up", ("kind",),
+)
+WARM_DURATION = metrics.Gauge("agriai_cache_warm_duration_seconds", "Duration of the last warm-up run")
+WARM_CALLS = metrics.Gauge("agriai_cache_warm_upstream_calls", "Upstream calls made by the last warm-up run")
+
+
+class _Job:
+    __slots__ = ("kind", "key", "farms", "calls", "ttl", "fetch")
+
+    def __init__(self, kind: str, key: str, farms: int, calls: int, ttl: int, fetch):
+        self.kind, self.key, self.farms, self.calls, self.ttl, self.fetch = kind, key, farms, calls, ttl, fetch
+
+
+def _jobs(index) -> list[_Job]:
+    """One job per distinct weather cell, soil cell and NDVI polygon, most farms first."""
+    from routers import satellite, soil, weather
+    from services.farm_index import cell_center, SOIL_CELL_DEG, WEATHER_CELL_DEG
+
+    jobs = []
+    if weather.OWM_KEY:
+        for cell, farms in index.group_by_cell(WEATHER_CELL_DEG).items():
+            lat, lng = cell_center(cell, WEATHER_CELL_DEG)
+            jobs.append(_Job("weather", weather.weather_key(lat, lng), len(farms), 2, weather.WEATHER_CACHE_S,
+                             lambda ttl, lat=lat, lng=lng: weather.fetch_weather(lat, lng, ttl=ttl, force=True)))
+    for cell, farms in index.group_by_cell(SOIL_CELL_DEG).items():
+        lat, lng = cell_center(cell, SOIL_CELL_DEG)
+        jobs.append(_Job("soil", soil.soil_key(lat, lng), len(farms), 1, soil.SOIL_CACHE_S,
+                         lambda ttl, lat=lat, lng=lng: soil.fetch_soil_properties(lat, lng, ttl=ttl, force=True)))
+    if satellite.OWM_KEY:
+        polygons: dict[str, int] = {}
+        for farm in list(index.farms.values()):
+            if farm.get("agromonitoring_polygon_id"):
+                polygons[farm["agromonitoring_polygon_id"]] = polygons.get(farm["agromonitoring_polygon_id"], 0) + 1
+        for polygon_id, n in polygons.items():
+            jobs.append(_Job("ndvi", satellite.ndvi_key(polygon_id), n, 1, satellite.NDVI_CACHE_S,
+                             lambda ttl, p=polygon_id: satellite.fetch_ndvi(p, ttl=ttl, force=True)))
+    jobs.sort(key=lambda j: -j.farms)
+    return jobs
+
+
+async def warm(until_peak_s: float = 0.0, budget: int = BUDGET, max_s: float = MAX_S, trigger: str = "manual") -> dict:
+    """
+    Refresh every cache entry that would expire before the peak window is under way. Entries are
+    cached for until_peak_s + their normal TTL, so data warmed ahead of time still lasts through the peak.
+    """
+    from services.farm_index import get_farm_index
+    from services.redis_cache import cache_ttl_async
+
+    t0 = time.monotonic()
+    WARM_RUNS.inc(trigger=trigger)
+    index = await asyncio.to_thread(get_farm_index, 60)
+    jobs = await asyncio.to_thread(_jobs, index)
+    left = {"calls": budget}
+    results: dict[str, dict[str, int]] = {}
+    covered: dict[str, int] = {}
+    totals: dict[str, int] = {}
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def run(job: _Job):
+        totals[job.kind] = totals.get(job.kind, 0) + job.farms
+        remaining = await cache_ttl_async(job.key)
+        if remaining is not None and remaining >= until_peak_s + job.ttl / 2:
+            result = "fresh"
+        else:
+            async with sem:
+                if left["calls"] < job.calls or time.monotonic() - t0 > max_s:
+                    result = "skipped"
+                else:
+                    left["calls"] -= job.calls
+                    try:
+                        with rate_limit.background():
+                            await job.fetch(int(until_peak_s + job.ttl))
+                        result = "warmed"
+                    except Exception:
+                        result = "failed"
+        if result in ("fresh", "warmed"):
+            covered[job.kind] = covered.get(job.kind, 0) + job.farms
+        WARM_ITEMS.inc(kind=job.kind, result=result)
+        counts = results.setdefault(job.kind, {})
+        counts[result] = counts.get(result, 0) + 1
+
+    await asyncio.gather(*(run(job) for job in jobs))
+
+    duration = time.monotonic() - t0
+    coverage = {}
+    for kind, total in totals.items():
+        coverage[kind] = round(covered.get(kind, 0) / total, 3) if total else 1.0
+        WARM_COVERAGE.set(coverage[kind], kind=kind)
+    WARM_DURATION.set(duration)
+    WARM_CALLS.set(budget - left["calls"])
+    return {
+        "farms": len(index),
+        "items": results,
+        "coverage": coverage,
+        "upstream_calls": budget - left["calls"],
+        "budget": budget,
+        "seconds": round(duration, 2),
+    }
+
+
+# ── Schedule ────────────────────────────────────────────────────────────────
+
+def next_run(now: datetime | None = None) -> tuple[datetime, datetime] | None:
+    """(run time, peak time) of the next warm-up, or None when no peaks are configured."""
+    from zoneinfo import ZoneInfo
+    if not PEAKS:
+        return None
+    tz = ZoneInfo(TZ)
+    now = now or datetime.now(tz)
+    candidates = []
+    for peak in PEAKS:
+        hour, minute = (int(v) for v in peak.split(":"))
+        for day in (0, 1):
+            at = (now + timedelta(days=day)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if at - timedelta(seconds=LEAD_S) > now:
+                candidates.append((at - timedelta(seconds=LEAD_S), at))
+    return min(candidates)
+
+
+def _claim_peak(peak: datetime) -> bool:
+    """With Redis, only the first worker to claim a peak warms for it; without, every worker does."""
+    from services.redis_cache import get_redis
+    r = get_redis()
+    return r is None or bool(r.set(f"cache-warm:{peak.isoformat()}", os.getpid(), nx=True, ex=int(LEAD_S) + 60))
+
+
+async def scheduler():
+    """Runs for the life of the worker. With Redis, only one worker warms for each peak."""
+    while True:
+        nxt = next_run()
+        if nxt is None:
+            return
+        run_at, peak = nxt
+        await asyncio.sleep(max(0.0, (run_at - datetime.now(run_at.tzinfo)).total_seconds()))
+        try:
+            if await asyncio.to_thread(_claim_peak, peak):
+                report = await warm((peak - datetime.now(peak.tzinfo)).total_seconds(), trigger="schedule")
+                print(f"Cache warm-up for {peak:%H:%M}: {report}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Cache warm-up failed: {e}")
+        await asyncio.sleep(1)
@@ -0,0 +1,78 @@
+"""
+Conditional GET — ETag / Cache-Control helpers for read endpoints
+When the ETag can be derived from the inputs (static datasets, immutable soil grids) the endpoint checks
+If-None-Match *before* doing any work and answers 304 without fetching or serializing anything.
+Otherwise the ETag is a hash of the serialized body, which still saves the client the download.
+"""
+import hashlib
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from services import encoding, metrics
+
+CONDITIONAL = metrics.Counter(
+    "agriai_conditional_requests_total", "Responses to read endpoints by conditional-GET outcome", ("route", "result"),
+)
+
+
+def etag_for(*parts, weak: bool = True) -> str:
+    """
+    ETag from values that fully determine the response (dataset version, query params...). Weak unless
+    the parts pin down the exact bytes (immutable files) — If-Range only accepts strong validators.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def body_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 §13.1.2): W/"x" matches "x"
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def cache_control(max_age: int, private: bool = False, stale_while_revalidate: int = 0) -> str:
+    value = f"{'private' if private else 'public'}, max-age={max_age}"
+    if stale_while_revalidate:
+        value += f", stale-while-revalidate={stale_while_revalidate}"
+    return value
+
+
+def not_modified(request: Request, etag: str, cache: str, route: str, vary: str | None = None) -> Response | None:
+    """304 response if the client already holds `etag`, else None (carry on and build the body)."""
+    if not _matches(request, etag):
+        return None
+    CONDITIONAL.inc(route=route, result="not_modified")
+    headers = {"ETag": etag, "Cache-Control": cache}
+    if vary:
+        headers["Vary"] = vary
+    return Response(status_code=304, headers=headers)
+
+
+def response(request: Request, body: bytes, media_type: str, cache: str, route: str,
+             etag: str | None = None, vary: str | None = None) -> Response:
+    """Encoded body with ETag + Cache-Control; 304 when If-None-Match matches."""
+    etag = etag or body_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache}
+    if vary:
+        headers["Vary"] = vary
+    if _matches(request, etag):
+        CONDITIONAL.inc(route=route, result="not_modified")
+        return Response(status_code=304, headers=headers)
+    CONDITIONAL.inc(route=route, result="full")
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def json_response(request: Request, content, cache: str, route: str, etag: str | None = None) -> Response:
+    """JSON response carrying ETag + Cache-Control; 304 when If-None-Match matches the body's ETag."""
+    body = encoding.dumps(jsonable_encoder(content))
+    return response(request, body, "application/json", cache, route, etag=etag)
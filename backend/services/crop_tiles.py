@@ -0,0 +1,215 @@
+"""
+Crop Recommendation Tiles — precomputed top-3 crops per 0.1° cell (the weather cell of services/farm_index.py)
+One 41-byte record per cell in a SQLite file shared by every worker on the host (CROP_TILE_PATH):
+  computed_at (uint32) · 7 model inputs (float32) · top-3 class indices (uint8) · confidences ×10 (uint16)
+Class names live once in the meta table; a different model (different classes) invalidates all tiles.
+Filled by the background refresher in routers/crop_recommend.py and by live requests (write-through).
+"""
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:                                # Windows — no host-wide refresh lock
+    fcntl = None
+
+from services import metrics
+from services.farm_index import WEATHER_CELL_DEG, cell_of, cell_center
+
+TILE_PATH = os.getenv("CROP_TILE_PATH", os.path.join(os.path.dirname(__file__), "..", "crop_tiles.sqlite3"))
+# A tile older than this is not served (the live pipeline runs and rewrites it)
+MAX_AGE_S = float(os.getenv("CROP_TILE_MAX_AGE_S", str(6 * 3600)))
+CELL_DEG = WEATHER_CELL_DEG
+FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+_RECORD = struct.Struct("<I7f3B3H")
+_CACHE_S = 60              # decoded tiles kept in-process this long before re-reading the file
+_CACHE_CELLS = 4096        # most recently used cells kept decoded (requests may name any lat/lng)
+
+TILE_LOOKUPS = metrics.Counter("agriai_crop_tile_lookups_total", "Crop tile lookups by result", ("result",))
+TILES_WRITTEN = metrics.Counter("agriai_crop_tiles_written_total", "Crop tiles written, by source", ("source",))
+
+
+def classes_version(classes) -> str:
+    return hashlib.blake2b("|".join(map(str, classes)).encode(), digest_size=8).hexdigest()
+
+
+class Tile:
+    __slots__ = ("cell", "computed_at", "inputs", "top3")
+
+    def __init__(self, cell: tuple[int, int], computed_at: int, inputs: dict, top3: list[tuple[str, float]]):
+        self.cell = cell
+        self.computed_at = computed_at
+        self.inputs = inputs
+        self.top3 = top3                           # [(crop, confidence %), ...] best first
+
+    @property
+    def age_s(self) -> float:
+        return time.time() - self.computed_at
+
+
+class TileStore:
+    def __init__(self, path: str = TILE_PATH):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._classes: list[str] | None = None
+        self._classes_version: str | None = None   # meta classes_version that _classes was read for
+        self._cache: OrderedDict[tuple[int, int], tuple[float, Tile | None]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._refresh_lock: int | None = None      # fd holding the host-wide refresh lock, once taken
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS tiles (i INTEGER, j INTEGER, rec BLOB, PRIMARY KEY (i, j)) WITHOUT ROWID")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        return self._db
+
+    # ── Classes (model identity) ────────────────────────────────────────────
+
+    def bind_classes(self, classes) -> None:
+        """Declare the model's class order; tiles written for a different model are dropped."""
+        classes = [str(c) for c in classes]
+        version = classes_version(classes)
+        with self._lock:
+            db = self._conn()
+            row = db.execute("SELECT v FROM meta WHERE k = 'classes_version'").fetchone()
+            if row is None or row[0] != version:
+                db.execute("BEGIN")
+                db.execute("DELETE FROM tiles")
+                db.execute("INSERT OR REPLACE INTO meta VALUES ('classes_version', ?)", (version,))
+                db.execute("INSERT OR REPLACE INTO meta VALUES ('classes', ?)", ("\n".join(classes),))
+                db.execute("COMMIT")
+                with self._cache_lock:
+                    self._cache.clear()
+            self._classes, self._classes_version = classes, version
+
+    def _load_classes(self) -> list[str] | None:
+        """Class names for the tiles in the file, re-read whenever a worker binds a retrained model."""
+        db = self._conn()
+        row = db.execute("SELECT v FROM meta WHERE k = 'classes_version'").fetchone()
+        version = row[0] if row else None
+        if version != self._classes_version or self._classes is None:
+            row = db.execute("SELECT v FROM meta WHERE k = 'classes'").fetchone()
+            self._classes, self._classes_version = (row[0].split("\n") if row else None), version
+            with self._cache_lock:
+                self._cache.clear()                # decoded with the previous class list
+        return self._classes
+
+    # ── Read / write ────────────────────────────────────────────────────────
+
+    def get(self, lat: float, lng: float) -> Tile | None:
+        """Fresh tile for the cell containing (lat, lng), else None. Reads SQLite — call via asyncio.to_thread."""
+        cell = cell_of(lat, lng, CELL_DEG)
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._cache.get(cell)
+            if cached is not None:
+                self._cache.move_to_end(cell)
+        if cached is not None and now - cached[0] < _CACHE_S:
+            tile = cached[1]
+        else:
+            tile = self._read(cell)
+            with self._cache_lock:
+                self._cache[cell] = (now, tile)
+                self._cache.move_to_end(cell)
+                if len(self._cache) > _CACHE_CELLS:
+                    self._cache.popitem(last=False)
+        if tile is None or tile.age_s > MAX_AGE_S:
+            TILE_LOOKUPS.inc(result="miss" if tile is None else "stale")
+            return None
+        TILE_LOOKUPS.inc(result="hit")
+        return tile
+
+    def _read(self, cell: tuple[int, int]) -> Tile | None:
+        if not os.path.exists(self.path):
+            return None
+        with self._lock:
+            # One read transaction, so the record and the class list come from the same model
+            db = self._conn()
+            db.execute("BEGIN")
+            try:
+                classes = self._load_classes()
+                row = db.execute("SELECT rec FROM tiles WHERE i = ? AND j = ?", cell).fetchone()
+            finally:
+                db.execute("COMMIT")
+        if row is None or classes is None:
+            return None
+        return self._decode(cell, row[0], classes)
+
+    def peek(self, cell: tuple[int, int]) -> Tile | None:
+        """Tile for a cell regardless of age (the refresher compares inputs against it)."""
+        return self._read(cell)
+
+    @staticmethod
+    def _decode(cell, rec: bytes, classes: list[str]) -> Tile:
+        values = _RECORD.unpack(rec)
+        inputs = dict(zip(FEATURES, (round(v, 2) for v in values[1:8])))
+        top3 = [(classes[k], c / 10) for k, c in zip(values[8:11], values[11:14]) if k < len(classes)]
+        return Tile(cell, values[0], inputs, top3)
+
+    def put_many(self, tiles: list[tuple[tuple[int, int], dict, list[tuple[int, float]]]], source: str):
+        """Write (cell, inputs, [(class index, confidence %), ...]) records in one transaction."""
+        now = int(time.time())
+        rows = []
+        for cell, inputs, top3 in tiles:
+            idx = [k for k, _ in top3] + [255] * (3 - len(top3))
+            conf = [int(round(c * 10)) for _, c in top3] + [0] * (3 - len(top3))
+            rows.append((cell[0], cell[1], _RECORD.pack(now, *(float(inputs[f]) for f in FEATURES), *idx, *conf)))
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN")
+            db.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?)", rows)
+            db.execute("COMMIT")
+        with self._cache_lock:
+            for cell, _, _ in tiles:
+                self._cache.pop(cell, None)
+        TILES_WRITTEN.inc(len(rows), source=source)
+
+    def count(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with self._lock:
+            return self._conn().execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+
+    def try_refresh_lock(self) -> bool:
+        """
+        Whether this worker refreshes tiles without Redis: the first worker on the host to take an exclusive
+        lock on <CROP_TILE_PATH>.lock keeps it for its lifetime (the next one takes over if it exits).
+        """
+        if fcntl is None:
+            return True
+        if self._refresh_lock is None:
+            fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._refresh_lock = fd
+        return True
+
+
+def cells_in_bbox(min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> list[tuple[int, int]]:
+    (i0, j0), (i1, j1) = cell_of(min_lat, min_lng, CELL_DEG), cell_of(max_lat, max_lng, CELL_DEG)
+    return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+
+def center(cell: tuple[int, int]) -> tuple[float, float]:
+    return cell_center(cell, CELL_DEG)
+
+
+_store: TileStore | None = None
+
+
+def get_tile_store() -> TileStore:
+    global _store
+    if _store is None:
+        _store = TileStore()
+    return _store
@@ -0,0 +1,129 @@
+"""
+Disease Inference Backends — Keras (.h5), TFLite (.tflite) and ONNX (.onnx) behind one predict()
+Selected with DISEASE_BACKEND=auto|keras|tflite|onnx. `auto` prefers the lightweight runtimes,
+which avoid importing TensorFlow and (for int8/float16 exports) run several times faster on CPU.
+Create the lightweight files with:  python -m scripts.convert_disease_model
+"""
+import os
+import threading
+
+import numpy as np
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "ml_models")
+MODEL_FILES = {
+    "keras": "disease_model.h5",
+    "tflite": "disease_model.tflite",
+    "onnx": "disease_model.onnx",
+}
+# `auto` order — first file present wins
+AUTO_ORDER = ["tflite", "onnx", "keras"]
+INPUT_SIZE = (224, 224)
+
+
+class DiseaseBackend:
+    """predict(batch) takes float32 images scaled to 0–1, shape (n, 224, 224, 3), returns (n, classes)."""
+    name = ""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class KerasBackend(DiseaseBackend):
+    name = "keras"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        import tensorflow as tf
+        self._model = tf.keras.models.load_model(path)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self._model.predict(batch, verbose=0))
+
+
+class TFLiteBackend(DiseaseBackend):
+    name = "tflite"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        threads = int(os.getenv("DISEASE_NUM_THREADS", "0")) or None
+        # The flatbuffer is mmap'd by the interpreter, so workers share the weights
+        self._interp = Interpreter(model_path=path, num_threads=threads)
+        self._interp.allocate_tensors()
+        self._in = self._interp.get_input_details()[0]
+        self._out = self._interp.get_output_details()[0]
+        self._batch = int(self._in["shape"][0])
+        # Interpreters are not thread-safe
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if len(batch) != self._batch:
+                self._interp.resize_tensor_input(self._in["index"], [len(batch), *self._in["shape"][1:]])
+                self._interp.allocate_tensors()
+                self._in = self._interp.get_input_details()[0]
+                self._out = self._interp.get_output_details()[0]
+                self._batch = len(batch)
+
+            x = batch.astype(np.float32)
+            scale, zero = self._in.get("quantization", (0.0, 0))
+            if self._in["dtype"] in (np.int8, np.uint8) and scale:
+                info = np.iinfo(self._in["dtype"])
+                x = np.clip(np.round(x / scale + zero), info.min, info.max)
+            self._interp.set_tensor(self._in["index"], x.astype(self._in["dtype"]))
+            self._interp.invoke()
+            y = self._interp.get_tensor(self._out["index"])
+
+        scale, zero = self._out.get("quantization", (0.0, 0))
+        if self._out["dtype"] in (np.int8, np.uint8) and scale:
+            y = (y.astype(np.float32) - zero) * scale
+        return y.astype(np.float32)
+
+
+class OnnxBackend(DiseaseBackend):
+    name = "onnx"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        threads = int(os.getenv("DISEASE_NUM_THREADS", "0"))
+        if threads:
+            opts.intra_op_num_threads = threads
+        self._session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self._input = self._session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self._session.run(None, {self._input: batch.astype(np.float32)})[0]
+
+
+BACKENDS = {"keras": KerasBackend, "tflite": TFLiteBackend, "onnx": OnnxBackend}
+
+
+def load_backend(kind: str | None = None, model_dir: str = MODEL_DIR) -> DiseaseBackend | None:
+    """Load the configured backend; None when no usable model file/runtime is available."""
+    kind = (kind or os.getenv("DISEASE_BACKEND", "auto")).lower()
+    order = AUTO_ORDER if kind == "auto" else [kind]
+    for name in order:
+        path = os.path.join(model_dir, MODEL_FILES[name])
+        if not os.path.exists(path):
+            continue
+        try:
+            return BACKENDS[name](path)
+        except Exception as e:
+            print(f"Failed to load {name} disease backend: {e}")
+    return None
+
+
+def preprocess(contents: bytes) -> np.ndarray:
+    """Decode one JPEG/PNG into a float32 (224, 224, 3) array scaled to 0–1."""
+    from PIL import Image
+    import io
+    img = Image.open(io.BytesIO(contents)).convert("RGB").resize(INPUT_SIZE)
+    return np.asarray(img, dtype=np.float32) / 255.0
@@ -0,0 +1,101 @@
+"""
+Response Encoding — fast default JSON plus compact encodings for time-series endpoints
+  • DefaultResponse: ORJSONResponse when orjson is installed (several times faster than json.dumps), else JSONResponse.
+  • Series endpoints negotiate on Accept:
+      application/json                          rows as objects (unchanged, the default)
+      application/vnd.agriai.columnar+json      {"length", "columns": {key: [...]}, "constants": {...}, ...meta}
+      application/x-msgpack                     the columnar form as MessagePack (when msgpack is installed)
+Columnar drops the per-row key names and hoists fields that are the same on every row (e.g. NDVI threshold).
+Payload sizes / timings:  python -m scripts.payload_bench
+"""
+import json
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "json"
+COLUMNAR = "columnar"
+MSGPACK = "msgpack"
+MEDIA_TYPES = {
+    JSON: "application/json",
+    COLUMNAR: "application/vnd.agriai.columnar+json",
+    MSGPACK: "application/x-msgpack",
+}
+_ACCEPTED = {
+    "application/json": JSON,
+    "application/vnd.agriai.columnar+json": COLUMNAR,
+    "application/x-msgpack": MSGPACK,
+    "application/msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+DefaultResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+
+def dumps(obj) -> bytes:
+    """Compact UTF-8 JSON. NaN/inf become null with orjson (stdlib would emit invalid JSON)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+def negotiate(request: Request) -> str:
+    """Best supported format from the Accept header (q-values honoured; JSON when nothing matches)."""
+    header = request.headers.get("accept", "")
+    best, best_q = JSON, 0.0
+    for i, part in enumerate(header.split(",")):
+        media, _, params = part.strip().partition(";")
+        fmt = _ACCEPTED.get(media.strip().lower())
+        if fmt is None or (fmt == MSGPACK and msgpack is None):
+            continue
+        q = 1.0
+        for p in params.split(";"):
+            name, _, value = p.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        # Earlier entries win ties, so subtract a hair per position
+        score = q - i * 1e-6
+        if q > 0 and score > best_q:
+            best, best_q = fmt, score
+    return best
+
+
+def columnar(rows: list[dict], constant_keys: tuple = ()) -> dict:
+    """Rows of dicts → one list per key. `constant_keys` whose value is identical on every row are hoisted."""
+    keys = list(rows[0]) if rows else []
+    constants = {}
+    for key in constant_keys:
+        if rows and key in rows[0] and all(r.get(key) == rows[0][key] for r in rows):
+            constants[key] = rows[0][key]
+    return {
+        "length": len(rows),
+        "columns": {k: [r.get(k) for r in rows] for k in keys if k not in constants},
+        "constants": constants,
+    }
+
+
+def encode_series(fmt: str, rows: list[dict], legacy=None, meta: dict | None = None,
+                  constant_keys: tuple = ()) -> tuple[bytes, str]:
+    """
+    (body, media_type) for a series in the negotiated format.
+    `legacy` is the plain-JSON body (defaults to `rows`); `meta` holds the non-series fields kept beside the columns.
+    """
+    if fmt == JSON:
+        return dumps(rows if legacy is None else legacy), MEDIA_TYPES[JSON]
+    payload = {**(meta or {}), **columnar(rows, constant_keys)}
+    if fmt == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True), MEDIA_TYPES[MSGPACK]
+    return dumps(payload), MEDIA_TYPES[COLUMNAR]
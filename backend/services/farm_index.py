@@ -0,0 +1,234 @@
+"""
+Farm Spatial Index — in-memory grid of every farm's location for nearby / bounding-box queries,
+per-district aggregates and grouping farms by weather/soil cell (one upstream fetch per cell, not per farm).
+Built from Supabase on first use; once older than FARM_INDEX_REFRESH_S (to pick up other workers' writes) it
+is rebuilt on a background thread while the stale copy keeps serving. create_farm upserts into it directly
+so a new farm is queryable immediately.
+"""
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from services import metrics
+
+# Grid cell size in degrees (~11 km at the equator) — radius queries scan only the cells they overlap
+GRID_DEG = 0.1
+# Cell sizes for sharing upstream data: OWM current weather is ~10 km, SoilGrids is 250 m
+WEATHER_CELL_DEG = 0.1
+SOIL_CELL_DEG = 0.01
+REFRESH_S = float(os.getenv("FARM_INDEX_REFRESH_S", "300"))
+PAGE_SIZE = 1000
+EARTH_RADIUS_KM = 6371.0
+FIELDS = "id,user_id,name,crop,area_acres,location_lat,location_lng,state,district,agromonitoring_polygon_id"
+
+FARMS_INDEXED = metrics.Gauge("agriai_farm_index_size", "Farms held in the in-memory spatial index")
+INDEX_BUILD = metrics.Histogram("agriai_farm_index_build_seconds", "Time to load the farm index from Supabase")
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def cell_of(lat: float, lng: float, deg: float = GRID_DEG) -> tuple[int, int]:
+    return math.floor(lat / deg), math.floor(lng / deg)
+
+
+def cell_center(cell: tuple[int, int], deg: float = GRID_DEG) -> tuple[float, float]:
+    """Centre of a cell — the coordinate used when fetching data on behalf of every farm in it."""
+    return round((cell[0] + 0.5) * deg, 6), round((cell[1] + 0.5) * deg, 6)
+
+
+class FarmIndex:
+    """Farms keyed by id, bucketed by GRID_DEG cell, with running per-district totals."""
+
+    def __init__(self):
+        self.farms: dict[str, dict] = {}
+        self._grid: dict[tuple[int, int], set] = defaultdict(set)
+        self._districts: dict[tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+        self._journal: list | None = None        # upserts made while a replacement index is being built
+        self._successor: "FarmIndex | None" = None  # the replacement, once built — later upserts go there
+        self.built_at = 0.0
+
+    def __len__(self):
+        return len(self.farms)
+
+    # ── Writes ──────────────────────────────────────────────────────────────
+
+    def upsert(self, farm: dict):
+        if farm.get("id") is None or farm.get("location_lat") is None or farm.get("location_lng") is None:
+            return
+        farm_id = str(farm["id"])
+        with self._lock:
+            successor = self._successor
+            if successor is None:
+                self._upsert(farm_id, farm)
+        if successor is not None:
+            return successor.upsert(farm)
+        FARMS_INDEXED.set(len(self.farms))
+
+    def _upsert(self, farm_id: str, farm: dict):
+        self._remove(farm_id)
+        record = {k: farm.get(k) for k in FIELDS.split(",")}
+        record["id"] = farm_id
+        record["location_lat"], record["location_lng"] = float(farm["location_lat"]), float(farm["location_lng"])
+        self.farms[farm_id] = record
+        self._grid[cell_of(record["location_lat"], record["location_lng"])].add(farm_id)
+        self._add_to_district(record, +1)
+        if self._journal is not None:
+            self._journal.append(farm)
+
+    def remove(self, farm_id: str):
+        with self._lock:
+            self._remove(str(farm_id))
+        FARMS_INDEXED.set(len(self.farms))
+
+    def _remove(self, farm_id: str):
+        old = self.farms.pop(farm_id, None)
+        if old is None:
+            return
+        cell = cell_of(old["location_lat"], old["location_lng"])
+        self._grid[cell].discard(farm_id)
+        if not self._grid[cell]:
+            del self._grid[cell]
+        self._add_to_district(old, -1)
+
+    def _add_to_district(self, farm: dict, sign: int):
+        key = (farm.get("state") or "Unknown", farm.get("district") or "Unknown")
+        agg = self._districts.setdefault(key, {"farms": 0, "area_acres": 0.0, "crops": Counter()})
+        agg["farms"] += sign
+        agg["area_acres"] += sign * float(farm.get("area_acres") or 0)
+        if farm.get("crop"):
+            agg["crops"][farm["crop"].lower()] += sign
+        if agg["farms"] <= 0:
+            del self._districts[key]
+
+    # ── Queries ─────────────────────────────────────────────────────────────
+
+    def _cells_in_box(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float):
+        (i0, j0), (i1, j1) = cell_of(min_lat, min_lng), cell_of(max_lat, max_lng)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._grid):
+            # Box covers more cells than are occupied — walk the occupied ones instead
+            return [farm_ids for (i, j), farm_ids in self._grid.items() if i0 <= i <= i1 and j0 <= j <= j1]
+        return [self._grid[(i, j)] for i in range(i0, i1 + 1) for j in range(j0, j1 + 1) if (i, j) in self._grid]
+
+    def within_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> list[dict]:
+        with self._lock:
+            out = []
+            for farm_ids in self._cells_in_box(min_lat, min_lng, max_lat, max_lng):
+                for farm_id in farm_ids:
+                    f = self.farms[farm_id]
+                    if min_lat <= f["location_lat"] <= max_lat and min_lng <= f["location_lng"] <= max_lng:
+                        out.append(f)
+            return out
+
+    def within_radius(self, lat: float, lng: float, radius_km: float, limit: int | None = None) -> list[tuple[float, dict]]:
+        """(distance_km, farm) pairs within radius_km, nearest first."""
+        dlat = radius_km / 111.0
+        dlng = radius_km / (111.0 * max(0.01, math.cos(math.radians(lat))))
+        hits = []
+        for f in self.within_bbox(lat - dlat, lng - dlng, lat + dlat, lng + dlng):
+            d = haversine_km(lat, lng, f["location_lat"], f["location_lng"])
+            if d <= radius_km:
+                hits.append((d, f))
+        hits.sort(key=lambda h: h[0])
+        return hits[:limit] if limit else hits
+
+    def district_stats(self, state: str | None = None) -> list[dict]:
+        with self._lock:
+            rows = [
+                {
+                    "state": s, "district": d, "farms": agg["farms"],
+                    "area_acres": round(agg["area_acres"], 2),
+                    "top_crops": [c for c, n in agg["crops"].most_common(3) if n > 0],
+                }
+                for (s, d), agg in self._districts.items()
+                if state is None or s.lower() == state.lower()
+            ]
+        return sorted(rows, key=lambda r: -r["farms"])
+
+    def group_by_cell(self, deg: float = WEATHER_CELL_DEG, farm_ids=None) -> dict[tuple[int, int], list[dict]]:
+        """Farms bucketed by `deg` cell — fetch weather/soil once at cell_center(cell, deg) for each group."""
+        with self._lock:
+            farms = self.farms.values() if farm_ids is None else [self.farms[i] for i in farm_ids if i in self.farms]
+            groups = defaultdict(list)
+            for f in farms:
+                groups[cell_of(f["location_lat"], f["location_lng"], deg)].append(f)
+        return dict(groups)
+
+
+def _load_from_supabase() -> FarmIndex:
+    from services.supabase_client import get_supabase
+    sb = get_supabase()
+    index = FarmIndex()
+    t0 = time.perf_counter()
+    start = 0
+    while True:
+        rows = (
+            sb.table("farms").select(FIELDS)
+            .not_.is_("location_lat", "null").not_.is_("location_lng", "null")
+            .order("id").range(start, start + PAGE_SIZE - 1).execute().data or []
+        )
+        for row in rows:
+            index.upsert(row)
+        if len(rows) < PAGE_SIZE:
+            break
+        start += PAGE_SIZE
+    INDEX_BUILD.observe(time.perf_counter() - t0)
+    index.built_at = time.monotonic()
+    return index
+
+
+_index: FarmIndex | None = None
+_build_lock = threading.Lock()
+_refreshing = False
+
+
+def _refresh(stale: FarmIndex):
+    """Rebuild beside the requests still served from `stale`, then carry over farms created meanwhile."""
+    global _index, _refreshing
+    try:
+        fresh = _load_from_supabase()
+        with stale._lock:
+            journal, stale._journal, stale._successor = stale._journal or [], None, fresh
+        for farm in journal:
+            fresh.upsert(farm)
+        _index = fresh
+        FARMS_INDEXED.set(len(fresh))
+    except Exception as e:
+        print(f"Failed to refresh farm index: {e}")
+        with stale._lock:
+            stale._journal = None
+        stale.built_at = time.monotonic()           # retry after REFRESH_S, not on every request
+    finally:
+        _refreshing = False
+
+
+def get_farm_index(max_age: float = REFRESH_S) -> FarmIndex:
+    """
+    The shared index. Only the very first build blocks the caller (async code: call it through
+    asyncio.to_thread); once older than `max_age` it is rebuilt on a background thread and the
+    stale index is returned meanwhile.
+    """
+    global _index, _refreshing
+    if _index is not None and time.monotonic() - _index.built_at < max_age:
+        return _index
+    with _build_lock:
+        if _index is None:
+            try:
+                _index = _load_from_supabase()
+            except Exception as e:
+                print(f"Failed to build farm index: {e}")
+                _index = FarmIndex()
+                _index.built_at = time.monotonic()  # retry after REFRESH_S, not on every request
+        elif time.monotonic() - _index.built_at >= max_age and not _refreshing:
+            _refreshing = True
+            with _index._lock:
+                _index._journal = []
+            threading.Thread(target=_refresh, args=(_index,), name="farm-index-refresh", daemon=True).start()
+    return _index
@@ -0,0 +1,212 @@
+"""
+HTTP Client Service — single factory for outbound calls to OWM, ISRIC, Agromonitoring and Supabase
+Every client is built on a timing transport so each call lands in the upstream latency metrics
+and the request's Server-Timing header. Async calls also pass through the per-host rate limiter
+(services/rate_limit.py) and retry once after a short Retry-After on 429, and are bounded by the
+request's latency budget, hedged and circuit-broken per host (services/resilience.py).
+"""
+import asyncio
+import time
+import httpx
+
+from services import metrics, rate_limit, resilience
+
+
+# Re-sends after an upstream 429 (waiting out Retry-After, capped) before returning the 429
+MAX_429_RETRIES = 1
+MAX_RETRY_AFTER_S = 5.0
+
+
+class _TimedAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        state = resilience.host_state(host)
+        allowed, probe = state.breaker.allow()
+        if not allowed:
+            cached = resilience.stale.get(request)
+            resilience.SHORT_CIRCUITS.inc(host=host, served="stale" if cached is not None else "error")
+            if cached is None:
+                raise resilience.CircuitOpen(f"{host}: circuit open after repeated failures")
+            return cached
+        try:
+            return await self._limited(request, state, probe)
+        finally:
+            state.breaker.release(probe)
+
+    async def _limited(self, request: httpx.Request, state: resilience.HostState, probe: int | None) -> httpx.Response:
+        host = request.url.host
+        bucket = rate_limit.bucket_for(host)
+        for attempt in range(MAX_429_RETRIES + 1):
+            if bucket is not None:
+                with metrics.phase("queue"):
+                    await _within_deadline(bucket.acquire(), host)
+            response = await self._attempt(request, state, probe)
+            if response.status_code != 429:
+                return response
+            rate_limit.THROTTLED.inc(host=host)
+            wait = rate_limit.retry_after(response)
+            if bucket is not None:
+                await bucket.penalise(wait)
+            left = resilience.remaining()
+            if attempt == MAX_429_RETRIES or wait > MAX_RETRY_AFTER_S or (left is not None and wait >= left):
+                return response
+            await response.aclose()
+            with metrics.phase("queue"):
+                await asyncio.sleep(wait)
+        return response
+
+    async def _attempt(self, request: httpx.Request, state: resilience.HostState, probe: int | None) -> httpx.Response:
+        """One logical call: hedged if enabled for the host, bounded by the deadline, fed to the breaker."""
+        delay = state.hedge_delay() if request.method == "GET" else None
+        cacheable = False
+        try:
+            if delay is None:
+                response = await _within_deadline(self._send(request, state), request.url.host)
+            else:
+                response = await _within_deadline(self._send_hedged(request, state, delay), request.url.host)
+            if response.status_code == 200 and request.method == "GET" \
+                    and not response.headers.get("content-type", "").startswith("image/"):
+                await response.aread()
+                cacheable = True
+        except resilience.DeadlineExceeded:
+            # The caller's budget ran out, which says nothing about the host — release() frees a probe slot
+            raise
+        except Exception:
+            state.breaker.record(False, probe)
+            raise
+        state.breaker.record(not resilience.is_failure(response), probe)
+        if cacheable:
+            resilience.stale.put(request, response)
+        return response
+
+    async def _send_hedged(self, request: httpx.Request, state: resilience.HostState, delay: float) -> httpx.Response:
+        host = request.url.host
+        primary = asyncio.ensure_future(self._send(request, state))
+        tasks = {primary: "primary"}
+        winner = None                             # the task whose response is returned; the rest are cleaned up
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                winner = primary
+                return primary.result()
+            # Only hedge with a spare token — a hedge must never queue or eat into interactive quota
+            bucket = rate_limit.bucket_for(host)
+            if bucket is not None and not await bucket.try_acquire():
+                winner = primary                  # awaiting it still cancels it if we are cancelled
+                return await primary
+            tasks[asyncio.ensure_future(self._send(request, state))] = "hedge"
+
+            pending, last = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last = task
+                    if task.exception() is None and not resilience.is_failure(task.result()):
+                        resilience.HEDGES.inc(host=host, winner=tasks[task])
+                        winner = task
+                        return task.result()
+            resilience.HEDGES.inc(host=host, winner="none")
+            winner = last
+            return last.result()
+        finally:
+            # Cancel the loser, or close its response if it finished too — else its pooled connection leaks
+            for task in tasks:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None:
+                    await task.result().aclose()
+
+    async def _send(self, request: httpx.Request, state: resilience.HostState) -> httpx.Response:
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._inner.handle_async_request(request)
+            outcome = str(response.status_code)
+            return response
+        finally:
+            elapsed = time.perf_counter() - t0
+            metrics.UPSTREAM_LATENCY.observe(elapsed, host=request.url.host, outcome=outcome)
+            metrics.add_phase("upstream", elapsed)
+            if outcome != "error" and int(outcome) < 500:
+                state.latency.add(elapsed)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+async def _within_deadline(awaitable, host: str):
+    """Await under whatever is left of the request's latency budget."""
+    left = resilience.remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        awaitable.close()
+        resilience.DEADLINE_EXCEEDED.inc(host=host)
+        raise resilience.DeadlineExceeded(f"{host}: request budget exhausted")
+    try:
+        return await asyncio.wait_for(awaitable, timeout=left)
+    except asyncio.TimeoutError:
+        resilience.DEADLINE_EXCEEDED.inc(host=host)
+        raise resilience.DeadlineExceeded(f"{host}: request budget exhausted")
+
+
+class _TimedSyncTransport(httpx.BaseTransport):
+    def __init__(self, inner: httpx.BaseTransport):
+        self._inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self._inner.handle_request(request)
+            outcome = str(response.status_code)
+            return response
+        finally:
+            elapsed = time.perf_counter() - t0
+            metrics.UPSTREAM_LATENCY.observe(elapsed, host=request.url.host, outcome=outcome)
+            metrics.add_phase("upstream", elapsed)
+
+    def close(self):
+        self._inner.close()
+
+
+# (async_transport, sync_transport) replacing the real network — set by the benchmark harness
+_override: tuple[httpx.AsyncBaseTransport, httpx.BaseTransport] | None = None
+
+
+def use_transports(async_transport: httpx.AsyncBaseTransport, sync_transport: httpx.BaseTransport):
+    """Route every upstream call through the given transports (e.g. in-process fakes)."""
+    global _override, _sync
+    _override = (async_transport, sync_transport)
+    _sync = None
+
+
+def upstream_client(timeout: float = 10) -> httpx.AsyncClient:
+    """AsyncClient for upstream APIs — use as `async with upstream_client(timeout=10) as client:`."""
+    inner = _override[0] if _override else httpx.AsyncHTTPTransport()
+    return httpx.AsyncClient(timeout=timeout, transport=_TimedAsyncTransport(inner))
+
+
+def instrument_sync_client(client: httpx.Client) -> httpx.Client:
+    """Wrap an existing sync client's transport (e.g. the postgrest session) in the timing transport."""
+    if not isinstance(client._transport, _TimedSyncTransport):
+        inner = _override[1] if _override else client._transport
+        client._transport = _TimedSyncTransport(inner)
+    return client
+
+
+_sync: httpx.Client | None = None
+
+
+def sync_client() -> httpx.Client:
+    """Shared sync client for Supabase storage/auth calls (keeps connections alive between requests)."""
+    global _sync
+    if _sync is None:
+        inner = _override[1] if _override else httpx.HTTPTransport()
+        _sync = httpx.Client(timeout=15, transport=_TimedSyncTransport(inner))
+    return _sync
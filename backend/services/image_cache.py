@@ -0,0 +1,181 @@
+"""
+Image Cache — size-bounded on-disk LRU for immutable upstream imagery (NDVI scenes per acquisition date)
+Files live in IMAGE_CACHE_DIR, shared by every worker on the host. A hit bumps the file's mtime, so recency
+survives restarts and is visible to the other workers; when a write takes the directory past IMAGE_CACHE_MB
+the least recently used files are deleted. The directory is re-scanned at least every RESCAN_S, so writes by
+the other workers count towards the limit too. Writes go to a temp file and are renamed into place, so a
+reader never sees a partial image. Concurrent misses for the same key in one worker share a single fetch,
+which runs to completion even if the request that started it goes away.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+from services import metrics
+
+CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "imagery_cache"))
+MAX_BYTES = int(float(os.getenv("IMAGE_CACHE_MB", "512")) * 1024 * 1024)
+# Don't rewrite a hot file's mtime on every hit — once a minute is recency enough
+TOUCH_INTERVAL_S = 60
+# Our running total only sees this worker's writes — re-scan the directory this often to see everyone's
+RESCAN_S = 10
+
+LOOKUPS = metrics.Counter("agriai_image_cache_lookups_total", "Image cache lookups, by result", ("result",))
+EVICTIONS = metrics.Counter("agriai_image_cache_evictions_total", "Files evicted from the image cache")
+CACHE_BYTES = metrics.Gauge("agriai_image_cache_bytes", "Bytes held in the on-disk image cache")
+
+
+class ImageCache:
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._total: int | None = None            # bytes on disk, as of the last scan plus our own writes
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def path_for(self, key: str, suffix: str = "") -> str:
+        name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, name[:2], name + suffix)
+
+    def get(self, key: str, suffix: str = "") -> str | None:
+        """Path of the cached file for `key`, or None."""
+        path = self.path_for(key, suffix)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        if now - mtime > TOUCH_INTERVAL_S:
+            try:
+                os.utime(path, (now, now))
+            except FileNotFoundError:             # evicted by another worker just now
+                return None
+        return path
+
+    def put(self, key: str, data: bytes, suffix: str = "") -> str:
+        path = self.path_for(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._total is None or time.monotonic() - self._scanned_at >= RESCAN_S:
+                self._total = self._scan_total()
+                self._scanned_at = time.monotonic()
+            else:
+                self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict(keep=path)
+            CACHE_BYTES.set(self._total)
+        return path
+
+    def _files(self) -> list[tuple[float, int, str]]:
+        out = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".tmp"):                 # another writer's file in progress
+                    continue
+                full = os.path.join(root, name)
+                try:
+                    st = os.stat(full)
+                except FileNotFoundError:
+                    continue
+                out.append((st.st_mtime, st.st_size, full))
+        return out
+
+    def _scan_total(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self, keep: str):
+        """Delete least recently used files until the cache is back to 90% of its limit."""
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+                total -= size
+                EVICTIONS.inc()
+            except FileNotFoundError:
+                total -= size
+        self._total = total
+        self._scanned_at = time.monotonic()
+
+    async def get_or_fetch(self, key: str, fetch, suffix: str = "") -> str:
+        """
+        Cached path for `key`, calling `await fetch()` (→ bytes) on a miss. Concurrent misses for the same key
+        in this worker wait for one shared fetch; it runs as its own task, so a caller that is cancelled
+        (client gone) neither cancels it nor fails the others.
+        """
+        path = await asyncio.to_thread(self.get, key, suffix)
+        if path is not None:
+            LOOKUPS.inc(result="hit")
+            return path
+        task = self._inflight.get(key)
+        if task is not None:
+            LOOKUPS.inc(result="joined")
+        else:
+            LOOKUPS.inc(result="miss")
+            task = asyncio.ensure_future(self._fetch_and_put(key, fetch, suffix))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._fetched(key, t))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_put(self, key: str, fetch, suffix: str) -> str:
+        data = await fetch()
+        return await asyncio.to_thread(self.put, key, data, suffix)
+
+    def _fetched(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()                      # mark retrieved — every caller may have gone
+
+    def stats(self) -> dict:
+        files = self._files() if os.path.isdir(self.directory) else []
+        return {"files": len(files), "bytes": sum(s for _, s, _ in files), "max_bytes": self.max_bytes}
+
+
+_cache: ImageCache | None = None
+
+
+def get_image_cache() -> ImageCache:
+    global _cache
+    if _cache is None:
+        _cache = ImageCache()
+    return _cache
+
+
+# ── Byte ranges ─────────────────────────────────────────────────────────────
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None | bool:
+    """
+    (start, end) inclusive for a single `bytes=` range, None to serve the whole file (no / multi-range /
+    unparseable / invalid header, e.g. last < first), or False when a valid range can't be satisfied (→ 416).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first == "":
+            if not last:
+                return None
+            start, end = max(0, size - int(last)), size - 1          # suffix range: last N bytes
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None                                          # invalid range-spec is ignored (RFC 9110)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, end
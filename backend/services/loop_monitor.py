@@ -0,0 +1,163 @@
+"""
+Event-Loop Monitor — continuous loop-lag metric and (in debug mode) stack capture of blocking calls
+A task sleeps LOOP_MONITOR_INTERVAL_MS at a time; how late it wakes is the loop's lag — the delay every other
+coroutine on the worker saw too — exported as agriai_event_loop_lag_seconds.
+With LOOP_DEBUG=1 a watchdog thread also watches that heartbeat: once the loop has been stuck for more than
+LOOP_BLOCK_MS it grabs the loop thread's Python stack *while the blocking call is still running*, together
+with the route of the request whose task was executing, and keeps the last BLOCK_HISTORY events for
+GET /api/v1/admin/loop-blocks. `python -m scripts.loop_check` drives every route with this on and exits 1
+when one blocks the loop.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+
+from services import metrics
+
+INTERVAL_S = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100")) / 1000
+DEBUG = os.getenv("LOOP_DEBUG", "0").lower() in ("1", "true", "yes")
+BLOCK_S = float(os.getenv("LOOP_BLOCK_MS", "100")) / 1000
+BLOCK_HISTORY = 200
+STACK_DEPTH = 40
+# LOOP_LAG_MAX covers this much recent history
+MAX_WINDOW_S = 60
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+LOOP_LAG = metrics.Histogram("agriai_event_loop_lag_seconds", "How late the event loop ran a timer scheduled on it")
+LOOP_LAG_MAX = metrics.Gauge("agriai_event_loop_lag_max_seconds", "Worst event-loop lag over the last minute")
+LOOP_BLOCKS = metrics.Counter(
+    "agriai_event_loop_blocks_total", "Times the loop was blocked past LOOP_BLOCK_MS (debug mode), by route", ("route",),
+)
+
+# ASGI scope per running task, for attributing a blocked loop to a route (debug mode only)
+_task_scopes: "weakref.WeakKeyDictionary[asyncio.Task, dict]" = weakref.WeakKeyDictionary()
+
+
+def _short(path: str) -> str:
+    marker = "site-packages" + os.sep
+    if marker in path:
+        return path.split(marker, 1)[1]
+    return os.path.relpath(path, BACKEND_DIR) if path.startswith(BACKEND_DIR) else path
+
+
+# Frames that only pass a blocking call through (HTTP transport wrappers, bench fakes) — never its origin
+_PLUMBING = ("services/http_client.py", "services/loop_monitor.py", "scripts/")
+
+
+def _origin(stack: list[str]) -> str | None:
+    """Innermost frame in this codebase — the router / service line that made the blocking call."""
+    for line in reversed(stack):
+        if line.startswith(("routers/", "services/", "main.py")) and not line.startswith(_PLUMBING):
+            return line
+    return None
+
+
+def _stack(frame) -> list[str]:
+    """Innermost-last "file:line function" lines of a frame's stack."""
+    lines = []
+    while frame is not None and len(lines) < STACK_DEPTH:
+        lines.append(f"{_short(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return lines[::-1]
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = INTERVAL_S, block_s: float = BLOCK_S, debug: bool = DEBUG):
+        self.interval, self.block_s, self.debug = interval, block_s, debug
+        self.events: deque = deque(maxlen=BLOCK_HISTORY)
+        self._recent: deque = deque(maxlen=max(1, int(MAX_WINDOW_S / interval)) if interval > 0 else 1)
+        self._beat = time.perf_counter()          # when the loop last scheduled the monitor's sleep
+        self._open: dict | None = None            # block being reported while the loop is still stuck
+        self._loop = None
+        self._thread_id = None
+
+    async def run(self):
+        """Runs for the life of the worker."""
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        if self.debug:
+            threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True).start()
+        while True:
+            self._beat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - self._beat - self.interval)
+            LOOP_LAG.observe(lag)
+            self._recent.append(lag)
+            LOOP_LAG_MAX.set(max(self._recent))
+            event = self._open
+            if event is not None:
+                # The loop is free again — the whole stall is now known
+                event["blocked_ms"] = round(lag * 1000, 1)
+                self._open = None
+
+    def _watchdog(self):
+        beat = None
+        while True:
+            time.sleep(self.block_s / 4)
+            stuck = time.perf_counter() - self._beat - self.interval
+            if stuck < self.block_s or self._beat == beat:
+                continue
+            beat = self._beat                     # one event per stall
+            frame = sys._current_frames().get(self._thread_id)
+            task = asyncio.tasks._current_tasks.get(self._loop)
+            scope = _task_scopes.get(task) if task is not None else None
+            # Route template for the metric label (bounded); the concrete path goes in the event
+            route = getattr(scope.get("route"), "path", "unmatched") if scope is not None else "background"
+            stack = _stack(frame) if frame is not None else []
+            event = {
+                "at": time.time(),
+                "route": route,
+                "path": f"{scope.get('method', '')} {scope['path']}" if scope is not None else None,
+                "task": task.get_name() if task is not None else None,
+                "blocked_ms": None,               # filled in once the loop runs again
+                "origin": _origin(stack),
+                "stack": stack,
+            }
+            self.events.append(event)
+            self._open = event
+            LOOP_BLOCKS.inc(route=route)
+            print(f"Event loop blocked >{self.block_s * 1000:.0f} ms in {route} at {event['origin']}")
+
+    def report(self) -> dict:
+        return {
+            "debug": self.debug,
+            "interval_ms": self.interval * 1000,
+            "block_ms": self.block_s * 1000,
+            "max_lag_ms": round(max(self._recent, default=0.0) * 1000, 1),
+            "events": list(self.events),
+        }
+
+
+_monitor: LoopMonitor | None = None
+
+
+def get_monitor() -> LoopMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopMonitor()
+    return _monitor
+
+
+class TaskRouteMiddleware:
+    """Pure ASGI middleware recording which request each task is serving, so blocks name their route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        task = asyncio.current_task()
+        previous = _task_scopes.get(task)
+        _task_scopes[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if previous is None:
+                _task_scopes.pop(task, None)
+            else:
+                _task_scopes[task] = previous
@@ -0,0 +1,238 @@
+"""
+Metrics Service — in-process counters/gauges/histograms rendered as Prometheus text at GET /metrics
+Also carries the per-request Server-Timing phases (upstream, inference, ...) via a context variable.
+Each uvicorn worker keeps its own registry; scrape every worker or aggregate in Prometheus.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from services import startup
+
+# Seconds — covers a 2 ms cache hit up to a 15 s ISRIC timeout
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096)
+
+_REGISTRY: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_fmt_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., +Inf count], sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][idx] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ── Core metrics ────────────────────────────────────────────────────────────
+
+REQUEST_LATENCY = Histogram(
+    "agriai_request_duration_seconds", "HTTP request latency by route template, method and status",
+    ("route", "method", "status"),
+)
+UPSTREAM_LATENCY = Histogram(
+    "agriai_upstream_duration_seconds", "Outbound call latency by upstream host and outcome",
+    ("host", "outcome"),
+)
+INFERENCE_LATENCY = Histogram(
+    "agriai_inference_duration_seconds", "Model inference latency", ("model",),
+)
+INFERENCE_BATCH = Histogram(
+    "agriai_inference_batch_size", "Rows/images per inference call", ("model",), buckets=SIZE_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "agriai_cache_requests_total", "Cache lookups by cache and result (hit/miss/error)", ("cache", "result"),
+)
+
+
+# ── Server-Timing phases ────────────────────────────────────────────────────
+
+# Milliseconds per phase for the current request; None outside a request
+_phases: ContextVar[dict | None] = ContextVar("agriai_timing_phases", default=None)
+
+
+def add_phase(name: str, seconds: float):
+    """Accumulate time into a Server-Timing phase of the current request (no-op outside one)."""
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds * 1000
+
+
+@contextmanager
+def phase(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, time.perf_counter() - t0)
+
+
+@contextmanager
+def upstream_timer(host: str):
+    """Time a call that does not go through services.http_client (e.g. an SDK)."""
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - t0
+        UPSTREAM_LATENCY.observe(elapsed, host=host, outcome=outcome)
+        add_phase("upstream", elapsed)
+
+
+def observe_inference(model: str, seconds: float, batch_size: int = 1):
+    INFERENCE_LATENCY.observe(seconds, model=model)
+    INFERENCE_BATCH.observe(batch_size, model=model)
+    add_phase("inference", seconds)
+
+
+def _server_timing(phases: dict, total_ms: float) -> bytes:
+    parts = [f"{name};dur={ms:.1f}" for name, ms in phases.items()]
+    parts.append(f"app;dur={max(0.0, total_ms - sum(phases.values())):.1f}")
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts).encode()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: records REQUEST_LATENCY per route template, adds a
+    Server-Timing header (upstream / inference / app / total) to every HTTP response,
+    and stamps the worker's time-to-first-request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        startup.mark_first_request()
+        t0 = time.perf_counter()
+        phases: dict = {}
+        token = _phases.set(phases)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                total_ms = (time.perf_counter() - t0) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(phases, total_ms)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _phases.reset(token)
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - t0,
+                route=getattr(route, "path", "unmatched"),
+                method=scope.get("method", ""),
+                status=status["code"],
+            )
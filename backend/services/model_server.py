@@ -0,0 +1,309 @@
+"""
+Model Server — crop and disease inference in a separate process, reached over a Unix domain socket
+Run it with:  python -m services.model_server [--socket /tmp/agriai-models.sock] [--cpus 2,3]
+API workers use it when MODEL_SERVING=server (routers' _load_model return the Remote* proxies below),
+so they never import sklearn/TensorFlow or hold model weights. Concurrent requests from all workers are
+coalesced into one batch per model (up to MODEL_SERVER_MAX_BATCH rows, waiting at most MODEL_SERVER_BATCH_MS).
+
+Wire format (little-endian), same frame both ways:
+  op/status u8 · dtype u8 · ndim u8 · pad · request id u32 · body length u32 · ndim × u32 dims · body
+Requests carry an array (crop: float64 (n, 7) features; disease: uint8 (n, 224, 224, 3) pixels);
+replies carry float32 probabilities, or status ERROR and a UTF-8 message. OP_INFO replies with JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+SOCKET_PATH = os.getenv("MODEL_SERVER_SOCKET", "/tmp/agriai-models.sock")
+MAX_BATCH = int(os.getenv("MODEL_SERVER_MAX_BATCH", "32"))
+BATCH_MS = float(os.getenv("MODEL_SERVER_BATCH_MS", "2"))
+TIMEOUT_S = float(os.getenv("MODEL_SERVER_TIMEOUT_S", "10"))
+# After falling back to an in-process model, how long a worker waits before trying the server again
+RETRY_S = float(os.getenv("MODEL_SERVER_RETRY_S", "30"))
+
+OP_INFO, OP_CROP, OP_DISEASE = 0, 1, 2
+STATUS_OK, STATUS_ERROR = 0, 255
+_FRAME = struct.Struct("<BBBxII")
+_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("u1"), 2: np.dtype("<f8")}
+_CODES = {dt: code for code, dt in _DTYPES.items()}
+
+
+class ModelServerError(Exception):
+    pass
+
+
+def serving_mode() -> str:
+    """`inprocess` (default) or `server` — selected with MODEL_SERVING."""
+    return os.getenv("MODEL_SERVING", "inprocess").strip().lower()
+
+
+def _pack(op: int, req_id: int, array: np.ndarray | None = None, payload: bytes = b"") -> bytes:
+    if array is None:
+        return _FRAME.pack(op, 0, 0, req_id, len(payload)) + payload
+    array = np.ascontiguousarray(array)
+    dims = struct.pack(f"<{array.ndim}I", *array.shape)
+    body = array.tobytes()
+    return _FRAME.pack(op, _CODES[array.dtype], array.ndim, req_id, len(body)) + dims + body
+
+
+def _unpack(header: bytes, dims: bytes, body: bytes) -> tuple[int, int, np.ndarray | bytes]:
+    op, dtype, ndim, req_id, _ = _FRAME.unpack(header)
+    if not ndim:
+        return op, req_id, body
+    shape = struct.unpack(f"<{ndim}I", dims)
+    return op, req_id, np.frombuffer(body, dtype=_DTYPES[dtype]).reshape(shape)
+
+
+# ── Server ──────────────────────────────────────────────────────────────────
+
+class _Batcher:
+    """Coalesces concurrent requests for one model into a single predict call on a dedicated thread."""
+
+    def __init__(self, name: str, predict):
+        self.name = name
+        self._predict = predict
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.requests = self.batches = self.rows = 0
+        self.busy_s = 0.0
+
+    async def submit(self, array: np.ndarray) -> np.ndarray:
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((array, fut))
+        return await fut
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            rows = len(pending[0][0])
+            deadline = loop.time() + BATCH_MS / 1000
+            while rows < MAX_BATCH:
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                rows += len(item[0])
+            t0 = time.perf_counter()
+            try:
+                out = await asyncio.to_thread(self._predict, np.concatenate([a for a, _ in pending]))
+            except Exception as e:
+                for _, fut in pending:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.busy_s += time.perf_counter() - t0
+            self.requests += len(pending)
+            self.batches += 1
+            self.rows += rows
+            offset = 0
+            for array, fut in pending:
+                if not fut.done():
+                    fut.set_result(out[offset:offset + len(array)])
+                offset += len(array)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests, "batches": self.batches,
+            "mean_batch_rows": round(self.rows / self.batches, 2) if self.batches else 0,
+            "busy_s": round(self.busy_s, 3),
+        }
+
+
+class ModelServer:
+    def __init__(self):
+        self.batchers: dict[int, _Batcher] = {}
+        self.info: dict = {"pid": os.getpid()}
+
+    def load(self):
+        """Load models with the routers' in-process loaders; a missing model is simply not served."""
+        from routers import crop_recommend, disease
+        model, encoder = crop_recommend._load_local()
+        if model is not None:
+            classes = encoder.classes_ if encoder else model.classes_
+            self.info["crop_classes"] = [str(c) for c in classes]
+            self.batchers[OP_CROP] = _Batcher("crop", lambda x: model.predict_proba(x).astype(np.float32))
+        backend, _ = disease._load_local()
+        if backend is not None:
+            self.info["disease_backend"] = backend.name
+            self.batchers[OP_DISEASE] = _Batcher(
+                "disease", lambda x: backend.predict(x.astype(np.float32) / 255.0).astype(np.float32))
+        print(f"Model server: serving {', '.join(b.name for b in self.batchers.values()) or 'no models'}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def reply(op: int, req_id: int, payload):
+            try:
+                if op == OP_INFO:
+                    stats = {b.name: b.stats() for b in self.batchers.values()}
+                    frame = _pack(STATUS_OK, req_id, payload=json.dumps({**self.info, "stats": stats}).encode())
+                elif op in self.batchers:
+                    frame = _pack(STATUS_OK, req_id, await self.batchers[op].submit(payload))
+                else:
+                    raise ModelServerError(f"model for op {op} not loaded")
+            except Exception as e:
+                frame = _pack(STATUS_ERROR, req_id, payload=f"{type(e).__name__}: {e}".encode())
+            async with lock:
+                writer.write(frame)
+                await writer.drain()
+
+        try:
+            while True:
+                header = await reader.readexactly(_FRAME.size)
+                ndim, length = header[2], _FRAME.unpack(header)[4]
+                dims = await reader.readexactly(4 * ndim)
+                body = await reader.readexactly(length)
+                op, req_id, payload = _unpack(header, dims, body)
+                # Requests on one connection are answered as they finish, matched by id
+                task = asyncio.create_task(reply(op, req_id, payload))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def serve(self, path: str):
+        if os.path.exists(path):
+            os.unlink(path)
+        for batcher in self.batchers.values():
+            asyncio.create_task(batcher.run())
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        os.chmod(path, 0o660)
+        print(f"Model server listening on {path}")
+        async with server:
+            await server.serve_forever()
+
+
+# ── Client ──────────────────────────────────────────────────────────────────
+
+class ModelClient:
+    """
+    Blocking client with a small pool of connections (one request in flight per connection). Calls block on
+    socket I/O, so async code runs them with asyncio.to_thread — the same way in-process predict calls are made.
+    """
+
+    def __init__(self, path: str = SOCKET_PATH, timeout: float = TIMEOUT_S):
+        self.path = path
+        self.timeout = timeout
+        self._idle: list[socket.socket] = []
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def _connect(self) -> socket.socket:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        return sock
+
+    @staticmethod
+    def _recv(sock: socket.socket, n: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = sock.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("model server closed the connection")
+            buf += chunk
+        return bytes(buf)
+
+    def call(self, op: int, array: np.ndarray | None = None):
+        with self._lock:
+            self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+            req_id = self._next_id
+        try:
+            sock = self._connect()
+        except OSError as e:
+            raise ModelServerError(f"model server unavailable at {self.path}: {e}") from e
+        try:
+            sock.sendall(_pack(op, req_id, array))
+            header = self._recv(sock, _FRAME.size)
+            dims = self._recv(sock, 4 * header[2])
+            status, got_id, payload = _unpack(header, dims, self._recv(sock, _FRAME.unpack(header)[4]))
+        except OSError as e:
+            sock.close()
+            raise ModelServerError(f"model server request failed: {e}") from e
+        with self._lock:
+            self._idle.append(sock)
+        if got_id != req_id:
+            raise ModelServerError("model server reply out of order")
+        if status == STATUS_ERROR:
+            raise ModelServerError(payload.decode(errors="replace"))
+        return payload
+
+    def info(self) -> dict:
+        return json.loads(self.call(OP_INFO))
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+
+class RemoteCropModel:
+    """Stands in for the crop classifier: predict_proba/classes_ answered by the model server."""
+
+    def __init__(self, client: ModelClient, classes: list[str]):
+        self._client = client
+        self.classes_ = np.array(classes)
+
+    def predict_proba(self, features) -> np.ndarray:
+        return self._client.call(OP_CROP, np.asarray(features, dtype="<f8"))
+
+
+class RemoteDiseaseModel:
+    """Stands in for a DiseaseBackend. Images travel as uint8 (a quarter of float32's size)."""
+    name = "remote"
+
+    def __init__(self, client: ModelClient):
+        self._client = client
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        pixels = np.clip(np.rint(np.asarray(batch) * 255.0), 0, 255).astype(np.uint8)
+        return self._client.call(OP_DISEASE, pixels)
+
+
+_client: ModelClient | None = None
+
+
+def get_client() -> ModelClient:
+    global _client
+    if _client is None:
+        _client = ModelClient()
+    return _client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriAI model server")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--cpus", default=os.getenv("MODEL_SERVER_CPUS", ""),
+                        help="comma-separated CPU ids to pin this process to (Linux)")
+    args = parser.parse_args()
+
+    if args.cpus and hasattr(os, "sched_setaffinity"):
+        cpus = {int(c) for c in args.cpus.split(",")}
+        os.sched_setaffinity(0, cpus)
+        # Runtimes size their thread pools from this
+        os.environ.setdefault("DISEASE_NUM_THREADS", str(len(cpus)))
+
+    server = ModelServer()
+    server.load()
+    asyncio.run(server.serve(args.socket))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Outbox — write-behind buffer for prediction / alert rows bound for Supabase
+Handlers call outbox.add(table, row) and return immediately. A flusher thread bulk-inserts each table's rows
+when OUTBOX_BATCH_SIZE accumulate or OUTBOX_FLUSH_S passes, and on shutdown. When Supabase is unreachable the
+batch goes to a local SQLite spool (OUTBOX_SPOOL_PATH), replayed once writes succeed again. Rows get their
+UUID here and are written with ignore-duplicates, so a replay after a lost response can't double-insert.
+Repeat alerts (same farm, type and severity) within OUTBOX_ALERT_DEDUP_S are dropped — across workers via Redis.
+The window starts once the first alert is written or spooled; while it is queued its key is only reserved,
+and a row rejected for good frees the key again.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from services import metrics
+from services.redis_cache import get_redis
+
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+FLUSH_S = float(os.getenv("OUTBOX_FLUSH_S", "2"))
+ALERT_DEDUP_S = float(os.getenv("OUTBOX_ALERT_DEDUP_S", str(6 * 3600)))
+SPOOL_PATH = os.getenv("OUTBOX_SPOOL_PATH", os.path.join(os.path.dirname(__file__), "..", "outbox_spool.sqlite3"))
+REPLAY_BATCH = 500
+MAX_BUFFERED = 10_000      # in-memory rows before add() spools directly (Supabase down for a long time)
+# How long a queued alert holds its dedup key before the write settles it (covers a worker dying mid-flush)
+ALERT_RESERVE_S = 300
+
+# Postgres data/constraint errors and PostgREST schema errors — retrying the same row will never work
+_PERMANENT_CODES = ("22", "23", "42", "PGRST")
+
+WRITES = metrics.Counter("agriai_outbox_rows_total", "Outbox rows by table and outcome", ("table", "outcome"))
+PENDING = metrics.Gauge("agriai_outbox_pending_rows", "Rows waiting in the outbox", ("where",))
+FLUSH_TIME = metrics.Histogram("agriai_outbox_flush_seconds", "Time per bulk insert", ("table",))
+ALERTS_DEDUPED = metrics.Counter("agriai_outbox_alerts_deduplicated_total", "Repeat alerts dropped inside the dedup window")
+
+
+def _alert_key(row: dict) -> tuple:
+    return row.get("farm_id"), row.get("alert_type"), row.get("severity")
+
+
+def _dedup_redis_key(key: tuple) -> str:
+    return f"alert-dedup:{':'.join(map(str, key))}"
+
+
+def _is_permanent(exc: Exception) -> bool:
+    code = str(getattr(exc, "code", "") or "")
+    return code.startswith(_PERMANENT_CODES)
+
+
+class Spool:
+    """Rows that could not be written, keyed by table, oldest first. Safe to use from several threads."""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS spool (seq INTEGER PRIMARY KEY, tbl TEXT NOT NULL, row TEXT NOT NULL, "
+                "created REAL NOT NULL)"
+            )
+            PENDING.set(self._db.execute("SELECT COUNT(*) FROM spool").fetchone()[0], where="spool")
+        return self._db
+
+    def put(self, table: str, rows: list[dict]):
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN")
+            db.executemany("INSERT INTO spool (tbl, row, created) VALUES (?, ?, ?)",
+                           [(table, json.dumps(r, default=str), now) for r in rows])
+            db.execute("COMMIT")
+        PENDING.inc(len(rows), where="spool")
+
+    def take(self, limit: int) -> list[tuple[int, str, dict]]:
+        with self._lock:
+            if self._db is None and not os.path.exists(self.path):
+                return []
+            cur = self._conn().execute("SELECT seq, tbl, row FROM spool ORDER BY seq LIMIT ?", (limit,))
+            return [(seq, tbl, json.loads(row)) for seq, tbl, row in cur.fetchall()]
+
+    def delete(self, seqs: list[int]):
+        if not seqs:
+            return
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN")
+            db.executemany("DELETE FROM spool WHERE seq = ?", [(s,) for s in seqs])
+            db.execute("COMMIT")
+        PENDING.dec(len(seqs), where="spool")
+
+    def count(self) -> int:
+        with self._lock:
+            if self._db is None and not os.path.exists(self.path):
+                return 0
+            return self._conn().execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+
+class Outbox:
+    def __init__(self, spool_path: str = SPOOL_PATH):
+        self.spool = Spool(spool_path)
+        self._buffers: dict[str, list[dict]] = {}
+        self._oldest: dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._recent_alerts: dict[tuple, float] = {}
+        self._pending_alerts: set[tuple] = set()
+        self._spool_retry_at = 0.0
+
+    # ── Producer side ───────────────────────────────────────────────────────
+
+    def add(self, table: str, row: dict) -> dict:
+        """Queue one row for `table`; returns it with the client-side id / created_at it will be stored with."""
+        row = {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat(), **row}
+        self._ensure_thread()
+        with self._cond:
+            spool = sum(len(b) for b in self._buffers.values()) >= MAX_BUFFERED
+            if spool:
+                self.spool.put(table, [row])
+                WRITES.inc(table=table, outcome="spooled")
+        if spool:
+            self._settle_alerts(table, [row], delivered=True)
+            return row
+        with self._cond:
+            buf = self._buffers.setdefault(table, [])
+            if not buf:
+                self._oldest[table] = time.monotonic()
+            buf.append(row)
+            PENDING.inc(where="memory")
+            if len(buf) >= BATCH_SIZE:
+                self._cond.notify()
+        return row
+
+    def add_alert(self, row: dict) -> dict | None:
+        """Queue an alert unless the same farm raised the same alert type/severity within the dedup window."""
+        if not self._reserve_alert(_alert_key(row)):
+            ALERTS_DEDUPED.inc()
+            return None
+        return self.add("alerts", row)
+
+    def _reserve_alert(self, key: tuple) -> bool:
+        """Claim `key` for an alert about to be queued; False while one is queued or inside its dedup window."""
+        if ALERT_DEDUP_S <= 0:
+            return True
+        r = get_redis()
+        if r is not None:
+            try:
+                # SET NX succeeds only for the first worker to raise this alert; the write extends it to the window
+                return bool(r.set(_dedup_redis_key(key), "pending", nx=True, ex=ALERT_RESERVE_S))
+            except Exception:
+                pass
+        now = time.monotonic()
+        with self._cond:
+            if len(self._recent_alerts) > 10_000:
+                self._recent_alerts = {k: t for k, t in self._recent_alerts.items() if now - t < ALERT_DEDUP_S}
+            last = self._recent_alerts.get(key)
+            if key in self._pending_alerts or (last is not None and now - last < ALERT_DEDUP_S):
+                return False
+            self._pending_alerts.add(key)
+        return True
+
+    def _settle_alerts(self, table: str, rows: list[dict], delivered: bool):
+        """Written or spooled alerts start their dedup window; alerts rejected for good release their key."""
+        if table != "alerts" or ALERT_DEDUP_S <= 0 or not rows:
+            return
+        keys = [_alert_key(row) for row in rows]
+        r = get_redis()
+        if r is not None:
+            try:
+                pipe = r.pipeline()
+                for key in keys:
+                    if delivered:
+                        pipe.set(_dedup_redis_key(key), "1", ex=int(ALERT_DEDUP_S))
+                    else:
+                        pipe.delete(_dedup_redis_key(key))
+                pipe.execute()
+            except Exception:
+                pass
+        now = time.monotonic()
+        with self._cond:
+            for key in keys:
+                self._pending_alerts.discard(key)
+                if delivered:
+                    self._recent_alerts[key] = now
+
+    # ── Flusher ─────────────────────────────────────────────────────────────
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._cond:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopping = False
+                    self._thread = threading.Thread(target=self._run, name="outbox-flusher", daemon=True)
+                    self._thread.start()
+
+    def _due(self) -> dict[str, list[dict]]:
+        """Take every buffer that is full or older than FLUSH_S (everything when stopping). Caller holds _cond."""
+        now = time.monotonic()
+        due = {}
+        for table, buf in list(self._buffers.items()):
+            if buf and (self._stopping or len(buf) >= BATCH_SIZE or now - self._oldest[table] >= FLUSH_S):
+                due[table] = buf
+                self._buffers[table] = []
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                due = self._due()
+                if not due and not self._stopping:
+                    self._cond.wait(timeout=FLUSH_S / 2)
+                    due = self._due()
+                stopping = self._stopping
+            for table, rows in due.items():
+                PENDING.dec(len(rows), where="memory")
+                self._write(table, rows)
+            self._replay_spool()
+            if stopping:
+                return
+
+    def _write(self, table: str, rows: list[dict]) -> bool:
+        """Bulk insert; permanent per-row errors are dropped, transient failures spool the batch."""
+        for offset in range(0, len(rows), BATCH_SIZE):
+            chunk = rows[offset:offset + BATCH_SIZE]
+            try:
+                self._insert(table, chunk)
+                WRITES.inc(len(chunk), table=table, outcome="written")
+                self._settle_alerts(table, chunk, delivered=True)
+            except Exception as e:
+                if _is_permanent(e):
+                    self._write_one_by_one(table, chunk)
+                    continue
+                print(f"Outbox: {table} insert failed ({e}); spooling {len(rows) - offset} rows")
+                self.spool.put(table, rows[offset:])
+                WRITES.inc(len(rows) - offset, table=table, outcome="spooled")
+                self._settle_alerts(table, rows[offset:], delivered=True)
+                self._spool_retry_at = time.monotonic() + FLUSH_S * 5
+                return False
+        return True
+
+    def _write_one_by_one(self, table: str, rows: list[dict]):
+        for row in rows:
+            try:
+                self._insert(table, [row])
+                WRITES.inc(table=table, outcome="written")
+                self._settle_alerts(table, [row], delivered=True)
+            except Exception as e:
+                if _is_permanent(e):
+                    print(f"Outbox: dropping {table} row {row.get('id')}: {e}")
+                    WRITES.inc(table=table, outcome="rejected")
+                    self._settle_alerts(table, [row], delivered=False)
+                else:
+                    self.spool.put(table, [row])
+                    WRITES.inc(table=table, outcome="spooled")
+                    self._settle_alerts(table, [row], delivered=True)
+
+    def _insert(self, table: str, rows: list[dict]):
+        from postgrest.types import ReturnMethod
+        from services.supabase_client import get_supabase
+        t0 = time.perf_counter()
+        get_supabase().table(table).upsert(
+            rows, ignore_duplicates=True, default_to_null=False, returning=ReturnMethod.minimal,
+        ).execute()
+        FLUSH_TIME.observe(time.perf_counter() - t0, table=table)
+
+    def _replay_spool(self):
+        """Re-send spooled rows oldest first; rows leave the spool only once written (or rejected for good)."""
+        if time.monotonic() < self._spool_retry_at:
+            return
+        while True:
+            entries = self.spool.take(REPLAY_BATCH)
+            if not entries:
+                return
+            by_table: dict[str, list[tuple[int, dict]]] = {}
+            for seq, table, row in entries:
+                by_table.setdefault(table, []).append((seq, row))
+            for table, items in by_table.items():
+                for offset in range(0, len(items), BATCH_SIZE):
+                    chunk = items[offset:offset + BATCH_SIZE]
+                    try:
+                        self._insert(table, [row for _, row in chunk])
+                        done = [seq for seq, _ in chunk]
+                    except Exception as e:
+                        if not _is_permanent(e):
+                            self._spool_retry_at = time.monotonic() + FLUSH_S * 5
+                            return
+                        done = self._replay_one_by_one(table, chunk)
+                    self.spool.delete(done)
+                    WRITES.inc(len(done), table=table, outcome="replayed")
+            if len(entries) < REPLAY_BATCH:
+                return
+
+    def _replay_one_by_one(self, table: str, items: list[tuple[int, dict]]) -> list[int]:
+        done = []
+        for seq, row in items:
+            try:
+                self._insert(table, [row])
+            except Exception as e:
+                if not _is_permanent(e):
+                    continue                      # stays spooled for the next attempt
+                print(f"Outbox: dropping spooled {table} row {row.get('id')}: {e}")
+                WRITES.inc(table=table, outcome="rejected")
+            done.append(seq)
+        return done
+
+    # ── Lifecycle ───────────────────────────────────────────────────────────
+
+    def start(self):
+        """Start the flusher now (e.g. at startup) so rows spooled by a previous run are replayed."""
+        self._ensure_thread()
+
+    def flush(self, timeout: float = 10.0):
+        """Write everything buffered now and stop the flusher (called on shutdown)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Anything still buffered (flusher never started, or timed out) is spooled, never lost
+        with self._cond:
+            leftovers, self._buffers = self._buffers, {}
+        for table, rows in leftovers.items():
+            if rows:
+                PENDING.dec(len(rows), where="memory")
+                self.spool.put(table, rows)
+                self._settle_alerts(table, rows, delivered=True)
+
+    def stats(self) -> dict:
+        with self._cond:
+            buffered = {t: len(b) for t, b in self._buffers.items() if b}
+        return {"buffered": buffered, "spooled": self.spool.count()}
+
+
+_outbox: Outbox | None = None
+
+
+def get_outbox() -> Outbox:
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox()
+    return _outbox
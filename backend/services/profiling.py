@@ -0,0 +1,237 @@
+"""
+Profiling — opt-in per-request stack sampling and tracemalloc memory attribution
+A request is profiled when it carries `X-Profile: 1` with a valid `X-Admin-Token`, or at random with probability
+PROFILE_SAMPLE_RATE on the PROFILE_ROUTES prefixes. While it runs, a sampler thread records every thread's Python
+stack each PROFILE_INTERVAL_MS and the result is written to PROFILE_DIR as folded stacks ("a;b;c 42" lines) —
+the input format of flamegraph.pl, inferno and speedscope. One profile runs at a time per worker, and samples
+cover every thread of the worker, so concurrent requests show up too (the request's own frames dominate).
+With MEMORY_TRACE=1, tracemalloc runs from startup and memory_report() attributes live allocations to the
+model / dataset loader whose frame made them. mmap'd artifacts (services/shared_data.py) are not traced.
+"""
+import asyncio
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as _Counter
+
+from services import metrics
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+ROUTES = tuple(p.strip() for p in os.getenv("PROFILE_ROUTES", "/api/v1/price-forecast,/api/v1/disease").split(",") if p.strip())
+INTERVAL_S = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "..", "profiles"))
+KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+MEMORY_TRACE_FRAMES = 64
+
+PROFILES = metrics.Counter("agriai_profiles_total", "Requests profiled, by trigger", ("trigger",))
+
+# Leaf frames of a thread parked with nothing to do (idle pool workers, background loops between runs)
+_IDLE_LEAVES = {("threading.py", "wait"), ("queue.py", "get"), ("thread.py", "_worker")}
+
+_active = threading.Lock()
+
+
+def is_admin(token: str | None) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+# ── Stack sampler ───────────────────────────────────────────────────────────
+
+def _label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples all threads' Python stacks on a background thread; stop() returns folded-stack counts."""
+
+    def __init__(self, interval: float = INTERVAL_S):
+        self.interval = interval
+        self.samples = 0
+        self._counts: _Counter = _Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+                if leaf in _IDLE_LEAVES and tid != threading.main_thread().ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(tid, f"thread-{tid}"))
+                self._counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self.started
+        return dict(self._counts)
+
+
+def _write_profile(profile_id: str, counts: dict, meta: dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w") as f:
+        for stack, n in sorted(counts.items(), key=lambda kv: -kv[1]):
+            f.write(f"{stack} {n}\n")
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump(meta, f)
+    # Keep the newest KEEP profiles
+    stale = sorted(p for p in os.listdir(PROFILE_DIR) if p.endswith(".json"))[:-KEEP or None]
+    for name in stale:
+        for ext in (".json", ".folded"):
+            try:
+                os.unlink(os.path.join(PROFILE_DIR, name[:-5] + ext))
+            except OSError:
+                pass
+
+
+def list_profiles() -> list[dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith(".json"):
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                out.append(json.load(f))
+    return out
+
+
+def profile_path(profile_id: str) -> str | None:
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+    return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: profiles the requests selected by header or sample rate (see module docstring)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _trigger(self, scope) -> str | None:
+        headers = dict(scope.get("headers", []))
+        if headers.get(b"x-profile") == b"1" and is_admin(headers.get(b"x-admin-token", b"").decode()):
+            return "header"
+        if SAMPLE_RATE > 0 and scope["path"].startswith(ROUTES) and random.random() < SAMPLE_RATE:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trigger = self._trigger(scope)
+        if trigger is None or not _active.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            counts = sampler.stop()
+            _active.release()
+            PROFILES.inc(trigger=trigger)
+            route = scope.get("route")
+            meta = {
+                "id": profile_id, "path": scope["path"], "route": getattr(route, "path", "unmatched"),
+                "method": scope.get("method", ""), "status": status["code"], "trigger": trigger,
+                "seconds": round(sampler.seconds, 4), "samples": sampler.samples,
+                "interval_ms": INTERVAL_S * 1000, "created_at": time.time(),
+            }
+            try:
+                await asyncio.to_thread(_write_profile, profile_id, counts, meta)
+            except Exception as e:
+                print(f"Failed to write profile {profile_id}: {e}")
+
+
+# ── Memory attribution ──────────────────────────────────────────────────────
+
+def start_memory_trace():
+    """Start tracemalloc when MEMORY_TRACE=1 — call before the routers are imported so their loads are traced."""
+    import tracemalloc
+    if os.getenv("MEMORY_TRACE", "0").lower() in ("1", "true", "yes") and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+
+
+def _code_span(fn) -> tuple[str, int, int] | None:
+    import dis
+    code = getattr(fn, "__code__", None)
+    if code is None:
+        return None
+    lines = [line for _, line in dis.findlinestarts(code) if line is not None]
+    return code.co_filename, code.co_firstlineno, max(lines, default=code.co_firstlineno)
+
+
+def memory_report(loaders: list[tuple[str, object]], top: int = 15) -> dict:
+    """
+    Live traced bytes per loader (allocations whose traceback passes through the loader's code), plus the
+    largest allocating packages. Loaders are the (name, callable) pairs of main.WARMUP_LOADERS.
+    """
+    import tracemalloc
+    from services.shared_data import memory_usage
+
+    if not tracemalloc.is_tracing():
+        return {"tracing": False, "hint": "start the worker with MEMORY_TRACE=1", "process": memory_usage()}
+
+    spans = [(name, span) for name, fn in loaders if (span := _code_span(fn)) is not None]
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+    by_loader = {name: 0 for name, _ in spans}
+    by_package: _Counter = _Counter()
+    total = 0
+    for stat in snapshot.statistics("traceback"):
+        total += stat.size
+        for frame in stat.traceback:                       # outermost first
+            owner = next((name for name, (path, lo, hi) in spans
+                          if frame.filename == path and lo <= frame.lineno <= hi), None)
+            if owner is not None:
+                by_loader[owner] += stat.size
+                break
+        # Innermost real file — import machinery frames would otherwise own every module's code objects
+        leaf = next((f.filename for f in reversed(stat.traceback) if not f.filename.startswith("<")),
+                    stat.traceback[-1].filename)
+        marker = "site-packages" + os.sep
+        package = leaf.split(marker, 1)[1].split(os.sep, 1)[0] if marker in leaf else os.path.basename(leaf)
+        by_package[package] += stat.size
+
+    current, peak = tracemalloc.get_traced_memory()
+    mb = lambda n: round(n / 1e6, 2)
+    return {
+        "tracing": True,
+        "traced_mb": mb(current),
+        "traced_peak_mb": mb(peak),
+        "loaders_mb": {name: mb(size) for name, size in sorted(by_loader.items(), key=lambda kv: -kv[1])},
+        "unattributed_mb": mb(total - sum(by_loader.values())),
+        "top_packages_mb": {p: mb(n) for p, n in by_package.most_common(top)},
+        "process": memory_usage(),
+    }
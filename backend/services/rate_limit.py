@@ -0,0 +1,221 @@
+"""
+Upstream Rate Limiter — token bucket per upstream host with a priority wait queue
+Buckets live in Redis when REDIS_URL is set (one quota shared by every worker) and in-process otherwise.
+Calls over quota wait instead of failing; interactive (dashboard) calls are served before background jobs.
+
+Quotas:  UPSTREAM_QUOTAS="api.openweathermap.org=60/60,rest.isric.org=5/60"   (calls / seconds)
+Opt-in: with UPSTREAM_QUOTAS unset no host is limited. FREE_TIER_QUOTAS is a starting point for the free keys.
+Background work wraps its calls in `with rate_limit.background():`.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import httpx
+
+from services import metrics
+from services.redis_cache import _may_block, get_redis
+
+INTERACTIVE = 0
+BACKGROUND = 1
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Free-tier quotas: OWM / Agromonitoring 60 calls per minute on one key, ISRIC asks for 5 per minute
+FREE_TIER_QUOTAS = "api.openweathermap.org=60/60,agromonitoring.com=60/60,rest.isric.org=5/60"
+# Longest a call may queue for a token before giving up
+MAX_WAIT_S = float(os.getenv("UPSTREAM_MAX_WAIT_S", "30"))
+
+_priority: ContextVar[int] = ContextVar("agriai_upstream_priority", default=INTERACTIVE)
+
+QUEUE_DEPTH = metrics.Gauge(
+    "agriai_upstream_queue_depth", "Calls waiting for an upstream rate-limit token", ("host", "priority"),
+)
+QUEUE_WAIT = metrics.Histogram(
+    "agriai_upstream_queue_wait_seconds", "Time spent waiting for an upstream rate-limit token", ("host", "priority"),
+)
+THROTTLED = metrics.Counter(
+    "agriai_upstream_throttled_total", "429 responses received from upstreams", ("host",),
+)
+
+
+class UpstreamQuotaExceeded(httpx.TransportError):
+    """Raised when a call could not get a token within MAX_WAIT_S."""
+
+
+@contextmanager
+def background():
+    """Mark upstream calls made inside this block as background work (queued behind interactive calls)."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _parse_quotas(text: str) -> dict[str, tuple[float, float]]:
+    quotas = {}
+    for item in filter(None, (p.strip() for p in text.split(","))):
+        host, spec = item.split("=", 1)
+        calls, seconds = spec.split("/", 1)
+        quotas[host.strip()] = (float(calls), float(seconds))
+    return quotas
+
+
+# Atomic token bucket in Redis. Returns 0 when a token was taken, else milliseconds until one is free.
+_REDIS_TAKE = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or ARGV[2])
+local updated = tonumber(redis.call('HGET', KEYS[1], 'u') or ARGV[3])
+local rate, capacity, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = math.ceil((1 - tokens) / rate) end
+redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate) + 1000)
+return wait
+"""
+
+# Upstream 429: drop the shared bucket to 1 - seconds * rate tokens (ARGV[4]), so every worker backs off
+_REDIS_PENALISE = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or ARGV[2])
+local updated = tonumber(redis.call('HGET', KEYS[1], 'u') or ARGV[3])
+local rate, capacity, now, floor = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+tokens = math.min(capacity, tokens + (now - updated) * rate, floor)
+redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1000)
+return 0
+"""
+
+
+def _eval_shared(script: str, host: str, *args):
+    """
+    Run a bucket script against the shared bucket; None when Redis is not in use. Blocking — get_redis() may
+    connect and ping — so coroutines call it in a thread.
+    """
+    r = get_redis()
+    if r is None:
+        return None
+    return r.eval(script, 1, f"ratelimit:{host}", *args)
+
+
+class TokenBucket:
+    """`capacity` calls per `period` seconds, refilled continuously."""
+
+    def __init__(self, host: str, calls: float, period: float):
+        self.host = host
+        self.capacity = calls
+        self.rate = calls / period            # tokens per second
+        self._tokens = calls
+        self._updated = time.monotonic()
+        self._waiters: list = []               # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+        self._loop = None
+
+    def _take_local(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def _take(self) -> float:
+        """Seconds to wait before a token is available (0 = taken now)."""
+        if not _may_block():
+            return self._take_local()
+        try:
+            # redis-py is synchronous — keep the client lookup and the round trip off the event loop
+            wait_ms = await asyncio.to_thread(
+                _eval_shared, _REDIS_TAKE, self.host,
+                self.rate / 1000, self.capacity, int(time.time() * 1000),
+            )
+        except Exception:
+            return self._take_local()
+        if wait_ms is None:
+            return self._take_local()
+        return int(wait_ms) / 1000
+
+    async def acquire(self):
+        priority = _priority.get()
+        labels = {"host": self.host, "priority": _PRIORITY_NAMES[priority]}
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._waiters, self._dispatcher = loop, [], None
+
+        # Fast path: nobody queued ahead of us and a token is free
+        if not self._waiters and await self._take() == 0:
+            QUEUE_WAIT.observe(0.0, **labels)
+            return
+
+        t0 = time.perf_counter()
+        fut = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        QUEUE_DEPTH.inc(**labels)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+        try:
+            # On timeout or caller cancellation the future is cancelled and the dispatcher skips it
+            await asyncio.wait_for(fut, timeout=MAX_WAIT_S)
+        except asyncio.TimeoutError:
+            raise UpstreamQuotaExceeded(f"{self.host}: no rate-limit token within {MAX_WAIT_S:.0f}s")
+        finally:
+            QUEUE_DEPTH.dec(**labels)
+            QUEUE_WAIT.observe(time.perf_counter() - t0, **labels)
+
+    async def try_acquire(self) -> bool:
+        """Take a token only if one is free right now and nobody is queued (for optional extra calls)."""
+        return not self._waiters and await self._take() == 0
+
+    async def _dispatch(self):
+        """Hand tokens to waiters in priority order as they refill."""
+        while self._waiters:
+            if self._waiters[0][2].done():           # caller gave up or was cancelled
+                heapq.heappop(self._waiters)
+                continue
+            wait = await self._take()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            while self._waiters:
+                _, _, fut = heapq.heappop(self._waiters)
+                if not fut.done():
+                    fut.set_result(None)
+                    break
+
+    async def penalise(self, seconds: float):
+        """Upstream said 429 — empty the bucket (shared one too) so queued calls on every worker back off."""
+        floor = 1 - seconds * self.rate
+        self._tokens = min(self._tokens, floor)
+        self._updated = time.monotonic()
+        if not _may_block():
+            return
+        try:
+            await asyncio.to_thread(
+                _eval_shared, _REDIS_PENALISE, self.host,
+                self.rate / 1000, self.capacity, int(time.time() * 1000), floor,
+            )
+        except Exception:
+            pass
+
+
+_buckets: dict[str, TokenBucket] | None = None
+
+
+def bucket_for(host: str) -> TokenBucket | None:
+    global _buckets
+    if _buckets is None:
+        quotas = _parse_quotas(os.getenv("UPSTREAM_QUOTAS", ""))
+        _buckets = {h: TokenBucket(h, calls, period) for h, (calls, period) in quotas.items()}
+    return _buckets.get(host)
+
+
+def retry_after(response: httpx.Response, default: float = 1.0) -> float:
+    try:
+        return max(0.0, float(response.headers.get("retry-after", default)))
+    except ValueError:
+        return default
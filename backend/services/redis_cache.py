@@ -1,47 +1,129 @@
 """
 Redis Cache Service — Caches external API responses to protect rate limits
+Without REDIS_URL, entries live in a bounded in-process LRU instead (not shared between workers); the same
+LRU is used for REDIS_RETRY_S after Redis fails. Coroutines use the *_async variants, which keep Redis I/O
+off the event loop.
 """
+import asyncio
 import os
 import json
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
 
+from services import metrics
+
+# After a failed connect or command, skip Redis this long instead of paying its timeout on every call
+REDIS_RETRY_S = float(os.getenv("REDIS_RETRY_S", "30"))
+
 _redis = None
+_down_until = 0.0
 
 
 def get_redis():
-    """Get Redis client (lazy init)."""
-    global _redis
+    """Get Redis client (lazy init); None without REDIS_URL or for REDIS_RETRY_S after a failure."""
+    global _redis, _down_until
     if _redis is None:
         redis_url = os.getenv("REDIS_URL", "")
-        if not redis_url:
+        if not redis_url or time.monotonic() < _down_until:
             return None
         try:
             import redis
-            _redis = redis.from_url(redis_url, decode_responses=True)
-            _redis.ping()
+            client = redis.from_url(redis_url, decode_responses=True, socket_connect_timeout=1, socket_timeout=2)
+            client.ping()
+            _redis = client
         except Exception:
-            _redis = None
+            _down_until = time.monotonic() + REDIS_RETRY_S
     return _redis
 
 
+def _mark_down():
+    global _redis, _down_until
+    _redis = None
+    _down_until = time.monotonic() + REDIS_RETRY_S
+
+
+def _may_block() -> bool:
+    """Whether the next cache call can do network I/O (a live client, or a connect attempt is due)."""
+    return _redis is not None or (bool(os.getenv("REDIS_URL")) and time.monotonic() >= _down_until)
+
+
+# In-process fallback when Redis is not configured — per worker, bounded, oldest evicted first
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", "4096"))
+_local: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _local_get(key: str) -> tuple[float, str] | None:
+    with _local_lock:
+        entry = _local.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del _local[key]
+            return None
+        _local.move_to_end(key)
+        return entry
+
+
 def cache_get(key: str) -> Optional[dict]:
     """Get cached value by key."""
     r = get_redis()
     if r is None:
-        return None
+        entry = _local_get(key)
+        metrics.CACHE_REQUESTS.inc(cache="local", result="hit" if entry else "miss")
+        return json.loads(entry[1]) if entry else None
     try:
         val = r.get(key)
-        return json.loads(val) if val else None
     except Exception:
+        metrics.CACHE_REQUESTS.inc(cache="redis", result="error")
+        _mark_down()
         return None
+    metrics.CACHE_REQUESTS.inc(cache="redis", result="hit" if val else "miss")
+    return json.loads(val) if val else None
 
 
 def cache_set(key: str, value: dict, ttl_seconds: int = 600):
     """Set cached value with TTL."""
     r = get_redis()
     if r is None:
+        with _local_lock:
+            _local[key] = (time.monotonic() + ttl_seconds, json.dumps(value))
+            _local.move_to_end(key)
+            while len(_local) > LOCAL_CACHE_SIZE:
+                _local.popitem(last=False)
         return
     try:
         r.setex(key, ttl_seconds, json.dumps(value))
     except Exception:
-        pass
+        _mark_down()
+
+
+def cache_ttl(key: str) -> float | None:
+    """Seconds until `key` expires, or None when it is not cached."""
+    r = get_redis()
+    if r is None:
+        entry = _local_get(key)
+        return entry[0] - time.monotonic() if entry else None
+    try:
+        ttl = r.ttl(key)
+    except Exception:
+        _mark_down()
+        return None
+    return float(ttl) if ttl and ttl > 0 else None
+
+
+async def cache_get_async(key: str) -> Optional[dict]:
+    return await asyncio.to_thread(cache_get, key) if _may_block() else cache_get(key)
+
+
+async def cache_set_async(key: str, value: dict, ttl_seconds: int = 600):
+    if _may_block():
+        await asyncio.to_thread(cache_set, key, value, ttl_seconds)
+    else:
+        cache_set(key, value, ttl_seconds)
+
+
+async def cache_ttl_async(key: str) -> float | None:
+    return await asyncio.to_thread(cache_ttl, key) if _may_block() else cache_ttl(key)
@@ -0,0 +1,231 @@
+"""
+Resilience — request deadlines, hedged requests and per-host circuit breakers for upstream calls
+  • Deadline: every request gets one latency budget (REQUEST_BUDGET_S, or the caller's
+    X-Request-Budget-Ms header, no lower than REQUEST_BUDGET_MIN_MS); all upstream calls it makes
+    share what is left of it. Running out of budget never counts against a host's breaker.
+  • Hedging: for hosts in HEDGE_HOSTS, an idempotent GET still pending after the host's recent
+    HEDGE_PERCENTILE latency gets a second copy sent; the first response wins.
+  • Circuit breaker: after BREAKER_FAILURES consecutive failures a host is skipped for
+    BREAKER_COOLDOWN_S, serving the last good response for the same URL when there is one.
+Used by services/http_client.py — routers only see faster failures (or stale data) when an upstream is sick.
+"""
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import httpx
+
+from services import metrics
+
+REQUEST_BUDGET_S = float(os.getenv("REQUEST_BUDGET_S", "8"))
+# Floor for a caller-supplied X-Request-Budget-Ms — a tiny budget must not starve the upstream calls it makes
+REQUEST_BUDGET_MIN_S = float(os.getenv("REQUEST_BUDGET_MIN_MS", "500")) / 1000
+HEDGE_HOSTS = {h.strip() for h in os.getenv("HEDGE_HOSTS", "").split(",") if h.strip()}
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY_S = 0.05
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_S = float(os.getenv("BREAKER_COOLDOWN_S", "30"))
+STALE_CACHE_SIZE = 512
+
+BREAKER_STATE = metrics.Gauge(
+    "agriai_upstream_breaker_state", "Circuit breaker state per host (0 closed, 1 half-open, 2 open)", ("host",),
+)
+SHORT_CIRCUITS = metrics.Counter(
+    "agriai_upstream_short_circuits_total", "Calls skipped by an open breaker, by what was served", ("host", "served"),
+)
+HEDGES = metrics.Counter(
+    "agriai_upstream_hedges_total", "Hedged second requests sent, by which copy won", ("host", "winner"),
+)
+DEADLINE_EXCEEDED = metrics.Counter(
+    "agriai_upstream_deadline_exceeded_total", "Upstream calls cut short by the request deadline", ("host",),
+)
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """The request's latency budget ran out before (or while) calling an upstream."""
+
+
+class CircuitOpen(httpx.TransportError):
+    """The upstream host's breaker is open and no cached response exists for this URL."""
+
+
+# ── Deadlines ───────────────────────────────────────────────────────────────
+
+# Absolute time.monotonic() by which the current request must finish; None = no deadline
+_deadline: ContextVar[float | None] = ContextVar("agriai_deadline", default=None)
+
+
+@contextmanager
+def budget(seconds: float):
+    """Run the block under a deadline `seconds` from now (never extends an outer, tighter one)."""
+    current = _deadline.get()
+    new = time.monotonic() + seconds
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left in the current request's budget, or None outside a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware giving each HTTP request its latency budget."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        seconds = REQUEST_BUDGET_S
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-budget-ms":
+                try:
+                    seconds = min(seconds, max(REQUEST_BUDGET_MIN_S, int(value) / 1000))
+                except ValueError:
+                    pass
+                break
+        with budget(seconds):
+            await self.app(scope, receive, send)
+
+
+# ── Latency tracking (hedge delay) ──────────────────────────────────────────
+
+class LatencyWindow:
+    """Last N successful call latencies for one host."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        if len(self._samples) < 20:
+            return None                        # not enough history to hedge sensibly
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# ── Circuit breaker ─────────────────────────────────────────────────────────
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, host: str, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN_S):
+        self.host = host
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_seq = 0
+
+    def allow(self) -> tuple[bool, int | None]:
+        """
+        (allowed, probe): whether a call may go out now. In half-open state exactly one probe is let through;
+        it gets a probe ticket to hand back to record() / release(), and only that call ends the probe.
+        """
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._set(self.HALF_OPEN)
+        if self.state == self.CLOSED:
+            return True, None
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            self._probe_seq += 1
+            return True, self._probe_seq
+        return False, None
+
+    def _end_probe(self, probe: int | None):
+        # A call admitted before the breaker went half-open must not free the real probe's slot
+        if probe is not None and probe == self._probe_seq:
+            self._probing = False
+
+    def record(self, ok: bool, probe: int | None = None):
+        self._end_probe(probe)
+        if ok:
+            self._failures = 0
+            self._set(self.CLOSED)
+            return
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.threshold:
+            self._opened_at = time.monotonic()
+            self._set(self.OPEN)
+
+    def release(self, probe: int | None = None):
+        """The call is over (it may never have reached the host, e.g. rate-limit wait) — end its probe, if it was one."""
+        self._end_probe(probe)
+
+    def _set(self, state: int):
+        self.state = state
+        BREAKER_STATE.set(state, host=self.host)
+
+
+def is_failure(response: httpx.Response | None) -> bool:
+    """Transport errors and 5xx count against a host; 4xx are the caller's problem (429 is the limiter's)."""
+    return response is None or response.status_code >= 500
+
+
+# ── Last-good responses (served while a breaker is open) ────────────────────
+
+class StaleCache:
+    def __init__(self, size: int = STALE_CACHE_SIZE):
+        self._entries: OrderedDict = OrderedDict()
+        self._size = size
+
+    @staticmethod
+    def _key(request: httpx.Request) -> str:
+        # Drop API keys so the cache key is stable and never logged with secrets
+        params = [(k, v) for k, v in request.url.params.multi_items() if k not in ("appid", "key")]
+        return f"{request.method} {request.url.copy_with(query=None)}?{params}"
+
+    def put(self, request: httpx.Request, response: httpx.Response):
+        if request.method != "GET" or response.status_code != 200:
+            return
+        key = self._key(request)
+        self._entries[key] = (response.status_code, response.headers.get("content-type", ""), response.content)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    def get(self, request: httpx.Request) -> httpx.Response | None:
+        entry = self._entries.get(self._key(request))
+        if entry is None:
+            return None
+        status, content_type, body = entry
+        return httpx.Response(status, headers={"content-type": content_type, "x-agriai-stale": "1"},
+                              content=body, request=request)
+
+
+# ── Per-host state ──────────────────────────────────────────────────────────
+
+class HostState:
+    def __init__(self, host: str):
+        self.breaker = CircuitBreaker(host)
+        self.latency = LatencyWindow()
+        self.hedge = host in HEDGE_HOSTS
+
+    def hedge_delay(self) -> float | None:
+        if not self.hedge:
+            return None
+        p = self.latency.percentile(HEDGE_PERCENTILE)
+        return None if p is None else max(HEDGE_MIN_DELAY_S, p)
+
+
+_hosts: dict[str, HostState] = {}
+stale = StaleCache()
+
+
+def host_state(host: str) -> HostState:
+    state = _hosts.get(host)
+    if state is None:
+        state = _hosts[host] = HostState(host)
+    return state
@@ -0,0 +1,245 @@
+"""
+Shared Data Service — crop model and market/price datasets as memory-mappable column arrays
+Artifacts are plain .npy files opened read-only with mmap, so every uvicorn worker on a host
+shares the same physical pages through the OS page cache instead of holding a private copy.
+Build them with:  python -m scripts.export_shared
+"""
+import json
+import os
+
+import numpy as np
+
+SHARED_DIR = os.getenv(
+    "SHARED_DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "ml_models", "shared")
+)
+
+# Dates are stored as int32 days since 1970-01-01; unparseable dates sort first (= oldest)
+NO_DATE = np.iinfo(np.int32).min
+
+
+def _save_arrays(out_dir: str, arrays: dict, meta: dict):
+    os.makedirs(out_dir, exist_ok=True)
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(arr))
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def _load_arrays(in_dir: str, names: list[str], mmap: bool = True) -> tuple[dict, dict]:
+    mode = "r" if mmap else None
+    arrays = {n: np.load(os.path.join(in_dir, f"{n}.npy"), mmap_mode=mode) for n in names}
+    with open(os.path.join(in_dir, "meta.json")) as f:
+        meta = json.load(f)
+    return arrays, meta
+
+
+def shared_path(name: str) -> str | None:
+    """Directory of a shared artifact, or None when it has not been exported."""
+    path = os.path.join(SHARED_DIR, name)
+    return path if os.path.exists(os.path.join(path, "meta.json")) else None
+
+
+# ── Crop model ──────────────────────────────────────────────────────────────
+
+class MmapForest:
+    """
+    RandomForestClassifier flattened into node arrays, with a vectorised predict_proba.
+    sklearn copies tree nodes into private memory when unpickling (even with joblib mmap_mode),
+    so the forest is exported to raw arrays instead.
+    """
+    ARRAYS = ["left", "right", "feature", "threshold", "value", "roots"]
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.left = arrays["left"]            # absolute child index, -1 at leaves
+        self.right = arrays["right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]          # per-node class probabilities (float32)
+        self.roots = arrays["roots"]
+        self.max_depth = meta["max_depth"]
+        self.classes_ = np.array(meta["classes"])
+        self.n_features_in_ = meta["n_features"]
+
+    @staticmethod
+    def export(model, out_dir: str, class_names: list[str] | None = None):
+        lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for est in model.estimators_:
+            t = est.tree_
+            left = t.children_left.astype(np.int32)
+            right = t.children_right.astype(np.int32)
+            lefts.append(np.where(left >= 0, left + offset, -1))
+            rights.append(np.where(right >= 0, right + offset, -1))
+            features.append(np.maximum(t.feature, 0).astype(np.int32))
+            thresholds.append(t.threshold.astype(np.float64))
+            v = t.value[:, 0, :].astype(np.float64)
+            values.append((v / v.sum(axis=1, keepdims=True)).astype(np.float32))
+            roots.append(offset)
+            offset += t.node_count
+            max_depth = max(max_depth, t.max_depth)
+
+        classes = class_names if class_names is not None else [str(c) for c in model.classes_]
+        _save_arrays(out_dir, {
+            "left": np.concatenate(lefts), "right": np.concatenate(rights),
+            "feature": np.concatenate(features), "threshold": np.concatenate(thresholds),
+            "value": np.concatenate(values), "roots": np.array(roots, dtype=np.int32),
+        }, {"max_depth": int(max_depth), "classes": list(classes), "n_features": int(model.n_features_in_)})
+
+    @classmethod
+    def load(cls, in_dir: str, mmap: bool = True) -> "MmapForest":
+        return cls(*_load_arrays(in_dir, cls.ARRAYS, mmap))
+
+    def predict_proba(self, X) -> np.ndarray:
+        # sklearn compares float32 features against float64 thresholds — match it exactly
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            internal = left >= 0
+            if not internal.any():
+                break
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(internal, np.where(go_left, left, self.right[node]), node)
+        # Average leaf distributions one tree at a time — never a rows × trees × classes array
+        proba = np.zeros((len(X), self.value.shape[1]), dtype=np.float64)
+        for t in range(node.shape[1]):
+            proba += self.value[node[:, t]]
+        return proba / node.shape[1]
+
+
+# ── Market (mandi) prices ───────────────────────────────────────────────────
+
+class MarketTable:
+    """
+    Mandi prices as parallel column arrays sorted by (state, commodity, date).
+    Text columns are integer codes into `categories`; every (state, commodity) series is contiguous.
+    """
+    CODED = {"state": "STATE", "commodity": "Commodity", "market": "Market Name"}
+    ARRAYS = ["state", "commodity", "market", "date", "min_price", "max_price", "modal_price"]
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.cols = arrays
+        self.categories: dict[str, list[str]] = meta["categories"]
+        self._lower: dict[str, dict[str, list[int]]] = {col: {} for col in self.categories}
+        for col, names in self.categories.items():
+            for code, name in enumerate(names):
+                self._lower[col].setdefault(name.lower(), []).append(code)
+        self._version: str | None = None
+
+    def __len__(self) -> int:
+        return len(self.cols["date"])
+
+    @classmethod
+    def from_csv(cls, path: str) -> "MarketTable":
+        import pandas as pd
+        df = pd.read_csv(path)
+        arrays, categories = {}, {}
+        for key, col in cls.CODED.items():
+            values = df[col] if col in df.columns else pd.Series([None] * len(df))
+            cat = pd.Categorical(values.astype("string").str.strip())
+            arrays[key] = cat.codes.astype(np.int32)          # -1 for missing
+            categories[key] = [str(c) for c in cat.categories]
+        dates = pd.to_datetime(df["Price Date"], format="%d/%m/%Y", errors="coerce")
+        days = (dates.values.astype("datetime64[D]").astype(np.int64))
+        arrays["date"] = np.where(dates.isna().values, NO_DATE, days).astype(np.int32)
+        for key, col in [("min_price", "Min_Price"), ("max_price", "Max_Price"), ("modal_price", "Modal_Price")]:
+            arrays[key] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+
+        order = np.lexsort((arrays["date"], arrays["commodity"], arrays["state"]))
+        return cls({k: v[order] for k, v in arrays.items()}, {"categories": categories})
+
+    def save(self, out_dir: str):
+        _save_arrays(out_dir, self.cols, {"categories": self.categories})
+
+    @classmethod
+    def load(cls, in_dir: str, mmap: bool = True) -> "MarketTable":
+        return cls(*_load_arrays(in_dir, cls.ARRAYS, mmap))
+
+    @property
+    def version(self) -> str:
+        """Fingerprint of the data (same in every worker) — used to build ETags without serializing."""
+        if self._version is None:
+            dates, modal = self.cols["date"], self.cols["modal_price"]
+            self._version = f"{len(self)}-{int(dates.max()) if len(dates) else 0}-{float(np.nansum(modal)):.2f}"
+        return self._version
+
+    def codes(self, col: str, name: str) -> list[int]:
+        """Case-insensitive category lookup (a name may appear in several spellings)."""
+        return self._lower[col].get(name.strip().lower(), [])
+
+    def rows_for(self, state_code: int, commodity_code: int | None = None) -> slice:
+        """Contiguous row range for a state (and commodity) — two binary searches, no scan."""
+        state = self.cols["state"]
+        lo, hi = np.searchsorted(state, state_code, "left"), np.searchsorted(state, state_code, "right")
+        if commodity_code is None:
+            return slice(int(lo), int(hi))
+        commodity = self.cols["commodity"][lo:hi]
+        c_lo, c_hi = np.searchsorted(commodity, commodity_code, "left"), np.searchsorted(commodity, commodity_code, "right")
+        return slice(int(lo + c_lo), int(lo + c_hi))
+
+    def range_for(self, state_code: int, commodity_code: int, start_day: int, end_day: int) -> slice:
+        """Rows of one (state, commodity) series dated within [start_day, end_day] (days since epoch)."""
+        rows = self.rows_for(state_code, commodity_code)
+        dates = self.cols["date"][rows]
+        lo, hi = np.searchsorted(dates, start_day, "left"), np.searchsorted(dates, end_day, "right")
+        return slice(rows.start + int(lo), rows.start + int(hi))
+
+
+# ── Raw material monthly prices (price forecast) ────────────────────────────
+
+class RawMaterialTable:
+    """Monthly raw-material price columns as one float64 matrix (NaN where not numeric)."""
+    ARRAYS = ["values"]
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.values = arrays["values"]
+        self.columns: list[str] = meta["columns"]
+        self._index = {c: i for i, c in enumerate(self.columns)}
+
+    @classmethod
+    def from_csv(cls, path: str) -> "RawMaterialTable":
+        import pandas as pd
+        df = pd.read_csv(path)
+        columns = [c for c in df.columns if c.endswith("Price")]
+        values = np.column_stack([pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64) for c in columns])
+        return cls({"values": values}, {"columns": columns})
+
+    def save(self, out_dir: str):
+        _save_arrays(out_dir, {"values": self.values}, {"columns": self.columns})
+
+    @classmethod
+    def load(cls, in_dir: str, mmap: bool = True) -> "RawMaterialTable":
+        return cls(*_load_arrays(in_dir, cls.ARRAYS, mmap))
+
+    def series(self, column: str) -> np.ndarray:
+        """Non-NaN values of one price column, oldest first."""
+        col = self.values[:, self._index[column]]
+        return np.asarray(col[~np.isnan(col)])
+
+
+# ── Memory accounting ───────────────────────────────────────────────────────
+
+def memory_usage() -> dict:
+    """
+    Resident memory of this process in MB. On Linux, `pss` splits shared pages between the
+    processes mapping them and `private` is what this worker alone costs.
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024
+    except OSError:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"rss_peak_mb": round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)}
+    return {
+        "rss_mb": round(fields.get("Rss", 0), 1),
+        "pss_mb": round(fields.get("Pss", 0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), 1),
+    }
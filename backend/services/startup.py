@@ -0,0 +1,78 @@
+"""
+Startup Profiler — per-module import timings, background warm-up and time-to-first-request
+Routers are imported through timed_import() so a slow cold start can be traced to a module.
+"""
+import importlib
+import os
+import time
+from typing import Callable
+
+# Reference point for every startup figure: the moment main.py imported this module
+_boot = time.perf_counter()
+
+_import_ms: dict[str, float] = {}
+_warmup_ms: dict[str, float] = {}
+_warmup_errors: dict[str, str] = {}
+_warmup_done = False
+_first_request_ms: float | None = None
+
+# Heavy dependencies that must NOT be imported while main.py loads.
+# They are pulled in lazily by the routers, or by warm_up() after the server is accepting connections.
+HEAVY_MODULES = ["pandas", "statsmodels", "tensorflow", "google.generativeai", "sklearn"]
+
+
+def _elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+def timed_import(name: str):
+    """Import a module and record how long it took (milliseconds)."""
+    t0 = time.perf_counter()
+    module = importlib.import_module(name)
+    _import_ms[name] = _elapsed_ms(t0)
+    return module
+
+
+def mark_first_request():
+    """Record time-to-first-request. Cheap no-op after the first call."""
+    global _first_request_ms
+    if _first_request_ms is None:
+        _first_request_ms = _elapsed_ms(_boot)
+
+
+def warm_up(loaders: list[tuple[str, Callable]]):
+    """
+    Run warm-up loaders one after another (blocking — call from a worker thread).
+    A failing loader is recorded and skipped; warm-up is an optimisation, never a requirement.
+    """
+    global _warmup_done
+    for name, loader in loaders:
+        t0 = time.perf_counter()
+        try:
+            loader()
+        except Exception as e:
+            _warmup_errors[name] = str(e)
+        _warmup_ms[name] = _elapsed_ms(t0)
+    _warmup_done = True
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("WARMUP_ON_START", "1").lower() not in ("0", "false", "no")
+
+
+def report() -> dict:
+    """Startup timing report served by GET /startup."""
+    import sys
+    return {
+        "uptime_ms": _elapsed_ms(_boot),
+        "import_ms": dict(_import_ms),
+        "import_total_ms": round(sum(_import_ms.values()), 1),
+        "time_to_first_request_ms": _first_request_ms,
+        "warmup": {
+            "enabled": warmup_enabled(),
+            "done": _warmup_done,
+            "ms": dict(_warmup_ms),
+            "errors": dict(_warmup_errors),
+        },
+        "heavy_modules_loaded": [m for m in HEAVY_MODULES if m in sys.modules],
+    }
@@ -3,9 +3,10 @@ Supabase Client — Uses postgrest + httpx for DB/Storage operations
 (Avoids full `supabase` SDK which requires C++ build tools on Windows)
 """
 import os
-import httpx
 from postgrest import SyncPostgrestClient
 
+from services.http_client import sync_client, instrument_sync_client
+
 _postgrest: SyncPostgrestClient | None = None
 _url: str = ""
 _service_key: str = ""
@@ -24,6 +25,7 @@ def _init():
             "Authorization": f"Bearer {_service_key}",
         },
     )
+    instrument_sync_client(_postgrest.session)
 
 
 class SupabaseHelper:
@@ -46,7 +48,7 @@ class SupabaseHelper:
         def upload(self, path: str, file_body: bytes, options: dict | None = None):
             url = f"{_url}/storage/v1/object/{self.bucket}/{path}"
             content_type = (options or {}).get("content-type", "application/octet-stream")
-            resp = httpx.post(
+            resp = sync_client().post(
                 url,
                 content=file_body,
                 headers={
@@ -61,7 +63,7 @@ class SupabaseHelper:
 
     class _Auth:
         def get_user(self, token: str):
-            resp = httpx.get(
+            resp = sync_client().get(
                 f"{_url}/auth/v1/user",
                 headers={
                     "apikey": _service_key,
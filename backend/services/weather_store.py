@@ -0,0 +1,283 @@
+"""
+Weather Observation Store — hourly observations per 0.1° weather cell, with rolling aggregates
+A background poller (poller() below) records temperature, humidity and rain for every farm cell each hour
+into a SQLite file shared by the workers on a host (WEATHER_STORE_PATH). Every row also carries running
+totals since the cell's first observation, so the rain / mean temperature over any window is the difference
+of two rows — two index seeks whatever the window length. Hourly rows older than WEATHER_HOURLY_DAYS are
+compacted into one row per day (keeping the running totals); daily rows go after WEATHER_DAILY_DAYS.
+"""
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:                                # Windows — no host-wide poll lock
+    fcntl = None
+
+from services import metrics
+from services.farm_index import WEATHER_CELL_DEG, cell_of, cell_center
+
+STORE_PATH = os.getenv("WEATHER_STORE_PATH", os.path.join(os.path.dirname(__file__), "..", "weather_store.sqlite3"))
+POLL_S = float(os.getenv("WEATHER_POLL_S", "3600"))
+HOURLY_DAYS = int(os.getenv("WEATHER_HOURLY_DAYS", "14"))
+DAILY_DAYS = int(os.getenv("WEATHER_DAILY_DAYS", "400"))
+# A window is only trusted when at least this share of its hours were observed
+MIN_COVERAGE = float(os.getenv("WEATHER_MIN_COVERAGE", "0.6"))
+# The latest observation stands in for current conditions while it is this recent
+CURRENT_MAX_AGE_S = 2 * 3600
+POLL_CONCURRENCY = 4
+
+OBSERVATIONS = metrics.Counter("agriai_weather_observations_total", "Hourly observations recorded, by result", ("result",))
+WINDOW_READS = metrics.Counter("agriai_weather_window_reads_total", "Rolling-window reads, by result", ("result",))
+POLL_DURATION = metrics.Gauge("agriai_weather_poll_duration_seconds", "Duration of the last observation poll")
+
+
+def _hour(ts: float) -> int:
+    return int(ts // 3600)
+
+
+class WeatherStore:
+    def __init__(self, path: str = STORE_PATH):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # t = epoch hour (hourly) or epoch hour of the day's last observation (daily);
+            # rain_cum / temp_cum / hum_cum / n_cum = running totals up to and including this row
+            for table in ("hourly", "daily"):
+                self._db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (i INTEGER, j INTEGER, t INTEGER, temp REAL, humidity REAL, "
+                    "rain REAL, temp_min REAL, temp_max REAL, rain_cum REAL, temp_cum REAL, hum_cum REAL, "
+                    "n_cum INTEGER, PRIMARY KEY (i, j, t)) WITHOUT ROWID"
+                )
+        return self._db
+
+    # ── Writes ──────────────────────────────────────────────────────────────
+
+    def record(self, cell: tuple[int, int], ts: float, temp: float, humidity: float, rain_mm: float) -> bool:
+        """
+        Append the observation for the hour containing `ts`. False if the cell already has that hour or a later
+        one — running totals only extend forwards.
+        """
+        hour = _hour(ts)
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                prev = self._last(db, cell, 2 ** 40)
+                if prev is not None and prev[0] >= hour:
+                    db.execute("ROLLBACK")
+                    return False
+                rain_cum, temp_cum, hum_cum, n_cum = prev[1:] if prev is not None else (0.0, 0.0, 0.0, 0)
+                db.execute(
+                    "INSERT INTO hourly VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (cell[0], cell[1], hour, temp, humidity, rain_mm, temp, temp,
+                     rain_cum + rain_mm, temp_cum + temp, hum_cum + humidity, n_cum + 1),
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return True
+
+    def compact(self, now: float | None = None) -> dict:
+        """Roll whole days of hourly rows past HOURLY_DAYS into daily rows; drop daily rows past DAILY_DAYS."""
+        now_hour = _hour(now or time.time())
+        hourly_cutoff = (now_hour // 24 - HOURLY_DAYS) * 24          # start of the first day kept hourly
+        daily_cutoff = now_hour - DAILY_DAYS * 24
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            # One row per (cell, day): averages, extremes and sums of the day, running totals of its last hour
+            before = db.total_changes
+            db.execute(
+                """
+                WITH d AS (
+                    SELECT i, j, MAX(t) AS t, AVG(temp) AS temp, AVG(humidity) AS humidity, SUM(rain) AS rain,
+                           MIN(temp_min) AS temp_min, MAX(temp_max) AS temp_max
+                    FROM hourly WHERE t < ? GROUP BY i, j, t / 24
+                )
+                INSERT OR REPLACE INTO daily
+                SELECT d.i, d.j, d.t, d.temp, d.humidity, d.rain, d.temp_min, d.temp_max,
+                       h.rain_cum, h.temp_cum, h.hum_cum, h.n_cum
+                FROM d JOIN hourly h ON h.i = d.i AND h.j = d.j AND h.t = d.t
+                """,
+                (hourly_cutoff,),
+            )
+            rolled = db.total_changes - before
+            deleted = db.execute("DELETE FROM hourly WHERE t < ?", (hourly_cutoff,)).rowcount
+            expired = db.execute("DELETE FROM daily WHERE t < ?", (daily_cutoff,)).rowcount
+            db.execute("COMMIT")
+        return {"days_rolled_up": rolled, "hourly_deleted": deleted, "daily_expired": expired}
+
+    # ── Reads ───────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _last(db, cell, hour: int):
+        """(t, rain_cum, temp_cum, hum_cum, n_cum) of the latest row at or before `hour`, hourly first."""
+        for table in ("hourly", "daily"):
+            row = db.execute(
+                f"SELECT t, rain_cum, temp_cum, hum_cum, n_cum FROM {table} WHERE i = ? AND j = ? AND t <= ? "
+                "ORDER BY t DESC LIMIT 1",
+                (cell[0], cell[1], hour),
+            ).fetchone()
+            if row is not None:
+                return row
+        return None
+
+    def window(self, lat: float, lng: float, hours: int, now: float | None = None) -> dict | None:
+        """
+        Rain total and mean temperature / humidity over the last `hours` for the cell containing (lat, lng),
+        or None when fewer than MIN_COVERAGE of those hours were observed.
+        """
+        cell = cell_of(lat, lng, WEATHER_CELL_DEG)
+        end = _hour(now or time.time())
+        if not os.path.exists(self.path):
+            WINDOW_READS.inc(result="empty")
+            return None
+        with self._lock:
+            db = self._conn()
+            last = self._last(db, cell, end)
+            first = self._last(db, cell, end - hours)
+        if last is None:
+            WINDOW_READS.inc(result="empty")
+            return None
+        base = first[1:] if first is not None else (0.0, 0.0, 0.0, 0)
+        n = last[4] - base[3]
+        if n < hours * MIN_COVERAGE:
+            WINDOW_READS.inc(result="insufficient")
+            return None
+        WINDOW_READS.inc(result="hit")
+        # A start inside a compacted day snaps back to the previous day's end — scale the extra hours out
+        scale = min(1.0, hours / n)
+        return {
+            "hours": hours,
+            "observed_hours": min(n, hours),
+            "rain_mm": round((last[1] - base[0]) * scale, 2),
+            "temp_mean": round((last[2] - base[1]) / n, 2),
+            "humidity_mean": round((last[3] - base[2]) / n, 2),
+        }
+
+    def latest(self, lat: float, lng: float, max_age_s: float = CURRENT_MAX_AGE_S) -> dict | None:
+        """Most recent hourly observation for the cell, if it is at most `max_age_s` old."""
+        cell = cell_of(lat, lng, WEATHER_CELL_DEG)
+        if not os.path.exists(self.path):
+            return None
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT t, temp, humidity, rain FROM hourly WHERE i = ? AND j = ? ORDER BY t DESC LIMIT 1", cell,
+            ).fetchone()
+        if row is None or time.time() - row[0] * 3600 > max_age_s + 3600:
+            return None
+        return {"observed_at": row[0] * 3600, "temp": row[1], "humidity": row[2], "rain_1h": row[3]}
+
+    def stats(self) -> dict:
+        if not os.path.exists(self.path):
+            return {"cells": 0, "hourly_rows": 0, "daily_rows": 0}
+        with self._lock:
+            db = self._conn()
+            return {
+                "cells": db.execute("SELECT COUNT(*) FROM (SELECT DISTINCT i, j FROM hourly)").fetchone()[0],
+                "hourly_rows": db.execute("SELECT COUNT(*) FROM hourly").fetchone()[0],
+                "daily_rows": db.execute("SELECT COUNT(*) FROM daily").fetchone()[0],
+            }
+
+    def try_claim_poll(self, hour: int) -> bool:
+        """
+        Whether this worker polls `hour` without Redis: under a non-blocking exclusive lock on
+        <WEATHER_STORE_PATH>.poll-lock, the first worker on the host to record the hour in that file claims it.
+        """
+        if fcntl is None:
+            return True
+        fd = os.open(self.path + ".poll-lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False                        # another worker is claiming right now
+            claimed = os.read(fd, 32).strip()
+            if claimed == str(hour).encode():
+                return False
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, str(hour).encode())
+            return True
+        finally:
+            os.close(fd)                            # also releases the lock
+
+
+_store: WeatherStore | None = None
+
+
+def get_weather_store() -> WeatherStore:
+    global _store
+    if _store is None:
+        _store = WeatherStore()
+    return _store
+
+
+# ── Poller ──────────────────────────────────────────────────────────────────
+
+async def poll_once() -> dict:
+    """Record this hour's observation for every farm cell (through the weather router's cache), then compact."""
+    from routers import weather
+    from services import rate_limit
+    from services.farm_index import get_farm_index
+
+    t0 = time.monotonic()
+    store = get_weather_store()
+    cells = list((await asyncio.to_thread(get_farm_index)).group_by_cell(WEATHER_CELL_DEG))
+    sem = asyncio.Semaphore(POLL_CONCURRENCY)
+    counts = {"recorded": 0, "duplicate": 0, "failed": 0}
+
+    async def observe(cell):
+        lat, lng = cell_center(cell, WEATHER_CELL_DEG)
+        async with sem:
+            try:
+                with rate_limit.background():
+                    w = await weather.fetch_weather(lat, lng, force=True)
+                fresh = await asyncio.to_thread(store.record, cell, time.time(), w["temp"], w["humidity"], w["rainfall"])
+                result = "recorded" if fresh else "duplicate"
+            except Exception:
+                result = "failed"
+        counts[result] += 1
+        OBSERVATIONS.inc(result=result)
+
+    if weather.OWM_KEY:
+        await asyncio.gather(*(observe(c) for c in cells))
+    compacted = await asyncio.to_thread(store.compact)
+    POLL_DURATION.set(time.monotonic() - t0)
+    return {"cells": len(cells), **counts, **compacted}
+
+
+def _claim_poll() -> bool:
+    """Only the first worker on the host to claim this interval polls — through Redis, else a lock file."""
+    from services.redis_cache import get_redis
+    r = get_redis()
+    hour = _hour(time.time())
+    if r is None:
+        return get_weather_store().try_claim_poll(hour)
+    return bool(r.set(f"weather-poll:{socket.gethostname()}:{hour}", os.getpid(), nx=True, ex=int(POLL_S)))
+
+
+async def poller():
+    """Runs for the life of the worker; one worker per host polls each hour."""
+    while True:
+        try:
+            if await asyncio.to_thread(_claim_poll):
+                report = await poll_once()
+                print(f"Weather observations polled: {report}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Weather observation poll failed: {e}")
+        # Next poll just after the top of the next interval
+        await asyncio.sleep(POLL_S - time.time() % POLL_S + 5)